@@ -0,0 +1,109 @@
+"""
+Cold-start timings for the API, per STARTUP_MODE.
+
+For each run: how long `import main` takes in a fresh interpreter, how long
+a fresh uvicorn takes to answer its first request, and how long the first
+list and first Gemini-backed request (a deep plagiarism scan) take when a
+user arrives --first-request-after seconds after the server came up.
+
+    python -m bench.coldstart
+    python -m bench.coldstart lazy eager --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench.run import BACKEND_DIR, READY_HEADERS, add_server_arguments, prepare_corpus, server_env
+
+MODES = ("lazy", "prewarm", "eager")
+PROBE_SECONDS = 0.01
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def import_seconds(env: dict, workdir: str) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=workdir, capture_output=True, text=True, check=True,
+        env={**env, "PYTHONPATH": BACKEND_DIR}
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def timed(method: str, url: str, **kwargs) -> float:
+    started = time.perf_counter()
+    httpx.request(method, url, timeout=60, **kwargs).raise_for_status()
+    return time.perf_counter() - started
+
+def cold_start(args, env: dict, user: str, post_id: int) -> dict:
+    base = f"http://127.0.0.1:{args.port}"
+    headers = {"Authorization": f"Bearer {user}"}
+    log = open(os.path.join(args.workdir, "server.log"), "ab")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--port", str(args.port), "--log-level", "warning"],
+        cwd=args.workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with {server.returncode}; see {args.workdir}/server.log")
+            try:
+                if httpx.get(f"{base}/api/db/stats", headers=READY_HEADERS, timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(PROBE_SECONDS)
+        ready = time.perf_counter() - started
+
+        time.sleep(args.first_request_after)
+        first_list = timed("GET", f"{base}/api/blog-posts", headers=headers, params={"limit": 20})
+        first_llm = timed("POST", f"{base}/api/blog-posts/{post_id}/check-plagiarism",
+                          headers=headers, params={"deep": "true"})
+        second_llm = timed("POST", f"{base}/api/blog-posts/{post_id}/check-plagiarism",
+                           headers=headers, params={"deep": "true"})
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return {"ready_s": ready, "first_list_ms": first_list * 1000,
+            "first_llm_ms": first_llm * 1000, "warm_llm_ms": second_llm * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time to first response, per STARTUP_MODE.")
+    parser.add_argument("modes", nargs="*", metavar="mode", help=f"Startup modes (default: all): {', '.join(MODES)}")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--first-request-after", type=float, default=3,
+                        help="Seconds between the server answering and the first user request")
+    add_server_arguments(parser)
+    parser.set_defaults(posts=200, users=5)
+    args = parser.parse_args()
+    unknown = [mode for mode in args.modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown mode: {', '.join(unknown)}")
+    args.workdir = os.path.abspath(args.workdir)
+
+    posts_by_user = prepare_corpus(args, args.workdir)
+    user = next(iter(posts_by_user))
+    post_id = posts_by_user[user][0]
+
+    columns = ("import_s", "ready_s", "first_list_ms", "first_llm_ms", "warm_llm_ms")
+    print(f"\n{'mode':<10}" + "".join(f"{c:>15}" for c in columns))
+    for mode in args.modes or MODES:
+        env = {**server_env(args), "STARTUP_MODE": mode}
+        runs = []
+        for _ in range(args.runs):
+            timings = cold_start(args, env, user, post_id)
+            timings["import_s"] = import_seconds(env, args.workdir)
+            runs.append(timings)
+        medians = {c: statistics.median(run[c] for run in runs) for c in columns}
+        print(f"{mode:<10}" + "".join(f"{medians[c]:>15.3f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
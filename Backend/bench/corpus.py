@@ -0,0 +1,97 @@
+"""
+Synthetic blog_posts corpus for benchmarks.
+
+Posts go through the app's own write path (bodies, search index,
+similarity signatures), so a benchmark sees the same storage as production.
+Words follow a Zipf distribution, which keeps search selectivity realistic.
+
+    python -m bench.corpus --posts 5000 --users 50
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+
+from database.db import init_db, write_db, set_post_body, save_signature
+from services.minhash import stored_signature
+
+STATUSES = ("Published", "Published", "Published", "Published", "UPDATED", "Scheduled")
+# Far enough out that the scheduler never publishes corpus posts mid-run.
+SCHEDULE_EPOCH = 4102444800.0
+
+
+def vocabulary(size: int = 5000, seed: int = 7):
+    """Pronounceable pseudo-words plus Zipf cumulative weights for random.choices."""
+    rng = random.Random(seed)
+    onsets = "b c d f g h j k l m n p r s t v w z br cl dr fl gr pl st tr".split()
+    vowels = "a e i o u ai ea io ou".split()
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(onsets) + rng.choice(vowels) for _ in range(rng.randint(1, 3))))
+    words = sorted(words)
+    rng.shuffle(words)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+    return words, cum_weights
+
+def user_ids(users: int):
+    return [f"bench-{n:04d}" for n in range(users)]
+
+def make_post(rng: random.Random, words, cum_weights, sections: int = 5, words_per_paragraph: int = 40):
+    def phrase(n):
+        return " ".join(rng.choices(words, cum_weights=cum_weights, k=n))
+
+    topic = phrase(4).title()
+    keywords = ", ".join(phrase(1) for _ in range(3))
+    headings = [phrase(3).title() for _ in range(sections)]
+    outline = {"sections": [{"heading": h, "points": [phrase(5), phrase(5)]} for h in headings]}
+    paragraphs = []
+    for heading in headings:
+        paragraphs.append(f"## {heading}")
+        paragraphs.extend(phrase(words_per_paragraph).capitalize() + "." for _ in range(3))
+    return topic, keywords, outline, f"# {topic}\n\n" + "\n\n".join(paragraphs)
+
+def generate_posts(posts: int, users: int, seed: int = 7):
+    """Yields (user_id, status, topic, keywords, outline, content); the same posts for the same arguments."""
+    rng = random.Random(seed)
+    words, cum_weights = vocabulary(seed=seed)
+    owners = user_ids(users)
+    for n in range(posts):
+        topic, keywords, outline, content = make_post(rng, words, cum_weights)
+        yield owners[n % users], rng.choice(STATUSES), topic, keywords, outline, content
+
+def build_corpus(posts: int, users: int, seed: int = 7, batch: int = 250) -> int:
+    """Appends `posts` posts spread over `users` users to the current database."""
+    init_db()
+    generated = generate_posts(posts, users, seed)
+    created = 0
+    while created < posts:
+        with write_db() as db:
+            for user_id, status, topic, keywords, outline, content in itertools.islice(generated, batch):
+                post_id = db.execute(
+                    """
+                    INSERT INTO blog_posts (topic, keywords, status, user_id, scheduled_at, scheduled_epoch)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    RETURNING id
+                    """,
+                    (topic, keywords, status, user_id,
+                     "2100-01-01T00:00:00Z" if status == "Scheduled" else None,
+                     SCHEDULE_EPOCH if status == "Scheduled" else None)
+                ).fetchone()[0]
+                set_post_body(db, post_id, "outline", json.dumps(outline))
+                set_post_body(db, post_id, "content", content)
+                save_signature(db, post_id, user_id, stored_signature(content))
+        created = min(posts, created + batch)
+    return created
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adds a synthetic corpus to blog_posts.db in the current directory.")
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    build_corpus(args.posts, args.users, args.seed)
+    print(f"✅ Added {args.posts} posts for {args.users} users in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,152 @@
+"""
+Search before and after the FTS5 index: the LIKE scan the endpoint used to
+run against the MATCH search it runs now (database.db.find_matching_posts),
+on the same synthetic posts.
+
+The LIKE query runs on the corpus at migration 7, with bodies inline and
+uncompressed as they were then, and the MATCH query on a copy migrated to
+the latest schema. The same 1-2 word queries from random users are timed
+one at a time, twice: the query alone, and the query plus the JSON the
+endpoint returns. That was every matching post in full before; it is one
+page with snippets now.
+
+Queries with one of the COMMON_WORDS most frequent words are reported
+apart as well. LIKE costs the same for any query; MATCH ranks every match
+by bm25, so it costs more the more posts a query matches.
+
+    python -m bench.fulltext
+    python -m bench.fulltext --posts 20000 --queries 100
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import time
+
+from bench.corpus import user_ids, vocabulary
+from bench.storage import INLINE_BODIES_VERSION, build_inline, connect, migrate_copy
+from bench.run import BENCH_DIR
+from database.db import find_matching_posts
+from services.fulltext import TOKEN_PATTERN, make_snippet, to_match_query
+
+# The endpoint's query before the FTS5 index, word for word.
+LIKE_QUERY = """
+    SELECT * FROM blog_posts
+    WHERE user_id = ?
+    AND (LOWER(topic) LIKE ? OR LOWER(content) LIKE ?)
+    ORDER BY id DESC
+"""
+PAGE_SIZE = 20
+# Words this far up the Zipf ranking appear in most posts.
+COMMON_WORDS = 100
+
+
+def make_queries(users: int, queries: int, seed: int):
+    rng = random.Random(seed)
+    words, cum_weights = vocabulary(seed=seed)
+    owners = user_ids(users)
+    return [
+        (" ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(1, 2))), rng.choice(owners))
+        for _ in range(queries)
+    ]
+
+def rows_as_dicts(cursor):
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def like_search(conn, query: str, user_id: str):
+    term = f"%{query.lower()}%"
+    return conn.execute(LIKE_QUERY, (user_id, term, term)).fetchall()
+
+def match_search(conn, query: str, user_id: str):
+    return find_matching_posts(conn, to_match_query(query, user_id), user_id, PAGE_SIZE)
+
+def like_response(conn, query: str, user_id: str) -> str:
+    term = f"%{query.lower()}%"
+    return json.dumps(rows_as_dicts(conn.execute(LIKE_QUERY, (user_id, term, term))))
+
+def match_response(conn, query: str, user_id: str) -> str:
+    """search_posts_in_db's work for one page, minus its check for posts changed outside the app."""
+    posts = find_matching_posts(conn, to_match_query(query, user_id), user_id, PAGE_SIZE)
+    terms = TOKEN_PATTERN.findall(query)
+    for post in posts:
+        post["snippet"] = make_snippet((post["topic"], post["keywords"], post.pop("content")), terms)
+    return json.dumps(posts)
+
+# measurement -> {search: (function, database)}
+MEASUREMENTS = {
+    "query": {"LIKE": (like_search, "inline"), "MATCH": (match_search, "indexed")},
+    "response": {"LIKE": (like_response, "inline"), "MATCH": (match_response, "indexed")},
+}
+
+def time_queries(path: str, search, queries) -> list:
+    conn = connect(path)
+    # The app's pool hands out sqlite3.Row rows; find_matching_posts relies on it.
+    conn.row_factory = sqlite3.Row
+    latencies = []
+    for query, user_id in queries:
+        started = time.perf_counter()
+        search(conn, query, user_id)
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+    return latencies
+
+def summarize(latencies) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+        "mean": statistics.fmean(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LIKE scan vs FTS5 MATCH search latency.")
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--workdir", default=os.path.join(BENCH_DIR, "work", "fulltext"))
+    args = parser.parse_args()
+
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    os.makedirs(args.workdir)
+    paths = {name: os.path.join(args.workdir, f"{name}.db") for name in ("inline", "indexed")}
+
+    print(f"Building {args.posts} posts for {args.users} users at migration {INLINE_BODIES_VERSION}...")
+    build_inline(paths["inline"], args.posts, args.users, args.seed)
+    print("Migrating a copy to the current schema...")
+    migrate_copy(paths["inline"], paths["indexed"])
+
+    queries = make_queries(args.users, args.queries, args.seed)
+    common = set(vocabulary(seed=args.seed)[0][:COMMON_WORDS])
+    groups = {
+        "all": list(range(len(queries))),
+        "common": [n for n, (query, _) in enumerate(queries) if set(query.split()) & common],
+        "rarer": [n for n, (query, _) in enumerate(queries) if not set(query.split()) & common],
+    }
+
+    print(f"\n{'measured':<10}{'queries':<14}{'search':<8}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'speedup':>10}")
+    for measurement, searches in MEASUREMENTS.items():
+        latencies = {}
+        for name, (search, database) in searches.items():
+            # One untimed pass, so neither side pays for a cold page cache.
+            time_queries(paths[database], search, queries[:10])
+            latencies[name] = time_queries(paths[database], search, queries)
+        for group, chosen in groups.items():
+            if not chosen:
+                continue
+            like = summarize([latencies["LIKE"][n] for n in chosen])
+            for name in searches:
+                timings = summarize([latencies[name][n] for n in chosen])
+                speedup = f"{like['mean'] / timings['mean']:.1f}x" if name != "LIKE" else ""
+                print(f"{measurement:<10}{f'{group} ({len(chosen)})':<14}{name:<8}"
+                      + "".join(f"{timings[key]:>10.2f}" for key in ("p50", "p95", "mean")) + f"{speedup:>10}")
+    print("\nspeedup: LIKE mean / MATCH mean.")
+
+
+if __name__ == "__main__":
+    main()
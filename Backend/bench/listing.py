@@ -0,0 +1,123 @@
+"""
+The dashboard list before and after keyset pages and the summary
+projection: what GET /api/blog-posts used to run against what it runs now
+(database.db.get_user_posts), on the same synthetic posts.
+
+`before` is the endpoint's old query, every post of the user with its
+outline and content, on the corpus at migration 7 as the app stored it
+then. The rest run on a copy migrated to the latest schema: `summary` is
+the whole list without the bodies, `page` one PAGE_SIZE page and `walk`
+every page, following the cursor. Each is timed for random users, query
+plus the JSON the endpoint returns, and reports the mean response size.
+
+    python -m bench.listing
+    python -m bench.listing --posts 20000 --users 20 --lists 100
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import time
+
+from bench.corpus import user_ids
+from bench.run import BENCH_DIR
+from bench.storage import INLINE_BODIES_VERSION, build_inline, connect, migrate_copy
+from database import db as database
+
+# The endpoint's query before pagination, word for word.
+OLD_LIST_QUERY = "SELECT * FROM blog_posts WHERE user_id = ? ORDER BY id DESC"
+PAGE_SIZE = 50
+
+
+def rows_as_dicts(cursor):
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def old_list(conn, user_id: str) -> list:
+    return [json.dumps(rows_as_dicts(conn.execute(OLD_LIST_QUERY, (user_id,))))]
+
+def summary_list(conn, user_id: str) -> list:
+    return [json.dumps(database.get_user_posts(user_id))]
+
+def first_page(conn, user_id: str) -> list:
+    return [json.dumps(database.get_user_posts(user_id, PAGE_SIZE))]
+
+def walk_pages(conn, user_id: str) -> list:
+    """Every page, each asked for with the previous one's X-Next-Cursor."""
+    responses, cursor = [], None
+    while True:
+        page = database.get_user_posts(user_id, PAGE_SIZE, cursor)
+        responses.append(json.dumps(page))
+        if len(page) < PAGE_SIZE:
+            return responses
+        cursor = page[-1]["id"]
+
+# name -> (list function, database)
+LISTS = {
+    "before": (old_list, "inline"),
+    "summary": (summary_list, "migrated"),
+    "page": (first_page, "migrated"),
+    "walk": (walk_pages, "migrated"),
+}
+
+def time_lists(path: str, list_posts, users) -> tuple:
+    """Latencies and response bytes per list, through the app's pool for the current schema."""
+    conn = connect(path)
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(path))
+    database._pool = None
+    latencies, sizes = [], []
+    try:
+        for user_id in users:
+            started = time.perf_counter()
+            responses = list_posts(conn, user_id)
+            latencies.append(time.perf_counter() - started)
+            sizes.append(sum(len(body) for body in responses))
+    finally:
+        database.get_pool().close()
+        database._pool = None
+        os.chdir(cwd)
+        conn.close()
+    return latencies, sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Post list latency and size, before and after pagination.")
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--lists", type=int, default=200, help="Lists timed per measurement")
+    parser.add_argument("--workdir", default=os.path.join(BENCH_DIR, "work", "listing"))
+    args = parser.parse_args()
+
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    paths = {name: os.path.join(args.workdir, name, "blog_posts.db") for name in ("inline", "migrated")}
+    for path in paths.values():
+        os.makedirs(os.path.dirname(path))
+
+    print(f"Building {args.posts} posts for {args.users} users at migration {INLINE_BODIES_VERSION}...")
+    build_inline(paths["inline"], args.posts, args.users, args.seed)
+    print("Migrating a copy to the current schema...")
+    migrate_copy(paths["inline"], paths["migrated"])
+
+    rng = random.Random(args.seed)
+    users = rng.choices(user_ids(args.users), k=args.lists)
+    print(f"\n{'list':<10}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'mean KB':>10}{'speedup':>10}")
+    before = None
+    for name, (list_posts, database_name) in LISTS.items():
+        # One untimed pass, so no list pays for a cold page cache.
+        time_lists(paths[database_name], list_posts, users[:10])
+        latencies, sizes = time_lists(paths[database_name], list_posts, users)
+        ordered = sorted(latencies)
+        mean = statistics.fmean(latencies) * 1000
+        before = before or mean
+        speedup = f"{before / mean:.1f}x" if name != "before" else ""
+        print(f"{name:<10}{statistics.median(ordered) * 1000:>10.2f}{ordered[int(len(ordered) * 0.95)] * 1000:>10.2f}"
+              f"{mean:>10.2f}{statistics.fmean(sizes) / 1000:>10.1f}{speedup:>10}")
+    print("\nspeedup: before mean / mean. walk fetches every page of the list.")
+
+
+if __name__ == "__main__":
+    main()
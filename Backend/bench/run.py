@@ -0,0 +1,409 @@
+"""
+Offline load test for the API.
+
+Starts uvicorn on a synthetic corpus with every external service faked
+(LLM_BACKEND=stub, SEARCH_BACKEND=fake, AUTH_VERIFIER=fake), drives each
+scenario with concurrent clients and reports latency percentiles and
+throughput. Results are saved under bench/results/ so runs can be compared.
+
+    python -m bench.run                              # every scenario
+    python -m bench.run list search --concurrency 32
+    python -m bench.run --llm-ms 200 --failure-rate 0.05 --label slow-gemini
+    python -m bench.run --compare bench/results/<earlier>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+from bench.corpus import build_corpus, user_ids, vocabulary
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+POLL_SECONDS = 0.05
+PIPELINE_TIMEOUT = 120
+# Topics per research-batch / research-serial run.
+BATCH_TOPICS = 50
+# Posts per bulk export; a user needs this many, e.g. --posts 5000 --users 5.
+BULK_EXPORT_POSTS = 1000
+
+
+class Context:
+    def __init__(self, client: httpx.AsyncClient, posts_by_user: dict, words, cum_weights):
+        self.client = client
+        self.posts_by_user = posts_by_user
+        self.users = list(posts_by_user)
+        self.words = words
+        self.cum_weights = cum_weights
+
+    async def call(self, method: str, path: str, user: str, **kwargs) -> httpx.Response:
+        response = await self.client.request(
+            method, path, headers={"Authorization": f"Bearer {user}"}, **kwargs
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} -> {response.status_code}: {response.text[:120]}")
+        return response
+
+    def pick_post(self, rng: random.Random):
+        user = rng.choice(self.users)
+        return user, rng.choice(self.posts_by_user[user])
+
+
+# ---------------- SCENARIOS ----------------
+async def list_posts(ctx: Context, rng: random.Random):
+    await ctx.call("GET", "/api/blog-posts", rng.choice(ctx.users), params={"limit": 20})
+
+async def search(ctx: Context, rng: random.Random):
+    query = " ".join(rng.choices(ctx.words, cum_weights=ctx.cum_weights, k=rng.randint(1, 2)))
+    await ctx.call("GET", "/api/blog-posts/search", rng.choice(ctx.users), params={"query": query})
+
+async def wait_for_status(ctx: Context, user: str, post_id: int, wanted: str):
+    deadline = time.monotonic() + PIPELINE_TIMEOUT
+    while time.monotonic() < deadline:
+        status = (await ctx.call("GET", f"/api/blog-posts/{post_id}", user)).json()["status"]
+        if status == wanted:
+            return
+        if status == "ERROR":
+            raise RuntimeError(f"post {post_id} failed while waiting for {wanted}")
+        await asyncio.sleep(POLL_SECONDS)
+    raise TimeoutError(f"post {post_id} not {wanted} after {PIPELINE_TIMEOUT}s")
+
+async def pipeline(ctx: Context, rng: random.Random):
+    """Create -> research -> generate, timed until the post is published."""
+    user = rng.choice(ctx.users)
+    topic = " ".join(rng.choices(ctx.words, cum_weights=ctx.cum_weights, k=4))
+    created = await ctx.call("POST", "/api/blog-posts", user, json={"topic": topic, "keywords": topic})
+    post_id = created.json()["postId"]
+    await wait_for_status(ctx, user, post_id, "OUTLINE_READY")
+    await ctx.call("POST", f"/api/blog-posts/{post_id}/generate", user)
+    await wait_for_status(ctx, user, post_id, "Published")
+
+def batch_topics(ctx: Context, rng: random.Random):
+    return [" ".join(rng.choices(ctx.words, cum_weights=ctx.cum_weights, k=4)) for _ in range(BATCH_TOPICS)]
+
+async def research_batch(ctx: Context, rng: random.Random):
+    """BATCH_TOPICS topics in one batch, timed until every outline is ready."""
+    user = rng.choice(ctx.users)
+    posts = [{"topic": topic, "keywords": topic} for topic in batch_topics(ctx, rng)]
+    batch_id = (await ctx.call("POST", "/api/blog-posts/batch", user, json=posts)).json()["batchId"]
+    deadline = time.monotonic() + PIPELINE_TIMEOUT
+    while time.monotonic() < deadline:
+        counts = (await ctx.call("GET", f"/api/blog-posts/batch/{batch_id}", user)).json()["counts"]
+        if counts.get("OUTLINE_READY") == BATCH_TOPICS:
+            return
+        await asyncio.sleep(POLL_SECONDS)
+    raise TimeoutError(f"batch {batch_id} not researched after {PIPELINE_TIMEOUT}s: {counts}")
+
+async def research_serial(ctx: Context, rng: random.Random):
+    """The same BATCH_TOPICS topics created one after another, each waited on, as a client without batches would."""
+    user = rng.choice(ctx.users)
+    for topic in batch_topics(ctx, rng):
+        created = await ctx.call("POST", "/api/blog-posts", user, json={"topic": topic, "keywords": topic})
+        await wait_for_status(ctx, user, created.json()["postId"], "OUTLINE_READY")
+
+def export(format_type: str):
+    async def run(ctx: Context, rng: random.Random):
+        user, post_id = ctx.pick_post(rng)
+        await ctx.call("GET", f"/api/blog-posts/{post_id}/export", user, params={"format": format_type})
+    return run
+
+async def export_bulk(ctx: Context, rng: random.Random):
+    """One ZIP of up to BULK_EXPORT_POSTS of a user's posts, timed until the last byte."""
+    user = rng.choice(ctx.users)
+    await ctx.call("POST", "/api/blog-posts/export", user,
+                   json={"post_ids": ctx.posts_by_user[user][:BULK_EXPORT_POSTS], "format": "markdown"})
+
+async def plagiarism(ctx: Context, rng: random.Random):
+    user, post_id = ctx.pick_post(rng)
+    await ctx.call("POST", f"/api/blog-posts/{post_id}/check-plagiarism", user, params={"deep": "true"})
+
+async def humanize(ctx: Context, rng: random.Random):
+    user, post_id = ctx.pick_post(rng)
+    await ctx.call("POST", f"/api/blog-posts/{post_id}/humanize", user,
+                   json={"user_prompt": "I run a small team", "tone": "balanced"})
+
+# name -> (operation, default request count)
+SCENARIOS = {
+    "list": (list_posts, 2000),
+    "search": (search, 2000),
+    "pipeline": (pipeline, 40),
+    "research-batch": (research_batch, 5),
+    "research-serial": (research_serial, 5),
+    "export-markdown": (export("markdown"), 500),
+    "export-txt": (export("txt"), 500),
+    "export-html": (export("html"), 500),
+    "export-pdf": (export("pdf"), 200),
+    "export-bulk": (export_bulk, 20),
+    "plagiarism": (plagiarism, 200),
+    "humanize": (humanize, 200),
+}
+
+
+# ---------------- DRIVER ----------------
+def percentile(ordered, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+async def drive(ctx: Context, operation, requests: int, concurrency: int, seed: int) -> dict:
+    latencies = []
+    errors = []
+    issued = 0
+
+    async def client(n: int):
+        nonlocal issued
+        rng = random.Random(seed * 1000 + n)
+        while issued < requests:
+            issued += 1
+            started = time.perf_counter()
+            try:
+                await operation(ctx, rng)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(str(e))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "ok": len(ordered),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def reset_peak_rss(pid: int):
+    """Restarts the kernel's peak RSS count for the process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_rss_mb(pid: int) -> float:
+    """The process's peak RSS since the last reset, or 0.0 where /proc has no VmHWM."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return 0.0
+
+
+# ---------------- SERVER ----------------
+METRICS_TOKEN = "bench"
+READY_HEADERS = {"Authorization": f"Bearer {METRICS_TOKEN}"}
+
+def server_env(args) -> dict:
+    env = dict(os.environ)
+    env.pop("FIREBASE_CREDENTIALS", None)
+    env.update({
+        "AUTH_VERIFIER": "fake",
+        "AUTH_ALLOW_FAKE": "1",
+        "LLM_BACKEND": "stub",
+        "SEARCH_BACKEND": "fake",
+        # Cached replies would turn repeated calls into lookups; measure the real path.
+        "LLM_CACHE": "off",
+        "STUB_LLM_FIRST_TOKEN_MS": str(args.llm_ms),
+        "STUB_LLM_CHUNK_MS": str(args.llm_chunk_ms),
+        "STUB_LLM_FAILURE_RATE": str(args.failure_rate),
+        "LLM_RATE_PER_MINUTE": str(args.llm_rpm),
+        "FAKE_SEARCH_LATENCY_MS": str(args.search_ms),
+        "FAKE_SEARCH_FAILURE_RATE": str(args.failure_rate),
+        "FAKE_AUTH_LATENCY_MS": str(args.auth_ms),
+        "FAKE_AUTH_FAILURE_RATE": str(args.auth_failure_rate),
+        # The readiness probe reads /api/db/stats, which needs a metrics token.
+        "METRICS_TOKEN": METRICS_TOKEN,
+    })
+    for pair in args.env:
+        key, _, value = pair.partition("=")
+        env[key] = value
+    return env
+
+def start_server(args, workdir: str) -> subprocess.Popen:
+    log = open(os.path.join(workdir, "server.log"), "ab")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--port", str(args.port), "--log-level", "warning"],
+        cwd=workdir, env=server_env(args), stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}; see {workdir}/server.log")
+        try:
+            if httpx.get(f"http://127.0.0.1:{args.port}/api/db/stats", headers=READY_HEADERS, timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Server did not start; see {workdir}/server.log")
+
+def prepare_corpus(args, workdir: str) -> dict:
+    """Builds the corpus once per (posts, users, seed) and reuses it on later runs."""
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    meta_path = os.path.join(workdir, "corpus.json")
+    meta = {"posts": args.posts, "users": args.users, "seed": args.seed}
+    current = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            current = json.load(f)
+    if current != meta or args.rebuild:
+        for name in ("blog_posts.db", "blog_posts.db-wal", "blog_posts.db-shm", "llm_cache.db"):
+            if os.path.exists(name):
+                os.remove(name)
+        print(f"Building corpus: {args.posts} posts for {args.users} users...")
+        started = time.perf_counter()
+        build_corpus(args.posts, args.users, args.seed)
+        print(f"✅ Corpus ready in {time.perf_counter() - started:.1f}s")
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+
+    from database.db import read_db
+
+    owners = set(user_ids(args.users))
+    posts_by_user = {user: [] for user in owners}
+    with read_db() as db:
+        # Only posts with content: an interrupted pipeline run can leave empty ones behind.
+        for row in db.execute(
+            "SELECT p.id, p.user_id FROM blog_posts p JOIN post_bodies b ON b.post_id = p.id "
+            "WHERE b.content IS NOT NULL ORDER BY p.id"
+        ):
+            if row["user_id"] in owners:
+                posts_by_user[row["user_id"]].append(row["id"])
+    return {user: ids for user, ids in posts_by_user.items() if ids}
+
+
+# ---------------- REPORTING ----------------
+COLUMNS = ("ok", "errors", "p50_ms", "p95_ms", "p99_ms", "throughput", "peak_rss_mb")
+
+def print_table(results: dict, baseline: dict = None):
+    print(f"\n{'scenario':<16}" + "".join(f"{c:>12}" for c in COLUMNS))
+    for name, stats in results.items():
+        print(f"{name:<16}" + "".join(f"{stats.get(c, '-'):>12}" for c in COLUMNS))
+        previous = (baseline or {}).get(name)
+        if previous:
+            deltas = []
+            for c in COLUMNS:
+                if previous.get(c) and stats.get(c):
+                    deltas.append(f"{(stats[c] - previous[c]) / previous[c] * 100:>+11.1f}%")
+                else:
+                    deltas.append(f"{'-':>12}")
+            print(f"{'  vs baseline':<16}" + "".join(deltas))
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def save_results(args, results: dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(RESULTS_DIR, f"{stamp}-{args.label}.json")
+    config = {k: v for k, v in vars(args).items() if k not in ("compare", "rebuild")}
+    with open(path, "w") as f:
+        json.dump({"label": args.label, "revision": git_revision(), "created_at": stamp,
+                   "config": config, "scenarios": results}, f, indent=2)
+    return path
+
+
+async def run_scenarios(args, posts_by_user: dict, server_pid: int) -> dict:
+    words, cum_weights = vocabulary(seed=args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits,
+                                 timeout=PIPELINE_TIMEOUT) as client:
+        ctx = Context(client, posts_by_user, words, cum_weights)
+        for name in args.scenarios:
+            operation, default_requests = SCENARIOS[name]
+            requests = args.requests or default_requests
+            print(f"▶️ {name}: {requests} requests, {args.concurrency} clients")
+            reset_peak_rss(server_pid)
+            results[name] = await drive(ctx, operation, requests, args.concurrency, args.seed)
+            results[name]["peak_rss_mb"] = peak_rss_mb(server_pid)
+            if results[name]["errors"]:
+                print(f"⚠️ {name}: {results[name]['errors']} errors, e.g. {results[name]['error_samples'][0]}")
+    return results
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Corpus, fake-service and server options shared with bench.coldstart."""
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--llm-ms", type=float, default=50, help="Stub LLM time to first token")
+    parser.add_argument("--llm-chunk-ms", type=float, default=0, help="Stub LLM delay per streamed word")
+    parser.add_argument("--llm-rpm", type=float, default=6000,
+                        help="Gemini throttle rate; 15 models the free tier (default: effectively unthrottled)")
+    parser.add_argument("--search-ms", type=float, default=20)
+    parser.add_argument("--auth-ms", type=float, default=5)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of LLM and search calls that fail")
+    parser.add_argument("--auth-failure-rate", type=float, default=0.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra server environment, e.g. --env DB_READERS=8")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workdir", default=os.path.join(BENCH_DIR, "work"))
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the corpus even if it matches")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline API benchmark with faked Gemini, Tavily and Firebase.")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"Scenarios to run (default: all): {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=0, help="Requests per scenario (default: per scenario)")
+    add_server_arguments(parser)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="Earlier results to compare against")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    args.workdir = os.path.abspath(args.workdir)
+
+    posts_by_user = prepare_corpus(args, args.workdir)
+    server = start_server(args, args.workdir)
+    try:
+        results = asyncio.run(run_scenarios(args, posts_by_user, server.pid))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["scenarios"]
+    print_table(results, baseline)
+    print(f"\n💾 Saved {save_results(args, results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Post storage before and after bodies moved to compressed post_bodies rows
+and the search index stopped keeping its own copy of the text.
+
+Builds the same synthetic corpus at two schemas in bench/work/storage/:
+`inline` stops at migration 7, with outline and content as TEXT in
+blog_posts as before, and `current` is the latest schema, written through
+the app's write path. `migrated` is a copy of `inline` brought up to the
+latest schema, as an existing database would be. For each it prints the
+file size and the latency of the dashboard list query that
+GET /api/blog-posts runs, for a 20-post page and for a user's whole list.
+Both schemas run the same SQL;
+`cold` opens a new connection per query, so SQLite's page cache starts
+empty (the OS cache stays warm).
+
+    python -m bench.storage
+    python -m bench.storage --posts 20000 --users 100 --queries 500
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import time
+
+from bench.corpus import SCHEDULE_EPOCH, build_corpus, generate_posts, user_ids
+from bench.run import BENCH_DIR
+from database.compression import register_functions
+from database.migrations import migrate
+from services.minhash import stored_signature
+
+# The schema before post_bodies: migration 8 moved bodies out of blog_posts.
+INLINE_BODIES_VERSION = 7
+LIST_COLUMNS = "id, topic, keywords, status, user_id, created_at, scheduled_at"
+LIST_QUERIES = {
+    "page": f"SELECT {LIST_COLUMNS} FROM blog_posts WHERE user_id = ? ORDER BY id DESC LIMIT 20",
+    "all": f"SELECT {LIST_COLUMNS} FROM blog_posts WHERE user_id = ? ORDER BY id DESC",
+}
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    register_functions(conn)
+    return conn
+
+def build_inline(path: str, posts: int, users: int, seed: int, batch: int = 250):
+    """The corpus at migration 7: bodies inline and uncompressed, as the app stored them then."""
+    conn = connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    migrate(conn, INLINE_BODIES_VERSION)
+    generated = list(generate_posts(posts, users, seed))
+    for start in range(0, posts, batch):
+        with conn:
+            for user_id, status, topic, keywords, outline, content in generated[start:start + batch]:
+                post_id = conn.execute(
+                    """
+                    INSERT INTO blog_posts (topic, keywords, outline, content, status, user_id, scheduled_at, scheduled_epoch)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    RETURNING id
+                    """,
+                    (topic, keywords, json.dumps(outline), content, status, user_id,
+                     "2100-01-01T00:00:00Z" if status == "Scheduled" else None,
+                     SCHEDULE_EPOCH if status == "Scheduled" else None)
+                ).fetchone()[0]
+                signature, shingles = stored_signature(content)
+                conn.execute(
+                    "INSERT INTO post_signatures (post_id, user_id, signature, shingles, seq) VALUES (?, ?, ?, ?, ?)",
+                    (post_id, user_id, signature, shingles, post_id)
+                )
+    conn.close()
+
+def build_current(path: str, posts: int, users: int, seed: int):
+    from database import db as database
+
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(path))
+    try:
+        database._pool = None
+        build_corpus(posts, users, seed)
+        database.get_pool().close()
+        database._pool = None
+    finally:
+        os.chdir(cwd)
+
+def migrate_copy(source: str, path: str) -> float:
+    shutil.copy(source, path)
+    conn = connect(path)
+    started = time.perf_counter()
+    migrate(conn)
+    elapsed = time.perf_counter() - started
+    # Migration frees the old pages without returning them; VACUUM shows the real size.
+    conn.execute("VACUUM")
+    conn.close()
+    return elapsed
+
+def file_size(path: str) -> int:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return os.path.getsize(path)
+
+def median_ms(path: str, query: str, users, queries: int, seed: int, cold: bool) -> float:
+    rng = random.Random(seed)
+    latencies = []
+    conn = None if cold else connect(path)
+    for _ in range(queries):
+        if cold:
+            conn = connect(path)
+            # Parse the schema first; the latest one has many more triggers to read.
+            conn.execute("SELECT 1 FROM blog_posts LIMIT 0").fetchall()
+        started = time.perf_counter()
+        conn.execute(query, (rng.choice(users),)).fetchall()
+        latencies.append(time.perf_counter() - started)
+        if cold:
+            conn.close()
+    if not cold:
+        conn.close()
+    return round(statistics.median(latencies) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DB size and list latency with inline vs compressed side-table bodies.")
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--queries", type=int, default=300, help="List queries per measurement")
+    parser.add_argument("--workdir", default=os.path.join(BENCH_DIR, "work", "storage"))
+    args = parser.parse_args()
+
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    paths = {name: os.path.join(args.workdir, name, "blog_posts.db") for name in ("inline", "migrated", "current")}
+    for path in paths.values():
+        os.makedirs(os.path.dirname(path))
+
+    print(f"Building {args.posts} posts for {args.users} users at migration {INLINE_BODIES_VERSION}...")
+    build_inline(paths["inline"], args.posts, args.users, args.seed)
+    print("Migrating a copy to the current schema...")
+    migration_seconds = migrate_copy(paths["inline"], paths["migrated"])
+    print("Building the same posts at the current schema...")
+    build_current(paths["current"], args.posts, args.users, args.seed)
+
+    users = user_ids(args.users)
+    columns = [f"{query} {cache}" for query in LIST_QUERIES for cache in ("warm", "cold")]
+    print(f"\n{'schema':<10}{'size MB':>10}" + "".join(f"{c + ' p50 ms':>18}" for c in columns))
+    for name, path in paths.items():
+        timings = [
+            median_ms(path, LIST_QUERIES[query], users, args.queries, args.seed, cache == "cold")
+            for query in LIST_QUERIES for cache in ("warm", "cold")
+        ]
+        size = file_size(path) / 1e6
+        print(f"{name:<10}{size:>10.1f}" + "".join(f"{t:>18}" for t in timings))
+    print(f"\nMigrating the inline database took {migration_seconds:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from database.pool import CancelToken, set_cancel_token
+from database.hooks import emit
+
+DB_WORKERS = int(os.getenv("DB_WORKERS", "8"))
+
+_executor = None
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+    return _executor
+
+def _run_with_token(token: CancelToken, fn, *args, **kwargs):
+    set_cancel_token(token)
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        set_cancel_token(None)
+        emit("db_call", time.perf_counter() - started, getattr(fn, "__name__", "unknown"))
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Runs a blocking database helper on the bounded DB executor.
+    If the awaiting request is cancelled (client disconnect, timeout), the
+    query in flight is interrupted and any open write is rolled back.
+    """
+    token = CancelToken()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        get_executor(), partial(_run_with_token, token, fn, *args, **kwargs)
+    )
+    try:
+        return await future
+    except asyncio.CancelledError:
+        token.cancel()
+        raise
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
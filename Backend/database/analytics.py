@@ -0,0 +1,102 @@
+"""
+Per-user dashboard analytics, read from the counters and daily rollups
+that the triggers of migration 9 keep current (see create_post_stats).
+
+A dashboard read is one primary-key seek for the status counts plus a
+range scan over at most `days` rollup rows, however many posts the user
+has. reconcile_post_stats() rebuilds the status counts from blog_posts:
+
+    python -m database.analytics
+"""
+from datetime import date, datetime, timedelta, timezone
+
+from database.db import read_db, write_db
+
+# Matches what the dashboard has always shown as "Drafting".
+DRAFTING_STATUSES = ("RESEARCHING", "WRITING", "OUTLINE_READY", "Drafting", "Draft")
+MAX_ANALYTICS_DAYS = 366
+
+
+def iso_week(day: str) -> str:
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def get_user_analytics(user_id: str, days: int = 30) -> dict:
+    since = (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+    with read_db() as db:
+        counts = {
+            row["status"]: row["count"]
+            for row in db.execute(
+                "SELECT status, count FROM user_post_counts WHERE user_id = ? AND count > 0", (user_id,)
+            )
+        }
+        rows = db.execute(
+            """
+            SELECT day, created, published, researched, research_seconds, generated, generation_seconds
+            FROM user_post_daily WHERE user_id = ? AND day >= ? ORDER BY day
+            """,
+            (user_id, since)
+        ).fetchall()
+
+    total = sum(counts.values())
+    published = counts.get("Published", 0)
+    weekly = {}
+    for row in rows:
+        week = weekly.setdefault(iso_week(row["day"]), {"created": 0, "published": 0})
+        week["created"] += row["created"]
+        week["published"] += row["published"]
+    researched = sum(row["researched"] for row in rows)
+    generated = sum(row["generated"] for row in rows)
+
+    return {
+        "total": total,
+        "drafting": sum(counts.get(status, 0) for status in DRAFTING_STATUSES),
+        "published": published,
+        "scheduled": counts.get("Scheduled", 0),
+        "failed": counts.get("ERROR", 0),
+        "completion_rate": round(published / total * 100) if total else 0,
+        "by_status": counts,
+        "days": days,
+        "daily": [{"day": row["day"], "created": row["created"], "published": row["published"]} for row in rows],
+        "weekly": [{"week": week, **values} for week, values in weekly.items()],
+        "avg_research_seconds": (
+            round(sum(row["research_seconds"] for row in rows) / researched, 1) if researched else None
+        ),
+        "avg_generation_seconds": (
+            round(sum(row["generation_seconds"] for row in rows) / generated, 1) if generated else None
+        ),
+    }
+
+def reconcile_post_stats() -> int:
+    """
+    Rebuilds user_post_counts from blog_posts in one write transaction and
+    returns how many (user, status) counters had drifted. The daily rollups
+    are history that blog_posts no longer holds, so they are left alone.
+    """
+    with write_db() as db:
+        current = {
+            (row["user_id"], row["status"]): row["count"]
+            for row in db.execute("SELECT user_id, status, count FROM user_post_counts WHERE count != 0")
+        }
+        actual = {
+            (row[0], row[1]): row[2]
+            for row in db.execute(
+                "SELECT COALESCE(user_id, ''), COALESCE(status, ''), COUNT(*) FROM blog_posts GROUP BY 1, 2"
+            )
+        }
+        drifted = sum(1 for key in current.keys() | actual.keys() if current.get(key) != actual.get(key))
+        if drifted:
+            db.execute("DELETE FROM user_post_counts")
+            db.executemany(
+                "INSERT INTO user_post_counts (user_id, status, count) VALUES (?, ?, ?)",
+                [(user_id, status, count) for (user_id, status), count in actual.items()]
+            )
+        return drifted
+
+
+if __name__ == "__main__":
+    from database.db import init_db
+
+    init_db()
+    drifted = reconcile_post_stats()
+    print(f"✅ Status counters reconciled; {drifted} had drifted.")
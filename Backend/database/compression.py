@@ -0,0 +1,36 @@
+"""
+Storage codec for post bodies (outline and content).
+
+Bodies live in post_bodies, apart from the small metadata rows in
+blog_posts. Text above BODY_COMPRESS_BYTES is stored as a zlib BLOB;
+anything shorter stays TEXT, so the column's storage class tells the two
+apart and no flag is needed. inflate() is registered as an SQL function
+on every pooled connection so queries read either form. Nothing in the
+schema calls it, so a plain sqlite3 shell can still write to blog_posts.
+The search index is contentless: these blobs are the only copy of a body.
+"""
+import os
+import zlib
+
+BODY_COMPRESS_BYTES = int(os.getenv("BODY_COMPRESS_BYTES", "512"))
+BODY_COMPRESS_LEVEL = int(os.getenv("BODY_COMPRESS_LEVEL", "6"))
+
+
+def pack_text(text):
+    if text is None:
+        return None
+    data = text.encode("utf-8")
+    if len(data) < BODY_COMPRESS_BYTES:
+        return text
+    packed = zlib.compress(data, BODY_COMPRESS_LEVEL)
+    # Incompressible text isn't worth the decode cost.
+    return packed if len(packed) < len(data) else text
+
+def inflate(value):
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+def register_functions(conn):
+    conn.create_function("inflate", 1, inflate, deterministic=True)
+    conn.create_function("pack_text", 1, pack_text, deterministic=True)
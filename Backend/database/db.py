@@ -1,122 +1,462 @@
-import sqlite3
+import heapq
+import os
+import time
+from contextlib import contextmanager
+
+from database.compression import pack_text
+from database.hooks import emit
+from database.migrations import migrate
+from database.pool import ConnectionPool
 
 DB_NAME = "blog_posts.db"
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+EVENT_RETENTION_SECONDS = 24 * 60 * 60
+# A client whose since= is older than this reloads the whole list.
+TOMBSTONE_RETENTION_SECONDS = 30 * 24 * 60 * 60
+
+# Columns the dashboard needs; never includes the large outline/content blobs.
+SUMMARY_FIELDS = ("id", "topic", "keywords", "status", "user_id", "created_at", "scheduled_at")
+# A whole post: metadata plus its outline and content, inflated. Append a WHERE on p.
+FULL_POST_QUERY = """
+    SELECT p.*, inflate(b.outline) AS outline, inflate(b.content) AS content
+    FROM blog_posts p LEFT JOIN post_bodies b ON b.post_id = p.id
+"""
+
+# bm25 of every match; the MATCH is scoped to the owner, so this walks only
+# the caller's posts. Pairs of (rowid, rank) are all it reads: bodies are
+# fetched for one page. Measured faster than ORDER BY rank LIMIT, which
+# evaluates rank again to sort.
+SEARCH_RANK_QUERY = "SELECT rowid, rank FROM blog_posts_fts WHERE blog_posts_fts MATCH ?"
+# The same, for some statuses only: one primary-key lookup per match.
+SEARCH_RANK_STATUS_QUERY = """
+    SELECT blog_posts_fts.rowid, blog_posts_fts.rank
+    FROM blog_posts_fts JOIN blog_posts p ON p.id = blog_posts_fts.rowid
+    WHERE blog_posts_fts MATCH ? AND p.status IN ({statuses})
+"""
+# One page of results by id; the WHERE re-checks ownership. The index is
+# contentless, so snippets are cut from the page's own bodies.
+SEARCH_PAGE_QUERY = """
+    SELECT p.id, p.topic, p.keywords, p.status, p.created_at, p.scheduled_at, inflate(b.content) AS content
+    FROM blog_posts p LEFT JOIN post_bodies b ON b.post_id = p.id
+    WHERE p.user_id = ? AND p.id IN ({ids})
+"""
+
+_pool = None
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(DB_NAME, readers=DB_READERS)
+    return _pool
+
+@contextmanager
+def read_db():
+    with get_pool().reader() as conn:
+        yield conn
+
+@contextmanager
+def write_db():
+    with get_pool().writer() as conn:
+        yield conn
 
-def get_db():
-    conn = sqlite3.connect(DB_NAME, timeout=20)
-    conn.row_factory = sqlite3.Row
-    return conn
+def pool_stats() -> dict:
+    return get_pool().stats()
 
 
 def init_db():
-    """Initialises the database and ensures all columns exist."""
-    db = get_db()
-    try:
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS blog_posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                topic TEXT NOT NULL,
-                keywords TEXT NOT NULL,
-                outline TEXT,
-                content TEXT, 
-                status TEXT DEFAULT 'RESEARCHING',
-                user_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                scheduled_at TEXT
+    """
+    Brings the schema up to date, re-indexes posts changed outside the app
+    and trims the event log and old tombstones.
+    """
+    with write_db() as db:
+        migrate(db)
+        sync_search_index(db)
+        db.execute(
+            "DELETE FROM post_events WHERE created_at < ?",
+            (time.time() - EVENT_RETENTION_SECONDS,)
+        )
+        cutoff = time.time() - TOMBSTONE_RETENTION_SECONDS
+        db.execute(
+            """
+            UPDATE user_versions SET pruned_through = t.version
+            FROM (SELECT user_id, MAX(version) AS version FROM post_tombstones
+                  WHERE deleted_at < ? GROUP BY user_id) AS t
+            WHERE user_versions.user_id = t.user_id
+            """,
+            (cutoff,)
+        )
+        db.execute("DELETE FROM post_tombstones WHERE deleted_at < ?", (cutoff,))
+
+def set_post_body(db, post_id: int, field: str, text: str):
+    """
+    Writes a post's outline, content or draft inside the caller's
+    transaction. The only writer of post bodies: content is also indexed
+    for search here, from the text before it is compressed, and replaces
+    the draft. A draft is a checkpoint of content still being written; it
+    is neither indexed nor counted as a change to the post. Does nothing
+    if the post has been deleted.
+    """
+    if field not in ("outline", "content", "draft"):
+        raise ValueError(f"Unknown body field: {field}")
+    clear_draft = ", draft = NULL" if field == "content" else ""
+    db.execute(
+        f"""
+        INSERT INTO post_bodies (post_id, {field})
+        SELECT id, ? FROM blog_posts WHERE id = ?
+        ON CONFLICT (post_id) DO UPDATE SET {field} = excluded.{field}{clear_draft}
+        """,
+        (pack_text(text), post_id)
+    )
+    if field == "content":
+        sync_search_index(db, {post_id: text})
+
+def sync_search_index(db, texts=None) -> int:
+    """
+    Re-indexes the posts listed in search_stale (see migration 8) inside
+    the caller's write transaction: forgets what was indexed for each,
+    then indexes the post as it is now, unless it was deleted. texts maps
+    post ids to their plain content when the caller already has it, which
+    saves inflating the new body. Returns how many posts were re-indexed.
+    """
+    stale = db.execute(
+        "SELECT post_id, topic, keywords, inflate(content) AS content, owner FROM search_stale"
+    ).fetchall()
+    if not stale:
+        return 0
+    db.executemany(
+        """
+        INSERT INTO blog_posts_fts (blog_posts_fts, rowid, topic, keywords, content, owner)
+        VALUES ('delete', ?, ?, ?, ?, ?)
+        """,
+        [tuple(row) for row in stale]
+    )
+    for row in stale:
+        post_id = row["post_id"]
+        if texts and post_id in texts:
+            db.execute(
+                """
+                INSERT INTO blog_posts_fts (rowid, topic, keywords, content, owner)
+                SELECT id, topic, keywords, ?, hex(user_id) FROM blog_posts WHERE id = ?
+                """,
+                (texts[post_id], post_id)
             )
-        ''')
-        db.commit()
+        else:
+            db.execute(
+                """
+                INSERT INTO blog_posts_fts (rowid, topic, keywords, content, owner)
+                SELECT p.id, p.topic, p.keywords, inflate(b.content), hex(p.user_id)
+                FROM blog_posts p LEFT JOIN post_bodies b ON b.post_id = p.id
+                WHERE p.id = ?
+                """,
+                (post_id,)
+            )
+    db.execute("DELETE FROM search_stale")
+    return len(stale)
+
+def find_matching_posts(db, match: str, user_id: str, limit: int, offset: int = 0, statuses=()):
+    """
+    One page of a user's posts matching an FTS5 query, best bm25 rank
+    first, as dicts with their `rank`; only posts in `statuses`, if given.
+    Only the top offset + limit matches are kept while ranking.
+    """
+    if statuses:
+        query = SEARCH_RANK_STATUS_QUERY.format(statuses=", ".join("?" * len(statuses)))
+        rows = db.execute(query, (match, *statuses))
+    else:
+        rows = db.execute(SEARCH_RANK_QUERY, (match,))
+    ranked = heapq.nsmallest(offset + limit, rows, key=lambda row: row["rank"])
+    ranks = {row["rowid"]: row["rank"] for row in ranked[offset:]}
+    if not ranks:
+        return []
+
+    rows = db.execute(
+        SEARCH_PAGE_QUERY.format(ids=", ".join("?" * len(ranks))), [user_id, *ranks]
+    ).fetchall()
+    posts = {row["id"]: {**dict(row), "rank": ranks[row["id"]]} for row in rows}
+    return [posts[post_id] for post_id in ranks if post_id in posts]
+
+def has_stale_search(db) -> bool:
+    return db.execute("SELECT 1 FROM search_stale LIMIT 1").fetchone() is not None
+
+def reindex_stale_posts() -> int:
+    """
+    Re-indexes posts changed from outside the app, e.g. in a sqlite3 shell.
+    App writes re-index as they go, so this only takes the write lock when
+    search_stale has rows. Run by the workers, never by a search.
+    """
+    with read_db() as db:
+        if not has_stale_search(db):
+            return 0
+    with write_db() as db:
+        return sync_search_index(db)
 
-        try:
-            db.execute("SELECT scheduled_at FROM blog_posts LIMIT 1")
-        except sqlite3.OperationalError:
-            print("Detected missing 'scheduled_at' column. Migrating...")
-            db.execute("ALTER TABLE blog_posts ADD COLUMN scheduled_at TEXT")
-            db.commit()
-            print("✅ Migration successful.")
+def save_signature(db, post_id: int, user_id: str, signed):
+    """
+    Stores a post's (encoded signature, shingle count) inside the caller's
+    transaction. Callers compute it with services.minhash.stored_signature,
+    outside the write lock.
+    """
+    signature, shingles = signed
+    db.execute(
+        """
+        INSERT OR REPLACE INTO post_signatures (post_id, user_id, signature, shingles, seq)
+        VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM post_signatures))
+        """,
+        (post_id, user_id, signature, shingles)
+    )
+
+def get_post_sections(post_id: int):
+    with read_db() as db:
+        rows = db.execute(
+            "SELECT position, kind, heading, points, content, status, error FROM post_sections WHERE post_id = ? ORDER BY position",
+            (post_id,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+def reset_post_sections(post_id: int, plan):
+    """Replaces a post's sections with a fresh pending plan of (kind, heading, points_json)."""
+    with write_db() as db:
+        db.execute("DELETE FROM post_sections WHERE post_id = ?", (post_id,))
+        db.executemany(
+            "INSERT INTO post_sections (post_id, position, kind, heading, points) VALUES (?, ?, ?, ?, ?)",
+            [(post_id, position, kind, heading, points) for position, (kind, heading, points) in enumerate(plan)]
+        )
+
+def save_post_section(post_id: int, position: int, content: str = None, error: str = None):
+    with write_db() as db:
+        db.execute(
+            """
+            UPDATE post_sections
+            SET content = COALESCE(?, content), status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE post_id = ? AND position = ?
+            """,
+            (content, "error" if error else "done", error, post_id, position)
+        )
 
-    finally:
-        db.close()
+def get_signatures_since(seq: int, limit: int = 1000):
+    with read_db() as db:
+        return db.execute(
+            "SELECT post_id, user_id, signature, shingles, seq FROM post_signatures WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, limit)
+        ).fetchall()
+
+def get_unsigned_posts(limit: int):
+    """Posts with content but no signature yet, for the similarity backfill."""
+    with read_db() as db:
+        return db.execute(
+            """
+            SELECT p.id, p.user_id, inflate(b.content) AS content
+            FROM post_bodies b JOIN blog_posts p ON p.id = b.post_id
+            WHERE b.content IS NOT NULL
+            AND b.post_id NOT IN (SELECT post_id FROM post_signatures)
+            LIMIT ?
+            """,
+            (limit,)
+        ).fetchall()
+
+def save_signatures(signed_posts):
+    """Stores (post_id, user_id, signed) tuples in one transaction."""
+    with write_db() as db:
+        for post_id, user_id, signed in signed_posts:
+            save_signature(db, post_id, user_id, signed)
+
+def get_post_events(user_id: str, after_id: int, limit: int = 100):
+    with read_db() as db:
+        rows = db.execute(
+            "SELECT id, post_id, status FROM post_events WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (user_id, after_id, limit)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+def get_latest_event_id(user_id: str) -> int:
+    with read_db() as db:
+        row = db.execute(
+            "SELECT MAX(id) AS id FROM post_events WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+    return row["id"] or 0
 
 def create_blog_post(topic: str, keywords: str, user_id: str = None) -> int:
-    db = get_db()
-    try:
-        cursor = db.cursor()
-        cursor.execute(
+    with write_db() as db:
+        cursor = db.execute(
             "INSERT INTO blog_posts (topic, keywords, status, user_id) VALUES (?, ?, ?, ?)",
             (topic, keywords, "RESEARCHING", user_id)
         )
-        db.commit()
-        return cursor.lastrowid
-    finally:
-        db.close()
+    emit("user_changed", user_id)
+    return cursor.lastrowid
+
+def create_blog_posts(items, user_id: str = None):
+    """Inserts many posts in one transaction. items: [(topic, keywords)]; returns their ids in order."""
+    with write_db() as db:
+        ids = [
+            db.execute(
+                "INSERT INTO blog_posts (topic, keywords, status, user_id) VALUES (?, ?, ?, ?)",
+                (topic, keywords, "RESEARCHING", user_id)
+            ).lastrowid
+            for topic, keywords in items
+        ]
+    emit("user_changed", user_id)
+    return ids
 
 def update_db_outline(post_id: int, outline_json: str):
-    db = get_db()
-    try:
-        cursor = db.cursor()
-        cursor.execute(
-            "UPDATE blog_posts SET outline = ?, status = 'OUTLINE_READY' WHERE id = ?",
-            (outline_json, post_id)
-        )
-        db.commit()
-    finally:
-        db.close()
+    with write_db() as db:
+        row = db.execute(
+            "UPDATE blog_posts SET status = 'OUTLINE_READY' WHERE id = ? RETURNING user_id",
+            (post_id,)
+        ).fetchone()
+        if row:
+            set_post_body(db, post_id, "outline", outline_json)
+    if row:
+        emit("user_changed", row["user_id"])
+
+def mark_post_error(post_id: int):
+    with write_db() as db:
+        row = db.execute(
+            "UPDATE blog_posts SET status = 'ERROR' WHERE id = ? RETURNING user_id", (post_id,)
+        ).fetchone()
+    if row:
+        emit("user_changed", row["user_id"])
+
+def get_post_for_research(post_id: int):
+    with read_db() as db:
+        return db.execute(
+            "SELECT topic, keywords FROM blog_posts WHERE id = ?",
+            (post_id,)
+        ).fetchone()
+
+def get_posts_for_research(post_ids):
+    """Posts from the list that still need research; deleted or finished ones drop out."""
+    with read_db() as db:
+        rows = db.execute(
+            f"""
+            SELECT id, topic, keywords FROM blog_posts
+            WHERE status = 'RESEARCHING' AND id IN ({', '.join('?' * len(post_ids))})
+            ORDER BY id
+            """,
+            list(post_ids)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+def get_posts_status(post_ids, user_id: str):
+    with read_db() as db:
+        rows = db.execute(
+            f"SELECT id, topic, status FROM blog_posts WHERE user_id = ? AND id IN ({', '.join('?' * len(post_ids))})",
+            [user_id] + list(post_ids)
+        ).fetchall()
+    return {row["id"]: dict(row) for row in rows}
 
 def get_post_for_generation(post_id: int):
-    db = get_db()
-    post = db.execute(
-        "SELECT topic, outline FROM blog_posts WHERE id = ?", 
-        (post_id,)
-    ).fetchone()
-    db.close()
-    return post
-
-def update_db_content(post_id: int, generated_text: str):
-    """Saves the full AI-generated blog post and updates status to Published"""
-    db = get_db()
-    try:
-        db.execute(
-            "UPDATE blog_posts SET content = ?, status = 'Published' WHERE id = ?",
-            (generated_text, post_id)
-        )
-        db.commit()
-    finally:
-        db.close()
+    with read_db() as db:
+        return db.execute(
+            """
+            SELECT p.topic, inflate(b.outline) AS outline
+            FROM blog_posts p LEFT JOIN post_bodies b ON b.post_id = p.id
+            WHERE p.id = ?
+            """,
+            (post_id,)
+        ).fetchone()
 
-def get_user_posts(user_id: str):
-    db = get_db()
-    try:
-        cursor = db.execute(
-            "SELECT * FROM blog_posts WHERE user_id = ? ORDER BY id DESC", 
-            (user_id,)
-        )
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
-    except Exception as e:
-        print(f"💥 SQL ERROR: {e}")
-        return []
-    finally:
-        db.close()
-
-
-def upgrade_database():
-    
-    conn = sqlite3.connect('blog_database.db') 
-    cursor = conn.cursor()
-    
-    try:
-        print("Checking for 'scheduled_at' column...")
-        cursor.execute("ALTER TABLE blog_posts ADD COLUMN scheduled_at TEXT")
-        conn.commit()
-        print("✅ Success! 'scheduled_at' column added to blog_posts table.")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e).lower():
-            print("ℹ️ Column already exists.")
-        else:
-            print(f"❌ Error: {e}")
-    finally:
-        conn.close()
+def save_partial_content(post_id: int, partial_text: str):
+    """
+    Checkpoints streamed content as the post's draft, without changing the
+    WRITING status. The search index and the post's version are updated
+    once, when update_db_content saves the finished article.
+    """
+    with write_db() as db:
+        set_post_body(db, post_id, "draft", partial_text)
+
+def update_db_content(post_id: int, generated_text: str, signed, if_idle: bool = False):
+    """
+    Saves the full AI-generated blog post and its signature, and updates
+    status to Published. With if_idle, a post that is being written is
+    left alone, so a late re-stitch can't overwrite a new generation.
+    """
+    status_check = " AND status != 'WRITING'" if if_idle else ""
+    with write_db() as db:
+        row = db.execute(
+            f"UPDATE blog_posts SET status = 'Published' WHERE id = ?{status_check} RETURNING user_id",
+            (post_id,)
+        ).fetchone()
+        if row:
+            set_post_body(db, post_id, "content", generated_text)
+            save_signature(db, post_id, row["user_id"], signed)
+    emit("content_changed", post_id)
+    if row:
+        emit("user_changed", row["user_id"])
+
+def get_upcoming_schedule(limit: int):
+    """(scheduled_epoch, id) of the earliest scheduled posts, straight off idx_blog_posts_due."""
+    with read_db() as db:
+        rows = db.execute(
+            """
+            SELECT scheduled_epoch, id FROM blog_posts
+            WHERE status = 'Scheduled' AND scheduled_epoch IS NOT NULL
+            ORDER BY scheduled_epoch LIMIT ?
+            """,
+            (limit,)
+        ).fetchall()
+    return [(row["scheduled_epoch"], row["id"]) for row in rows]
+
+def publish_due_posts(now: float, batch: int = 500):
+    """
+    Publishes every scheduled post due by `now`, `batch` rows per
+    transaction. The status check in the UPDATE makes this safe to run
+    from several processes at once. Returns the user ids that changed.
+    """
+    users = []
+    while True:
+        with write_db() as db:
+            rows = db.execute(
+                """
+                UPDATE blog_posts SET status = 'Published'
+                WHERE id IN (
+                    SELECT id FROM blog_posts
+                    WHERE status = 'Scheduled' AND scheduled_epoch <= ?
+                    ORDER BY scheduled_epoch LIMIT ?
+                )
+                RETURNING user_id
+                """,
+                (now, batch)
+            ).fetchall()
+        users.extend(row["user_id"] for row in rows)
+        if len(rows) < batch:
+            break
+    for user_id in set(users):
+        emit("user_changed", user_id)
+    return users
+
+def get_unnormalized_schedules():
+    with read_db() as db:
+        return db.execute(
+            "SELECT id, scheduled_at FROM blog_posts WHERE status = 'Scheduled' AND scheduled_epoch IS NULL AND scheduled_at IS NOT NULL"
+        ).fetchall()
+
+def set_schedule_epochs(epochs):
+    """epochs: [(scheduled_epoch, id)]"""
+    with write_db() as db:
+        db.executemany("UPDATE blog_posts SET scheduled_epoch = ? WHERE id = ?", epochs)
+
+def get_user_posts(user_id: str, limit: int = None, before_id: int = None, fields=SUMMARY_FIELDS, offset: int = 0,
+                   statuses=()):
+    """
+    Lists a user's posts newest first using the (user_id, id DESC) index.
+    Pass the last id of a page as before_id to fetch the next one; offset
+    and statuses are for the search route's numbered, filtered pages.
+    """
+    columns = ["id"] + [f for f in fields if f != "id" and f in SUMMARY_FIELDS]
+    query = f"SELECT {', '.join(columns)} FROM blog_posts WHERE user_id = ?"
+    params = [user_id]
+    if statuses:
+        query += f" AND status IN ({', '.join('?' * len(statuses))})"
+        params.extend(statuses)
+    if before_id is not None:
+        query += " AND id < ?"
+        params.append(before_id)
+    query += " ORDER BY id DESC"
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params.extend((limit, offset))
 
-if __name__ == "__main__":
-    upgrade_database()
\ No newline at end of file
+    # Errors propagate: an empty page would tell the client the list has ended.
+    with read_db() as db:
+        return [dict(row) for row in db.execute(query, params).fetchall()]
@@ -0,0 +1,39 @@
+"""
+Callbacks the service layer registers at startup (see main.py), so the
+database layer can announce what it did without importing services.
+
+    user_changed(user_id)                  a user's posts changed; wake their event stream
+    content_changed(post_id)               a post's title or body changed; drop its cached exports
+    db_wait(seconds, pool, role)           time spent waiting for a pooled connection
+    db_call(seconds, helper)               time a run_db() helper took
+
+A failing callback is logged and skipped; the write it reports has already committed.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+HOOKS = ("user_changed", "content_changed", "db_wait", "db_call")
+
+_callbacks = {name: [] for name in HOOKS}
+
+
+def register_hook(name: str, callback):
+    if name not in _callbacks:
+        raise ValueError(f"Unknown hook: {name}")
+    if callback not in _callbacks[name]:
+        _callbacks[name].append(callback)
+
+def has_hook(name: str) -> bool:
+    return bool(_callbacks[name])
+
+def emit(name: str, *args):
+    for callback in _callbacks[name]:
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.exception("%s hook failed", name)
+
+def clear_hooks():
+    for callbacks in _callbacks.values():
+        callbacks.clear()
@@ -0,0 +1,192 @@
+import json
+import os
+import random
+import time
+
+from database.db import read_db, write_db
+
+# Seconds a claimed job stays invisible to other workers before it can be reclaimed.
+VISIBILITY_TIMEOUT = {
+    "research": 300,
+    "write": 600,
+}
+RETRY_BASE_SECONDS = 5
+# Done jobs are kept this long for job status lookups, then pruned.
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# The two halves of a claim, each served by its own partial index. Params: (kind, now).
+CLAIM_QUEUED_QUERY = (
+    "SELECT id, run_after FROM jobs WHERE kind = ? AND status = 'queued' AND run_after <= ? "
+    "ORDER BY run_after, id LIMIT 1"
+)
+CLAIM_LEASED_QUERY = (
+    "SELECT id, run_after FROM jobs WHERE kind = ? AND status = 'running' AND locked_until <= ? "
+    "ORDER BY locked_until LIMIT 1"
+)
+
+
+def enqueue_job(kind: str, post_id: int = None, payload: dict = None, max_attempts: int = 3) -> int:
+    with write_db() as db:
+        cursor = db.execute(
+            "INSERT INTO jobs (kind, post_id, payload, max_attempts, run_after) VALUES (?, ?, ?, ?, ?)",
+            (kind, post_id, json.dumps(payload or {}), max_attempts, time.time())
+        )
+        return cursor.lastrowid
+
+def lease_job(kind: str, post_id: int, worker_id: str) -> dict:
+    """
+    Inserts a job already running on worker_id, for work that starts outside
+    the queue. It gets that one attempt; if its lease lapses, a worker
+    reclaims it like any other running job.
+    """
+    now = time.time()
+    with write_db() as db:
+        row = db.execute(
+            """
+            INSERT INTO jobs (kind, post_id, status, attempts, max_attempts, run_after, locked_until, worker_id)
+            VALUES (?, ?, 'running', 1, 1, ?, ?, ?)
+            RETURNING id, kind, post_id, payload, attempts, max_attempts
+            """,
+            (kind, post_id, now, now + VISIBILITY_TIMEOUT.get(kind, 300), worker_id)
+        ).fetchone()
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+def claim_job(kind: str, worker_id: str):
+    """
+    Atomically takes the oldest runnable job of a kind: either queued and due,
+    or running with an expired lease (its worker died or stalled). Each half
+    is its own indexed lookup; an OR of the two would scan the whole kind.
+    """
+    now = time.time()
+    with write_db() as db:
+        candidates = [
+            db.execute(CLAIM_QUEUED_QUERY, (kind, now)).fetchone(),
+            db.execute(CLAIM_LEASED_QUERY, (kind, now)).fetchone(),
+        ]
+        candidates = [row for row in candidates if row]
+        if not candidates:
+            return None
+        job_id = min(candidates, key=lambda row: (row["run_after"], row["id"]))["id"]
+        row = db.execute(
+            """
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, locked_until = ?, worker_id = ?
+            WHERE id = ?
+            RETURNING id, kind, post_id, payload, attempts, max_attempts
+            """,
+            (now + VISIBILITY_TIMEOUT.get(kind, 300), worker_id, job_id)
+        ).fetchone()
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+def extend_leases(jobs: dict, worker_id: str) -> int:
+    """
+    Heartbeat for {job_id: kind} still running on this worker, so a long job
+    isn't reclaimed while it is making progress. Returns how many were extended.
+    """
+    now = time.time()
+    with write_db() as db:
+        cursor = db.executemany(
+            "UPDATE jobs SET locked_until = ? WHERE id = ? AND worker_id = ? AND status = 'running'",
+            [(now + VISIBILITY_TIMEOUT.get(kind, 300), job_id, worker_id) for job_id, kind in jobs.items()]
+        )
+        return cursor.rowcount
+
+def complete_job(job_id: int):
+    with write_db() as db:
+        db.execute(
+            "UPDATE jobs SET status = 'done', locked_until = NULL, last_error = NULL, finished_at = ? WHERE id = ?",
+            (time.time(), job_id)
+        )
+
+def prune_finished_jobs(retention: float = JOB_RETENTION_SECONDS) -> int:
+    """Deletes done jobs older than the retention; failed ones stay for inspection."""
+    with write_db() as db:
+        cursor = db.execute(
+            "DELETE FROM jobs WHERE status = 'done' AND finished_at < ?", (time.time() - retention,)
+        )
+        return cursor.rowcount
+
+def fail_job(job: dict, error: str) -> bool:
+    """Schedules a retry with jittered exponential backoff. Returns False once attempts run out."""
+    retry = job["attempts"] < job["max_attempts"]
+    with write_db() as db:
+        if retry:
+            delay = RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+            delay += random.uniform(0, delay / 2)
+            db.execute(
+                "UPDATE jobs SET status = 'queued', run_after = ?, locked_until = NULL, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, job["id"])
+            )
+        else:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', locked_until = NULL, last_error = ?, finished_at = ? WHERE id = ?",
+                (error, time.time(), job["id"])
+            )
+    return retry
+
+def release_dead_workers(is_alive) -> int:
+    """Re-queues running jobs whose worker process is known to be gone."""
+    with write_db() as db:
+        rows = db.execute("SELECT id, worker_id FROM jobs WHERE status = 'running'").fetchall()
+        dead = [row["id"] for row in rows if not is_alive(row["worker_id"])]
+        db.executemany(
+            "UPDATE jobs SET status = 'queued', run_after = ?, locked_until = NULL WHERE id = ?",
+            [(time.time(), job_id) for job_id in dead]
+        )
+    return len(dead)
+
+def enqueue_orphaned_posts() -> int:
+    """
+    Queues work for posts stuck in RESEARCHING/WRITING with no live job
+    behind them. Posts streamed by /generate/stream hold a job of their own
+    (see lease_job), so they are left alone while that stream runs.
+    """
+    stage_for_status = {"RESEARCHING": "research", "WRITING": "write"}
+    with write_db() as db:
+        rows = db.execute(
+            """
+            SELECT p.id, p.status FROM blog_posts p
+            WHERE p.status IN ('RESEARCHING', 'WRITING')
+            AND NOT EXISTS (
+                SELECT 1 FROM jobs j
+                WHERE j.post_id = p.id AND j.status IN ('queued', 'running')
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM jobs j, json_each(j.payload, '$.post_ids') batch
+                WHERE j.post_id IS NULL AND j.status IN ('queued', 'running')
+                AND batch.value = p.id
+            )
+            """
+        ).fetchall()
+        now = time.time()
+        db.executemany(
+            "INSERT INTO jobs (kind, post_id, payload, run_after) VALUES (?, ?, '{}', ?)",
+            [(stage_for_status[row["status"]], row["id"], now) for row in rows]
+        )
+    return len(rows)
+
+def get_job(job_id: int):
+    with read_db() as db:
+        row = db.execute(
+            "SELECT id, kind, post_id, payload, status, attempts, last_error FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+    if not row:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+def job_stats() -> dict:
+    with read_db() as db:
+        rows = db.execute(
+            "SELECT kind, status, COUNT(*) AS count FROM jobs GROUP BY kind, status"
+        ).fetchall()
+    stats = {}
+    for row in rows:
+        stats.setdefault(row["kind"], {})[row["status"]] = row["count"]
+    return stats
@@ -0,0 +1,797 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once, in order, inside its own write transaction, and
+is recorded in schema_migrations. Migrations stay idempotent so databases
+created before this table existed (which already have some of the schema)
+upgrade cleanly. When the schema is current, startup is a single SELECT.
+
+Run `python -m database.migrations` to migrate blog_posts.db and print the
+query plans of the hot queries.
+"""
+import logging
+import re
+import sqlite3
+import time
+
+from database.compression import register_functions
+
+logger = logging.getLogger(__name__)
+
+
+def has_column(db, table: str, column: str) -> bool:
+    return any(row[1] == column for row in db.execute(f"PRAGMA table_info({table})"))
+
+def add_column(db, table: str, column: str, definition: str):
+    if not has_column(db, table, column):
+        logger.info("Adding missing column %s.%s", table, column)
+        db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def create_blog_posts(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS blog_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT NOT NULL,
+            keywords TEXT NOT NULL,
+            outline TEXT,
+            content TEXT,
+            status TEXT DEFAULT 'RESEARCHING',
+            user_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            scheduled_at TEXT
+        )
+    ''')
+    add_column(db, "blog_posts", "scheduled_at", "TEXT")
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_blog_posts_user_id ON blog_posts (user_id, id DESC)"
+    )
+
+def create_job_table(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            post_id INTEGER,
+            payload TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_after REAL NOT NULL,
+            locked_until REAL,
+            worker_id TEXT,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (kind, status, run_after)"
+    )
+
+def create_event_log(db):
+    """
+    Every status change is appended to post_events by triggers, so the
+    per-user event stream sees transitions made by any process.
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS post_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            post_id INTEGER NOT NULL,
+            status TEXT,
+            created_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+        )
+    ''')
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_post_events_user_id ON post_events (user_id, id)"
+    )
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_event_insert AFTER INSERT ON blog_posts BEGIN
+            INSERT INTO post_events (user_id, post_id, status) VALUES (new.user_id, new.id, new.status);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_event_update AFTER UPDATE OF status ON blog_posts
+        WHEN old.status IS NOT new.status BEGIN
+            INSERT INTO post_events (user_id, post_id, status) VALUES (new.user_id, new.id, new.status);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_event_delete AFTER DELETE ON blog_posts BEGIN
+            INSERT INTO post_events (user_id, post_id, status) VALUES (old.user_id, old.id, 'DELETED');
+        END
+    ''')
+
+def create_signature_table(db):
+    """
+    MinHash signatures for the similarity index. Deleting a post leaves a
+    tombstone (NULL signature) with a fresh seq so every process's
+    in-memory index can drop it on its next refresh.
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS post_signatures (
+            post_id INTEGER PRIMARY KEY,
+            user_id TEXT,
+            signature BLOB,
+            shingles INTEGER NOT NULL DEFAULT 0,
+            seq INTEGER NOT NULL
+        )
+    ''')
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_post_signatures_seq ON post_signatures (seq)"
+    )
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_signature_delete AFTER DELETE ON blog_posts BEGIN
+            UPDATE post_signatures
+            SET signature = NULL, shingles = 0,
+                seq = (SELECT MAX(seq) FROM post_signatures) + 1
+            WHERE post_id = old.id;
+        END
+    ''')
+
+def create_section_table(db):
+    """Per-section drafts from the parallel writer, so one section can be redone alone."""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS post_sections (
+            post_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            heading TEXT NOT NULL,
+            points TEXT NOT NULL DEFAULT '[]',
+            content TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (post_id, position)
+        )
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_sections_delete AFTER DELETE ON blog_posts BEGIN
+            DELETE FROM post_sections WHERE post_id = old.id;
+        END
+    ''')
+
+def add_schedule_epoch(db):
+    add_column(db, "blog_posts", "scheduled_epoch", "REAL")
+    # Only scheduled posts are indexed, so finding the next due one is a single seek.
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_blog_posts_due ON blog_posts (scheduled_epoch) WHERE status = 'Scheduled'"
+    )
+
+def add_hot_path_indexes(db):
+    # Orphan recovery looks up posts still in the pipeline. Partial, so the
+    # planner keeps using idx_blog_posts_due for the scheduler's queries.
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_blog_posts_pipeline ON blog_posts (status) WHERE status IN ('RESEARCHING', 'WRITING')"
+    )
+    # ...and checks each one for a live job; post_id IS NULL finds batch jobs.
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_post ON jobs (post_id, status)"
+    )
+    # Dead-worker recovery lists running jobs of every kind.
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)"
+    )
+    # Event retention deletes by age.
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_post_events_created ON post_events (created_at)"
+    )
+
+def move_bodies_to_side_table(db):
+    """
+    Moves outline and content out of blog_posts into post_bodies,
+    compressed (see database/compression.py), and builds blog_posts_fts,
+    a contentless full-text index (content='') so the compressed blob is the only
+    full copy of each body. An owner column, hex(user_id) as one exact
+    token, lets a MATCH walk only the caller's posts; prefix indexes cover
+    the one- to three-character prefixes the search box sends while
+    typing, and the column weights are the table's default rank.
+
+    A contentless index can only forget a row through a 'delete' that
+    repeats exactly what was indexed, and the triggers can't inflate the
+    old body. So they stay plain SQL by saving the indexed values of a
+    post in search_stale the first time it changes, and
+    database.db.sync_search_index() re-indexes those posts on the app's
+    connection: set_post_body() does it with the plain text it was given,
+    deletes and edits through the app right away, changes made from a
+    sqlite3 shell on the workers' next heartbeat or start. Post bodies
+    must only be written through set_post_body(). draft holds checkpoints
+    of an article being streamed; no trigger watches it.
+    (contentless_delete=1 would allow plain DELETEs, but needs SQLite 3.43.)
+    Needs the inflate/pack_text SQL functions on this connection, once.
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS post_bodies (
+            post_id INTEGER PRIMARY KEY,
+            outline,
+            content,
+            draft
+        )
+    ''')
+    if has_column(db, "blog_posts", "content"):
+        moved = db.execute('''
+            INSERT OR REPLACE INTO post_bodies (post_id, outline, content)
+            SELECT id, pack_text(outline), pack_text(content) FROM blog_posts
+            WHERE outline IS NOT NULL OR content IS NOT NULL
+        ''').rowcount
+        if moved:
+            logger.info("Moved %d post bodies to post_bodies", moved)
+        db.execute("ALTER TABLE blog_posts DROP COLUMN outline")
+        db.execute("ALTER TABLE blog_posts DROP COLUMN content")
+
+    db.execute('''
+        CREATE VIRTUAL TABLE blog_posts_fts USING fts5(
+            topic,
+            keywords,
+            content,
+            owner,
+            content='',
+            detail=column,
+            prefix='1 2 3',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    db.execute(
+        "INSERT INTO blog_posts_fts (blog_posts_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0, 0.0)')"
+    )
+    # content holds the post_bodies value as indexed: compressed, or NULL for no body.
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS search_stale (
+            post_id INTEGER PRIMARY KEY,
+            topic TEXT,
+            keywords TEXT,
+            content,
+            owner TEXT
+        )
+    ''')
+    db.execute("DELETE FROM search_stale")
+    # DO NOTHING keeps the first saved values: those are the ones still indexed.
+    db.execute('''
+        CREATE TRIGGER blog_posts_fts_insert AFTER INSERT ON blog_posts BEGIN
+            INSERT INTO blog_posts_fts (rowid, topic, keywords, owner)
+            VALUES (new.id, new.topic, new.keywords, hex(new.user_id));
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER blog_posts_fts_update AFTER UPDATE OF topic, keywords, user_id ON blog_posts BEGIN
+            INSERT INTO search_stale (post_id, topic, keywords, content, owner)
+            VALUES (old.id, old.topic, old.keywords,
+                    (SELECT content FROM post_bodies WHERE post_id = old.id), hex(old.user_id))
+            ON CONFLICT (post_id) DO NOTHING;
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER blog_posts_fts_delete AFTER DELETE ON blog_posts BEGIN
+            INSERT INTO search_stale (post_id, topic, keywords, content, owner)
+            VALUES (old.id, old.topic, old.keywords,
+                    (SELECT content FROM post_bodies WHERE post_id = old.id), hex(old.user_id))
+            ON CONFLICT (post_id) DO NOTHING;
+            DELETE FROM post_bodies WHERE post_id = old.id;
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER post_bodies_fts_insert AFTER INSERT ON post_bodies
+        WHEN new.content IS NOT NULL BEGIN
+            INSERT INTO search_stale (post_id, topic, keywords, content, owner)
+            SELECT id, topic, keywords, NULL, hex(user_id) FROM blog_posts WHERE id = new.post_id
+            ON CONFLICT (post_id) DO NOTHING;
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER post_bodies_fts_update AFTER UPDATE OF content ON post_bodies
+        WHEN old.content IS NOT new.content BEGIN
+            INSERT INTO search_stale (post_id, topic, keywords, content, owner)
+            SELECT id, topic, keywords, old.content, hex(user_id) FROM blog_posts WHERE id = old.post_id
+            ON CONFLICT (post_id) DO NOTHING;
+        END
+    ''')
+
+    logger.info("Building full-text search index")
+    db.execute('''
+        INSERT INTO blog_posts_fts (rowid, topic, keywords, content, owner)
+        SELECT p.id, p.topic, p.keywords, inflate(b.content), hex(p.user_id)
+        FROM blog_posts p LEFT JOIN post_bodies b ON b.post_id = p.id
+    ''')
+    logger.info("Search index ready")
+
+
+# Seconds since the epoch, as SQL; the clock post_events uses.
+SQL_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+def create_post_stats(db):
+    """
+    Per-user analytics kept current by triggers, so every write path (API,
+    workers, scheduler) updates them in the post's own transaction.
+    user_post_counts holds posts per status; user_post_daily the day's
+    creations, publications and research/generation durations.
+    blog_posts.status_since records when a post entered its status and
+    published_at when it was first published, so a post edited or
+    regenerated and published again is counted once. Generation durations
+    still count every WRITING -> Published run.
+    Posts without an owner are counted under user_id ''.
+    """
+    add_column(db, "blog_posts", "status_since", "REAL")
+    add_column(db, "blog_posts", "published_at", "REAL")
+    db.execute(f'''
+        UPDATE blog_posts
+        SET status_since = COALESCE((julianday(created_at) - 2440587.5) * 86400.0, {SQL_NOW})
+        WHERE status_since IS NULL
+    ''')
+    # Posts published and since unpublished can't be told apart; they will count once more.
+    db.execute('''
+        UPDATE blog_posts SET published_at = status_since
+        WHERE status = 'Published' AND published_at IS NULL
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS user_post_counts (
+            user_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, status)
+        ) WITHOUT ROWID
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS user_post_daily (
+            user_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            created INTEGER NOT NULL DEFAULT 0,
+            published INTEGER NOT NULL DEFAULT 0,
+            researched INTEGER NOT NULL DEFAULT 0,
+            research_seconds REAL NOT NULL DEFAULT 0,
+            generated INTEGER NOT NULL DEFAULT 0,
+            generation_seconds REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_stats_insert AFTER INSERT ON blog_posts BEGIN
+            INSERT INTO user_post_counts (user_id, status, count)
+            VALUES (COALESCE(new.user_id, ''), COALESCE(new.status, ''), 1)
+            ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+            INSERT INTO user_post_daily (user_id, day, created, published)
+            VALUES (COALESCE(new.user_id, ''), date('now'), 1, new.status = 'Published')
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                created = created + 1, published = published + excluded.published;
+            UPDATE blog_posts SET
+                status_since = {SQL_NOW},
+                published_at = CASE WHEN new.status = 'Published' THEN {SQL_NOW} END
+            WHERE id = new.id;
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_stats_update AFTER UPDATE OF status ON blog_posts
+        WHEN old.status IS NOT new.status BEGIN
+            UPDATE user_post_counts SET count = count - 1
+            WHERE user_id = COALESCE(old.user_id, '') AND status = COALESCE(old.status, '');
+            INSERT INTO user_post_counts (user_id, status, count)
+            VALUES (COALESCE(new.user_id, ''), COALESCE(new.status, ''), 1)
+            ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+            INSERT INTO user_post_daily (user_id, day, published, researched, research_seconds, generated, generation_seconds)
+            VALUES (
+                COALESCE(new.user_id, ''), date('now'),
+                new.status = 'Published' AND old.published_at IS NULL,
+                old.status = 'RESEARCHING' AND new.status = 'OUTLINE_READY',
+                CASE WHEN old.status = 'RESEARCHING' AND new.status = 'OUTLINE_READY'
+                     THEN MAX({SQL_NOW} - old.status_since, 0) ELSE 0 END,
+                old.status = 'WRITING' AND new.status = 'Published',
+                CASE WHEN old.status = 'WRITING' AND new.status = 'Published'
+                     THEN MAX({SQL_NOW} - old.status_since, 0) ELSE 0 END
+            )
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                published = published + excluded.published,
+                researched = researched + excluded.researched,
+                research_seconds = research_seconds + excluded.research_seconds,
+                generated = generated + excluded.generated,
+                generation_seconds = generation_seconds + excluded.generation_seconds;
+            UPDATE blog_posts SET
+                status_since = {SQL_NOW},
+                published_at = COALESCE(published_at, CASE WHEN new.status = 'Published' THEN {SQL_NOW} END)
+            WHERE id = new.id;
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_stats_delete AFTER DELETE ON blog_posts BEGIN
+            UPDATE user_post_counts SET count = count - 1
+            WHERE user_id = COALESCE(old.user_id, '') AND status = COALESCE(old.status, '');
+        END
+    ''')
+
+    # Existing posts: exact counts, and creations on the day they were created.
+    # Publications and durations before this migration weren't recorded anywhere.
+    db.execute("DELETE FROM user_post_counts")
+    db.execute('''
+        INSERT INTO user_post_counts (user_id, status, count)
+        SELECT COALESCE(user_id, ''), COALESCE(status, ''), COUNT(*) FROM blog_posts GROUP BY 1, 2
+    ''')
+    db.execute('''
+        INSERT OR IGNORE INTO user_post_daily (user_id, day, created)
+        SELECT COALESCE(user_id, ''), date(created_at), COUNT(*) FROM blog_posts
+        WHERE created_at IS NOT NULL GROUP BY 1, 2
+    ''')
+
+def create_post_versions(db):
+    """
+    A change counter per user, bumped by triggers whenever a post or its
+    body is inserted, changed or deleted, from any process.
+    blog_posts.version is the owner's counter at the post's last change and
+    post_tombstones the counter at each deletion; ETags and `since=` deltas
+    are built from them. pruned_through is the newest tombstone dropped by
+    retention. Posts without an owner are versioned under user_id ''.
+    """
+    add_column(db, "blog_posts", "version", "INTEGER NOT NULL DEFAULT 1")
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS user_versions (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            pruned_through INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    db.execute(f'''
+        CREATE TABLE IF NOT EXISTS post_tombstones (
+            post_id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            deleted_at REAL NOT NULL DEFAULT {SQL_NOW}
+        )
+    ''')
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_post_tombstones_user_version ON post_tombstones (user_id, version)"
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_blog_posts_user_version ON blog_posts (user_id, version)"
+    )
+
+    def bump(user: str) -> str:
+        return f'''
+            INSERT INTO user_versions (user_id, version) VALUES ({user}, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        '''
+
+    def stamp(user: str, post: str) -> str:
+        # version is in no trigger's column list, so this fires nothing else.
+        return f'''
+            UPDATE blog_posts SET version = (SELECT version FROM user_versions WHERE user_id = {user})
+            WHERE id = {post};
+        '''
+
+    owner = "COALESCE(new.user_id, '')"
+    body_owner = "COALESCE((SELECT user_id FROM blog_posts WHERE id = new.post_id), '')"
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_version_insert AFTER INSERT ON blog_posts BEGIN
+            {bump(owner)}
+            {stamp(owner, "new.id")}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_version_update
+        AFTER UPDATE OF topic, keywords, status, scheduled_at ON blog_posts
+        WHEN old.topic IS NOT new.topic OR old.keywords IS NOT new.keywords
+          OR old.status IS NOT new.status OR old.scheduled_at IS NOT new.scheduled_at BEGIN
+            {bump(owner)}
+            {stamp(owner, "new.id")}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS post_bodies_version_insert AFTER INSERT ON post_bodies BEGIN
+            {bump(body_owner)}
+            {stamp(body_owner, "new.post_id")}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS post_bodies_version_update AFTER UPDATE OF outline, content ON post_bodies
+        WHEN old.outline IS NOT new.outline OR old.content IS NOT new.content BEGIN
+            {bump(body_owner)}
+            {stamp(body_owner, "new.post_id")}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS blog_posts_version_delete AFTER DELETE ON blog_posts BEGIN
+            {bump("COALESCE(old.user_id, '')")}
+            INSERT OR REPLACE INTO post_tombstones (post_id, user_id, version)
+            SELECT old.id, user_id, version FROM user_versions WHERE user_id = COALESCE(old.user_id, '');
+        END
+    ''')
+
+    # Existing posts all start at version 1, so since=0 returns every one.
+    db.execute('''
+        INSERT OR IGNORE INTO user_versions (user_id, version)
+        SELECT DISTINCT COALESCE(user_id, ''), 1 FROM blog_posts
+    ''')
+
+def split_job_claim_indexes(db):
+    """
+    idx_jobs_claim (kind, status, run_after) can't serve the claim's
+    "queued and due OR lease expired" filter, so claims scanned every job
+    of a kind and sorted them. Each half now has its own partial index,
+    and finished_at lets done jobs be pruned by age.
+    """
+    add_column(db, "jobs", "finished_at", "REAL")
+    db.execute(
+        "UPDATE jobs SET finished_at = ? WHERE status IN ('done', 'failed') AND finished_at IS NULL", (time.time(),)
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs (kind, run_after, id) WHERE status = 'queued'"
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_leased ON jobs (kind, locked_until) WHERE status = 'running'"
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (status, finished_at)"
+    )
+    db.execute("DROP INDEX IF EXISTS idx_jobs_claim")
+
+def create_stream_tickets(db):
+    """
+    Single-use tickets for GET /api/events. EventSource can't send an
+    Authorization header, so clients trade their ID token for a ticket and
+    put that in the URL instead. Only a hash of each ticket is stored.
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS stream_tickets (
+            ticket_hash TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def index_search_positions(db):
+    """
+    Rebuilds blog_posts_fts with term positions (detail=full). A
+    contentless index with detail=column can't count a word's
+    occurrences, so bm25() scored every match 0 and search results came
+    back in rowid order. Settings and the owner column are otherwise
+    those of migration 8; the rebuilt index is current, so search_stale
+    is cleared. Needs the inflate SQL function on this connection.
+    """
+    db.execute("DROP TABLE blog_posts_fts")
+    db.execute('''
+        CREATE VIRTUAL TABLE blog_posts_fts USING fts5(
+            topic,
+            keywords,
+            content,
+            owner,
+            content='',
+            prefix='1 2 3',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    db.execute(
+        "INSERT INTO blog_posts_fts (blog_posts_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0, 0.0)')"
+    )
+    logger.info("Rebuilding full-text search index")
+    db.execute('''
+        INSERT INTO blog_posts_fts (rowid, topic, keywords, content, owner)
+        SELECT p.id, p.topic, p.keywords, inflate(b.content), hex(p.user_id)
+        FROM blog_posts p LEFT JOIN post_bodies b ON b.post_id = p.id
+    ''')
+    db.execute("DELETE FROM search_stale")
+    logger.info("Search index ready")
+
+# Append only: never renumber or edit a migration that has shipped.
+MIGRATIONS = (
+    (1, "blog_posts", create_blog_posts),
+    (2, "jobs", create_job_table),
+    (3, "post_events", create_event_log),
+    (4, "post_signatures", create_signature_table),
+    (5, "post_sections", create_section_table),
+    (6, "scheduled_epoch", add_schedule_epoch),
+    (7, "hot_path_indexes", add_hot_path_indexes),
+    (8, "post_bodies", move_bodies_to_side_table),
+    (9, "post_stats", create_post_stats),
+    (10, "post_versions", create_post_versions),
+    (11, "job_claim_indexes", split_job_claim_indexes),
+    (12, "stream_tickets", create_stream_tickets),
+    (13, "search_positions", index_search_positions),
+)
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(db) -> int:
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at REAL NOT NULL
+        )
+    ''')
+    return db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+def migrate(db, target: int = LATEST_VERSION) -> int:
+    """
+    Brings the schema up to `target`, LATEST_VERSION unless a benchmark
+    wants an older schema. Each step takes the write lock first and
+    re-checks the version, so an API process and a worker starting
+    together never apply the same migration twice.
+    Returns how many migrations were applied.
+    """
+    if schema_version(db) >= target:
+        return 0
+
+    applied = 0
+    for version, name, migration in MIGRATIONS:
+        if version > target:
+            break
+        if db.in_transaction:
+            db.commit()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(db) >= version:
+                db.rollback()
+                continue
+            started = time.perf_counter()
+            migration(db)
+            db.execute(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, time.time())
+            )
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        applied += 1
+        logger.info("Migration %d (%s) applied in %.2fs", version, name, time.perf_counter() - started)
+    return applied
+
+
+# Queries on request and worker hot paths, with the index each one must use.
+HOT_QUERIES = {
+    "dashboard page": (
+        "SELECT id, topic, status FROM blog_posts WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+        ("u", 1000, 20), "idx_blog_posts_user_id"
+    ),
+    "post by owner": (
+        "SELECT * FROM blog_posts WHERE id = ? AND user_id = ?", (1, "u"), "INTEGER PRIMARY KEY"
+    ),
+    "post body": (
+        "SELECT content FROM post_bodies WHERE post_id = ?", (1,), "INTEGER PRIMARY KEY"
+    ),
+    "next scheduled": (
+        "SELECT scheduled_epoch, id FROM blog_posts WHERE status = 'Scheduled' AND scheduled_epoch IS NOT NULL ORDER BY scheduled_epoch LIMIT ?",
+        (100,), "idx_blog_posts_due"
+    ),
+    "publish due": (
+        "SELECT id FROM blog_posts WHERE status = 'Scheduled' AND scheduled_epoch <= ? ORDER BY scheduled_epoch LIMIT ?",
+        (0, 500), "idx_blog_posts_due"
+    ),
+    "posts in pipeline": (
+        "SELECT id, status FROM blog_posts WHERE status IN ('RESEARCHING', 'WRITING')", (), "idx_blog_posts_pipeline"
+    ),
+    "live job for post": (
+        "SELECT 1 FROM jobs WHERE post_id = ? AND status IN ('queued', 'running')", (1,), "idx_jobs_post"
+    ),
+    "live batch jobs": (
+        "SELECT payload FROM jobs WHERE post_id IS NULL AND status IN ('queued', 'running')", (), "idx_jobs_post"
+    ),
+    "finished job retention": (
+        "SELECT id FROM jobs WHERE status = 'done' AND finished_at < ?", (0,), "idx_jobs_finished"
+    ),
+    "running jobs": ("SELECT id, worker_id FROM jobs WHERE status = 'running'", (), "idx_jobs_status"),
+    "user events": (
+        "SELECT id, post_id, status FROM post_events WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+        ("u", 0, 100), "idx_post_events_user_id"
+    ),
+    "event retention": (
+        "SELECT id FROM post_events WHERE created_at < ?", (0,), "idx_post_events_created"
+    ),
+    "post sections": (
+        "SELECT * FROM post_sections WHERE post_id = ? ORDER BY position", (1,), "sqlite_autoindex_post_sections_1"
+    ),
+    "user status counts": (
+        "SELECT status, count FROM user_post_counts WHERE user_id = ?", ("u",), "PRIMARY KEY"
+    ),
+    "user daily rollups": (
+        "SELECT * FROM user_post_daily WHERE user_id = ? AND day >= ? ORDER BY day", ("u", "2000-01-01"), "PRIMARY KEY"
+    ),
+    "user version": (
+        "SELECT version, pruned_through FROM user_versions WHERE user_id = ?", ("u",), "PRIMARY KEY"
+    ),
+    "posts changed since": (
+        "SELECT id FROM blog_posts WHERE user_id = ? AND version > ? ORDER BY version", ("u", 0),
+        "idx_blog_posts_user_version"
+    ),
+    "posts deleted since": (
+        "SELECT post_id FROM post_tombstones WHERE user_id = ? AND version > ? ORDER BY version", ("u", 0),
+        "idx_post_tombstones_user_version"
+    ),
+    "redeem stream ticket": (
+        "DELETE FROM stream_tickets WHERE ticket_hash = ? RETURNING user_id, expires_at", ("h",), "PRIMARY KEY"
+    ),
+    "signatures since": (
+        "SELECT post_id FROM post_signatures WHERE seq > ? ORDER BY seq LIMIT ?", (0, 1000), "idx_post_signatures_seq"
+    ),
+}
+
+
+def hot_queries() -> dict:
+    """
+    HOT_QUERIES plus the queries the app ships as constants, taken from the
+    modules that run them so a change there is checked here.
+    """
+    from database.db import FULL_POST_QUERY, SEARCH_RANK_QUERY, SEARCH_RANK_STATUS_QUERY, SEARCH_PAGE_QUERY
+    from database.jobs import CLAIM_QUEUED_QUERY, CLAIM_LEASED_QUERY
+    from services.bulk_export import SELECT_POSTS_QUERY, BULK_EXPORT_BATCH
+
+    owner_match = f'owner : "{"u".encode().hex()}" AND {{topic keywords content}} : ("w"*)'
+    return {
+        **HOT_QUERIES,
+        "full post": (FULL_POST_QUERY + " WHERE p.id = ? AND p.user_id = ?", (1, "u"), "INTEGER PRIMARY KEY"),
+        "search": (SEARCH_RANK_QUERY, (owner_match,), "blog_posts_fts VIRTUAL TABLE INDEX"),
+        "search by status": (
+            SEARCH_RANK_STATUS_QUERY.format(statuses="?"), (owner_match, "Published"), "blog_posts_fts VIRTUAL TABLE INDEX"
+        ),
+        "search page": (SEARCH_PAGE_QUERY.format(ids="?, ?"), ("u", 1, 2), "INTEGER PRIMARY KEY"),
+        "claim queued job": (CLAIM_QUEUED_QUERY, ("research", 0), "idx_jobs_queued"),
+        "claim expired lease": (CLAIM_LEASED_QUERY, ("research", 0), "idx_jobs_leased"),
+        "bulk export page": (
+            SELECT_POSTS_QUERY.format(where="user_id = ? AND id > ? AND status = ?", batch=BULK_EXPORT_BATCH),
+            ("u", 0, "Published"), "idx_blog_posts_user_id"
+        ),
+    }
+
+
+def query_plan(db, query: str, params) -> list:
+    return [row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+def where_text(query: str) -> str:
+    return " ".join(re.findall(r"\bWHERE\b(.*?)(?=\bORDER BY\b|\bGROUP BY\b|\bLIMIT\b|$)", query, re.S | re.I))
+
+def plan_problems(db, query: str, plan, index: str) -> list:
+    """
+    What is wrong with a plan: the expected index isn't searched, a table is
+    scanned, rows are sorted in a temp B-tree, or a multi-column index is
+    searched on fewer key columns than the WHERE clause constrains.
+    """
+    problems = []
+    if not any(index in step and (step.startswith("SEARCH ") or "VIRTUAL TABLE" in step) for step in plan):
+        problems.append(f"doesn't search {index}")
+
+    tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for step in plan:
+        words = step.split()
+        if words[0] == "SCAN" and words[1] in tables and "VIRTUAL TABLE" not in step:
+            problems.append(step)
+        if step.startswith("USE TEMP B-TREE"):
+            problems.append(step)
+
+    filtered = where_text(query)
+    for step in plan:
+        found = re.search(r"USING (?:COVERING )?INDEX (\w+) \((.*)\)", step)
+        if not found:
+            continue
+        columns = [row[2] for row in db.execute(f"PRAGMA index_info({found.group(1)})")]
+        used = len(found.group(2).split(" AND "))
+        if used < len(columns) and re.search(rf"\b{columns[used]}\b", filtered):
+            problems.append(f"{step} stops before {columns[used]}")
+    return problems
+
+def check_query_plans(db, queries: dict = None) -> list:
+    """Returns (name, problems) for every hot query whose plan isn't what its index promises."""
+    failures = []
+    for name, (query, params, index) in (queries or hot_queries()).items():
+        problems = plan_problems(db, query, query_plan(db, query, params), index)
+        if problems:
+            failures.append((name, problems))
+    return failures
+
+
+if __name__ == "__main__":
+    from database.db import DB_NAME
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    conn = sqlite3.connect(DB_NAME)
+    register_functions(conn)
+    try:
+        migrate(conn)
+        print(f"Schema version {schema_version(conn)}")
+        for name, (query, params, _) in hot_queries().items():
+            print(f"{name}: {'; '.join(query_plan(conn, query, params))}")
+        failures = check_query_plans(conn)
+        for name, problems in failures:
+            print(f"❌ {name}: {'; '.join(problems)}")
+        if failures:
+            raise SystemExit(1)
+        print("✅ Every hot query uses its index")
+    finally:
+        conn.close()
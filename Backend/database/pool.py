@@ -0,0 +1,225 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from database.compression import register_functions
+from database.hooks import emit
+
+# Applied to every connection the pool opens. WAL lets readers run while the
+# single writer holds its lock; NORMAL sync is durable across app crashes in WAL.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 20000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+_local = threading.local()
+
+
+class QueryCancelled(sqlite3.OperationalError):
+    pass
+
+
+class CancelToken:
+    """Lets another thread abort whatever query the owning thread is running."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        with self._lock:
+            self.check()
+            self._conn = conn
+
+    def detach(self):
+        with self._lock:
+            self._conn = None
+
+    def check(self):
+        if self.cancelled:
+            raise QueryCancelled("Query cancelled")
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                self._conn.interrupt()
+
+
+def current_cancel_token():
+    return getattr(_local, "token", None)
+
+
+def set_cancel_token(token):
+    _local.token = token
+
+
+class ConnectionPool:
+    """One shared writer connection plus a bounded set of reader connections."""
+
+    def __init__(self, path: str, readers: int = 4, statement_cache: int = 256, timeout: float = 20):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.max_readers = readers
+        self.statement_cache = statement_cache
+        self.timeout = timeout
+
+        self._idle_readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "readers_in_use": 0,
+            "writer_in_use": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "checkout_seconds_total": 0.0,
+            "checkout_seconds_max": 0.0,
+        }
+
+    # ---------------- CONNECTIONS ----------------
+    def _connect(self, readonly: bool = False):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        conn.row_factory = sqlite3.Row
+        register_functions(conn)
+        conn.execute("PRAGMA journal_mode = WAL")
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _record_checkout(self, started: float, waited: bool, kind: str):
+        elapsed = time.perf_counter() - started
+        emit("db_wait", elapsed, self.name, "writer" if kind == "writer_in_use" else "reader")
+        with self._stats_lock:
+            self._stats[kind] += 1
+            self._stats["checkouts"] += 1
+            self._stats["checkout_seconds_total"] += elapsed
+            self._stats["checkout_seconds_max"] = max(self._stats["checkout_seconds_max"], elapsed)
+            if waited:
+                self._stats["waits"] += 1
+
+    def _record_release(self, kind: str):
+        with self._stats_lock:
+            self._stats[kind] -= 1
+
+    def _checkout_reader(self):
+        started = time.perf_counter()
+        try:
+            conn = self._idle_readers.get_nowait()
+            self._record_checkout(started, False, "readers_in_use")
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._reader_lock:
+            can_grow = self._reader_count < self.max_readers
+            if can_grow:
+                self._reader_count += 1
+        if can_grow:
+            try:
+                conn = self._connect(readonly=True)
+            except Exception:
+                with self._reader_lock:
+                    self._reader_count -= 1
+                raise
+            self._record_checkout(started, False, "readers_in_use")
+            return conn
+
+        try:
+            conn = self._idle_readers.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a reader connection")
+        self._record_checkout(started, True, "readers_in_use")
+        return conn
+
+    # ---------------- PUBLIC API ----------------
+    @contextmanager
+    def reader(self):
+        """Yields a read-only connection from the pool."""
+        token = current_cancel_token()
+        if token:
+            token.check()
+        conn = self._checkout_reader()
+        try:
+            if token:
+                token.attach(conn)
+            yield conn
+        finally:
+            if token:
+                token.detach()
+            if conn.in_transaction:
+                conn.rollback()
+            self._record_release("readers_in_use")
+            self._idle_readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Yields the writer connection; commits on success, rolls back on error."""
+        token = current_cancel_token()
+        if token:
+            token.check()
+        started = time.perf_counter()
+        waited = not self._writer_lock.acquire(blocking=False)
+        if waited and not self._writer_lock.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("Timed out waiting for the writer connection")
+        try:
+            if self._writer is None:
+                self._writer = self._connect()
+            self._record_checkout(started, waited, "writer_in_use")
+            try:
+                if token:
+                    token.attach(self._writer)
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+            finally:
+                if token:
+                    token.detach()
+                self._record_release("writer_in_use")
+        finally:
+            self._writer_lock.release()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot["readers_open"] = self._reader_count
+        snapshot["readers_idle"] = self._idle_readers.qsize()
+        snapshot["readers_max"] = self.max_readers
+        checkouts = snapshot["checkouts"]
+        snapshot["checkout_seconds_avg"] = (
+            snapshot["checkout_seconds_total"] / checkouts if checkouts else 0.0
+        )
+        return snapshot
+
+    def close(self):
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._idle_readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._reader_lock:
+            self._reader_count = 0
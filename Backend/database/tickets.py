@@ -0,0 +1,37 @@
+"""
+Stream tickets: short-lived, single-use stand-ins for an ID token in the
+GET /api/events URL, where a token would end up in proxy and server logs.
+A ticket opens one event stream for its user and nothing else.
+"""
+import hashlib
+import secrets
+import time
+
+from database.db import write_db
+
+
+def ticket_hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+def issue_stream_ticket(user_id: str, ttl: float) -> str:
+    """A new ticket for the user, valid for `ttl` seconds; expired ones are swept here."""
+    ticket = secrets.token_urlsafe(32)
+    now = time.time()
+    with write_db() as db:
+        db.execute("DELETE FROM stream_tickets WHERE expires_at < ?", (now,))
+        db.execute(
+            "INSERT INTO stream_tickets (ticket_hash, user_id, expires_at) VALUES (?, ?, ?)",
+            (ticket_hash(ticket), user_id, now + ttl)
+        )
+    return ticket
+
+def redeem_stream_ticket(ticket: str):
+    """The ticket's user, or None if it is unknown, expired or already used."""
+    with write_db() as db:
+        row = db.execute(
+            "DELETE FROM stream_tickets WHERE ticket_hash = ? RETURNING user_id, expires_at",
+            (ticket_hash(ticket),)
+        ).fetchone()
+    if row is None or row["expires_at"] < time.time():
+        return None
+    return row["user_id"]
@@ -0,0 +1,51 @@
+"""
+Per-user and per-post change versions, kept by migration 10's triggers
+(see create_post_versions). Reading one is a primary-key seek, so the API
+can answer If-None-Match without running the list, search or post query.
+
+Read the version before the data it describes: a write landing in between
+then only makes the ETag older than the body, which costs the client one
+extra full response instead of hiding the change.
+"""
+from database.db import read_db
+
+
+def get_user_version(user_id: str) -> int:
+    with read_db() as db:
+        row = db.execute("SELECT version FROM user_versions WHERE user_id = ?", (user_id,)).fetchone()
+    return row["version"] if row else 0
+
+def get_post_version(post_id: int, user_id: str):
+    """The post's version, or None if it doesn't exist or isn't the user's."""
+    with read_db() as db:
+        row = db.execute(
+            "SELECT version FROM blog_posts WHERE id = ? AND user_id = ?", (post_id, user_id)
+        ).fetchone()
+    return row["version"] if row else None
+
+def get_changes_since(user_id: str, since: int):
+    """
+    Ids of the user's posts changed or deleted after `since`, oldest change
+    first, with the version to ask from next time. None when `since` is
+    newer than anything issued or older than the retained tombstones; the
+    client has to reload the list then.
+    """
+    with read_db() as db:
+        row = db.execute(
+            "SELECT version, pruned_through FROM user_versions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        version, pruned_through = (row["version"], row["pruned_through"]) if row else (0, 0)
+        if since > version or since < pruned_through:
+            return None
+        changed = db.execute(
+            "SELECT id FROM blog_posts WHERE user_id = ? AND version > ? ORDER BY version", (user_id, since)
+        ).fetchall()
+        deleted = db.execute(
+            "SELECT post_id FROM post_tombstones WHERE user_id = ? AND version > ? ORDER BY version",
+            (user_id, since)
+        ).fetchall()
+    return {
+        "version": version,
+        "changed": [r["id"] for r in changed],
+        "deleted": [r["post_id"] for r in deleted],
+    }
@@ -1,46 +1,144 @@
+import hashlib
+import hmac
+import logging
 import os
-import io
-import re
-import sqlite3
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Depends, Header, Request, Query
-from fastapi.responses import Response , StreamingResponse
+import sys
+import time
+from dotenv import load_dotenv
+
+# Once, before any module reads its settings from the environment.
+load_dotenv()
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(levelname)s %(name)s: %(message)s")
+
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Query
+from fastapi.responses import Response , StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
-import firebase_admin
-from firebase_admin import auth as firebase_auth, credentials
 from typing import Optional
-from fpdf import FPDF
 import json
+import csv
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 from database.db import (
     create_blog_post,
-    get_db,
+    create_blog_posts,
+    get_posts_status,
+    read_db,
+    write_db,
     init_db,
-    get_user_posts
+    get_user_posts,
+    pool_stats,
+    mark_post_error,
+    get_post_events,
+    get_latest_event_id,
+    save_signature,
+    set_post_body,
+    get_post_sections,
+    sync_search_index,
+    find_matching_posts,
+    SUMMARY_FIELDS,
+    FULL_POST_QUERY
+)
+from database.aio import run_db, shutdown_executor
+from services.auth import verify_token, auth_stats, verifier
+from database.jobs import enqueue_job, get_job, job_stats
+from database.analytics import get_user_analytics, MAX_ANALYTICS_DAYS
+from database.versions import get_user_version, get_post_version, get_changes_since
+from database.tickets import issue_stream_ticket, redeem_stream_ticket
+from database.hooks import emit, register_hook
+from services.worker import start_workers, stop_workers, notify_workers, job_lease
+from services.events import hub, publish_change
+from services.search import search_stats
+from services.ratelimit import throttle_stats
+from services.scheduler import parse_schedule, schedule_added, scheduler_stats
+from services.bulk_export import created_at_bound, select_posts, stream_zip_export, MAX_BULK_IDS
+from services.similarity import check_similarity, similarity_stats, similarity_index
+from services.fulltext import TOKEN_PATTERN, make_snippet, to_match_query
+from services.minhash import stored_signature
+from services.exporter import (
+    FORMATS,
+    normalize_format,
+    export_filename,
+    export_etag,
+    get_export,
+    get_process_pool,
+    render_export,
+    invalidate_exports,
+    shutdown_process_pool,
+    export_stats
+)
+from services.metrics import (
+    MetricsMiddleware,
+    register_collector,
+    render_metrics,
+    db_wait_seconds,
+    db_call_seconds
 )
-from services.researcher import perform_research_and_outline
-from services.writer import generate_blog_content
-
-from services.plagiarism import analyze_content_patterns  
-from services.humanizer import humanize_full_content   
-
-# ---------------- FIREBASE INIT ----------------
-base_dir = os.path.dirname(os.path.abspath(__file__))
-cert_path = os.path.join(base_dir, "serviceAccountKey.json")
-
-if not firebase_admin._apps:
-    firebase_json = os.environ.get("FIREBASE_CREDENTIALS")
-
-    if firebase_json:
-        # ✅ Production (Render)
-        cred_dict = json.loads(firebase_json)
-        cred = credentials.Certificate(cred_dict)
-    else:
-        # ✅ Local development
-        cred = credentials.Certificate(cert_path)
 
-    firebase_admin.initialize_app(cred)
+logger = logging.getLogger(__name__)
+
+EVENT_FALLBACK_POLL_SECONDS = float(os.getenv("EVENT_FALLBACK_POLL_SECONDS", "5"))
+# How long a ticket from POST /api/events/ticket can wait before opening its stream.
+STREAM_TICKET_SECONDS = int(os.getenv("STREAM_TICKET_SECONDS", "60"))
+BATCH_MAX_POSTS = int(os.getenv("BATCH_MAX_POSTS", "100"))
+# Statuses one search may filter on; the dashboard's widest filter has five.
+MAX_STATUS_FILTER = 10
+# /metrics and /api/*/stats are off unless this is set; scrapers send it as a bearer token.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Streamed generations run on this many threads; further streams wait for a free one.
+STREAM_WORKERS = int(os.getenv("STREAM_WORKERS", "4"))
+
+# Gemini clients, LangChain, fpdf and Firebase are loaded on first use, not on import.
+# "prewarm" (default) loads them in the background once the server is accepting
+# traffic, "eager" before it starts accepting, "lazy" only when a request needs them.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "prewarm")
+PREWARM_DELAY_SECONDS = float(os.getenv("PREWARM_DELAY_SECONDS", "1"))
+
+# ---------------- PREWARM ----------------
+def warm_llm_services():
+    from services import researcher
+    from services.humanizer import get_rewriter
+    from services.plagiarism import get_checker
+    from services.writer import build_section_chain
+
+    get_checker()
+    get_rewriter()
+    researcher.build_outline_chain()
+    build_section_chain()
+
+def warm_pdf_renderer():
+    get_process_pool().submit(render_export, "warmup", "", "pdf").result()
+
+PREWARM_STEPS = [
+    ("llm services", warm_llm_services),
+    ("pdf renderer", warm_pdf_renderer),
+    ("similarity index", similarity_index.refresh),
+    ("auth", lambda: verifier.warm()),
+]
+
+def prewarm():
+    """Runs each PREWARM_STEPS entry; a failed step is left for its first request to retry."""
+    started = time.perf_counter()
+    for name, step in PREWARM_STEPS:
+        try:
+            step()
+        except Exception as e:
+            logger.exception("Prewarm of %s failed", name)
+    logger.info("Prewarm finished in %.2fs", time.perf_counter() - started)
+
+async def prewarm_in_background():
+    await asyncio.sleep(PREWARM_DELAY_SECONDS)
+    await run_in_threadpool(prewarm)
+
+def llm_cache_snapshot() -> dict:
+    # Importing llm_cache pulls in LangChain; until a service has loaded it, nothing is cached.
+    llm_cache = sys.modules.get("services.llm_cache")
+    if llm_cache is None:
+        return {"memory_entries": 0, "services": {}}
+    return llm_cache.llm_cache_stats()
 
 # ---------------- AUTH DEPENDENCY ----------------
 async def get_current_user(authorization: str = Header(None)):
@@ -48,14 +146,63 @@ async def get_current_user(authorization: str = Header(None)):
         raise HTTPException(status_code=401, detail="Missing token")
 
     token = authorization.split("Bearer ")[1]
-    decoded = firebase_auth.verify_id_token(token)
-    return decoded["uid"]
+    return await verify_token(token)
+
+async def require_metrics_token(authorization: str = Header(None)):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not authorization or not hmac.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+async def get_stream_user(
+    authorization: str = Header(None),
+    ticket: Optional[str] = None
+):
+    """
+    EventSource cannot set headers, so event streams also accept a
+    ?ticket= from POST /api/events/ticket. Never the ID token itself: URLs
+    end up in logs.
+    """
+    if authorization and authorization.startswith("Bearer "):
+        return await get_current_user(authorization)
+    if not ticket:
+        raise HTTPException(status_code=401, detail="Missing token")
+    user_id = await run_db(redeem_stream_ticket, ticket)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired ticket")
+    return user_id
+
+_stream_executor = None
+
+def get_stream_executor() -> ThreadPoolExecutor:
+    global _stream_executor
+    if _stream_executor is None:
+        _stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="stream")
+    return _stream_executor
+
+def shutdown_stream_executor():
+    """Queued streams are dropped; their posts stay WRITING and workers pick them up on recovery."""
+    global _stream_executor
+    if _stream_executor is not None:
+        _stream_executor.shutdown(wait=False, cancel_futures=True)
+        _stream_executor = None
 
 # ---------------- APP INIT ----------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
+    await run_db(init_db)
+    if STARTUP_MODE == "eager":
+        await run_in_threadpool(prewarm)
+    warmup = asyncio.create_task(prewarm_in_background()) if STARTUP_MODE == "prewarm" else None
+    # Job recovery queries and thread joins stay off the event loop.
+    await run_in_threadpool(start_workers)
     yield
+    await run_in_threadpool(stop_workers)
+    if warmup:
+        warmup.cancel()
+    shutdown_executor()
+    shutdown_stream_executor()
+    shutdown_process_pool()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -65,7 +212,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Next-Offset", "ETag"],
 )
+app.add_middleware(MetricsMiddleware)
+
+# What the database layer reports back to services.
+register_hook("user_changed", publish_change)
+register_hook("content_changed", invalidate_exports)
+register_hook("db_wait", db_wait_seconds.observe)
+register_hook("db_call", db_call_seconds.observe)
+
+# The /api/*/stats snapshots, exported as gauges on /metrics.
+register_collector("db_pool", pool_stats)
+register_collector("jobs", job_stats)
+register_collector("llm_cache", llm_cache_snapshot)
+register_collector("research_cache", search_stats)
+register_collector("llm_throttle", throttle_stats)
+register_collector("similarity", similarity_stats)
+register_collector("export_cache", export_stats)
+register_collector("scheduler", scheduler_stats)
+register_collector("auth", auth_stats)
 
 # ---------------- SCHEMAS ----------------
 class BlogPostRequest(BaseModel):
@@ -79,10 +245,46 @@ class UpdatePostRequest(BaseModel):
 class ScheduleRequest(BaseModel):
     scheduledAt: str
 
+class BulkExportRequest(BaseModel):
+    post_ids: Optional[list[int]] = None
+    status: Optional[str] = None
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+    all: bool = False
+    format: str = "markdown"
+
+    def created_range(self) -> tuple:
+        """created_after/created_before as created_at text; ValueError if either isn't ISO 8601."""
+        return tuple(created_at_bound(value) if value else None for value in (self.created_after, self.created_before))
+
 # ---------------- HELPERS ----------------
+def version_etag(user_id: str, tag: str) -> str:
+    """
+    Weak ETag from a change version. Hashing in the owner stops a browser
+    that switches accounts from revalidating against the other user's list.
+    """
+    owner = hashlib.blake2s(user_id.encode(), digest_size=4).hexdigest()
+    return f'W/"{owner}-{tag}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored on both sides."""
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+def revalidate(request: Request, response: Response, etag: str):
+    """Sets the caching headers; returns a 304 if the client already has this version."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
 def update_blog_post(post_id: int, user_id: str, topic: str, content: str):
-    db = get_db()
-    try:
+    signed = stored_signature(content)
+    with write_db() as db:
         post = db.execute(
             "SELECT id FROM blog_posts WHERE id = ? AND user_id = ?",
             (post_id, user_id)
@@ -94,209 +296,509 @@ def update_blog_post(post_id: int, user_id: str, topic: str, content: str):
         db.execute(
             """
             UPDATE blog_posts
-            SET topic = ?, content = ?, status = 'UPDATED'
+            SET topic = ?, status = 'UPDATED'
             WHERE id = ?
             """,
-            (topic, content, post_id)
+            (topic, post_id)
         )
-        db.commit()
+        set_post_body(db, post_id, "content", content)
+        save_signature(db, post_id, user_id, signed)
 
         updated = db.execute(
-            "SELECT * FROM blog_posts WHERE id = ?",
+            FULL_POST_QUERY + " WHERE p.id = ?",
             (post_id,)
         ).fetchone()
 
-        return dict(updated)
-    finally:
-        db.close()
+    emit("content_changed", post_id)
+    emit("user_changed", user_id)
+    return dict(updated)
+
+def parse_batch_items(body: bytes, content_type: str):
+    """Reads topic/keyword pairs from a JSON list (or {"posts": [...]}) or a CSV with a header row."""
+    text = body.decode("utf-8-sig")
+    if "csv" in content_type:
+        reader = csv.DictReader(text.splitlines())
+        return [{(k or "").strip().lower(): (v or "").strip() for k, v in row.items()} for row in reader]
 
-def search_posts_in_db(query: str, user_id: str):
-    db = get_db()
     try:
-        search_term = f"%{query.lower()}%"
-        cursor = db.execute(
+        payload = json.loads(text)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON or CSV (Content-Type: text/csv)")
+    items = payload.get("posts") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a list of {topic, keywords}")
+    return [item if isinstance(item, dict) else {} for item in items]
+
+def create_post_batch(items, user_id: str):
+    """Validates each item, inserts the valid ones in one transaction and queues one research job for them."""
+    results = []
+    valid = []
+    for index, item in enumerate(items):
+        topic = str(item.get("topic") or "").strip()
+        keywords = str(item.get("keywords") or "").strip()
+        if not topic:
+            results.append({"index": index, "status": "INVALID", "error": "topic is required"})
+            continue
+        results.append({"index": index, "topic": topic})
+        valid.append((topic, keywords))
+
+    if not valid:
+        return None, results
+
+    ids = iter(create_blog_posts(valid, user_id))
+    post_ids = []
+    for result in results:
+        if "topic" in result:
+            result["postId"] = next(ids)
+            result["status"] = "RESEARCHING"
+            post_ids.append(result["postId"])
+
+    batch_id = enqueue_job("research", payload={"post_ids": post_ids, "user_id": user_id})
+    return batch_id, results
+
+def fetch_batch_status(batch_id: int, user_id: str):
+    job = get_job(batch_id)
+    if not job or job["payload"].get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    posts = get_posts_status(job["payload"]["post_ids"], user_id)
+    items = [
+        {"postId": post_id, "topic": posts[post_id]["topic"], "status": posts[post_id]["status"]}
+        if post_id in posts else {"postId": post_id, "status": "DELETED"}
+        for post_id in job["payload"]["post_ids"]
+    ]
+    counts = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    return {"batchId": batch_id, "job": job["status"], "counts": counts, "items": items}
+
+def parse_fields(fields: Optional[str]):
+    if not fields:
+        return SUMMARY_FIELDS
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in SUMMARY_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(SUMMARY_FIELDS)}"
+        )
+    return requested
+
+def search_posts_in_db(query: str, user_id: str, limit: int = 20, offset: int = 0, statuses=()):
+    match = to_match_query(query, user_id)
+    if not match:
+        return []
+
+    with read_db() as db:
+        posts = find_matching_posts(db, match, user_id, limit, offset, statuses)
+
+    terms = TOKEN_PATTERN.findall(query)
+    for post in posts:
+        post["snippet"] = make_snippet((post["topic"], post["keywords"], post.pop("content")), terms)
+    return posts
+
+def fetch_post(post_id: int, user_id: str):
+    with read_db() as db:
+        row = db.execute(
+            FULL_POST_QUERY + " WHERE p.id = ? AND p.user_id = ?",
+            (post_id, user_id)
+        ).fetchone()
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    return dict(row)
+
+def fetch_post_content(post_id: int, user_id: str) -> str:
+    with read_db() as db:
+        row = db.execute(
             """
-            SELECT * FROM blog_posts 
-            WHERE user_id = ? 
-            AND (LOWER(topic) LIKE ? OR LOWER(content) LIKE ?)
-            ORDER BY id DESC
+            SELECT inflate(b.content) AS content
+            FROM blog_posts p JOIN post_bodies b ON b.post_id = p.id
+            WHERE p.id = ? AND p.user_id = ?
             """,
-            (user_id, search_term, search_term)
-        )
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
-    finally:
-        db.close()
+            (post_id, user_id)
+        ).fetchone()
 
-def update_scheduled_date(post_id: int, user_id: str, scheduled_at: str):
-    db = get_db()
-    try:
-        db.execute(
-            "UPDATE blog_posts SET scheduled_at = ?, status = 'Scheduled' WHERE id = ? AND user_id = ?",
-            (scheduled_at, post_id, user_id)
-        )
-        db.commit()
-    finally:
-        db.close()
-
-def clean_for_pdf(text: str) -> str:
-    if not text:
-        return ""
-
-    replacements = {
-        "\u2013": "-",   # en dash
-        "\u2014": "-",   # em dash
-        "\u2018": "'",   # left single quote
-        "\u2019": "'",   # right single quote
-        "\u201c": '"',   # left double quote
-        "\u201d": '"',   # right double quote
-        "\u2022": "*",   # bullet
-    }
+    if not row or not row["content"]:
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    return row["content"]
+
+def mark_post_writing(post_id: int, user_id: str):
+    with write_db() as db:
+        post = db.execute(
+            "SELECT id, status FROM blog_posts WHERE id = ? AND user_id = ?",
+            (post_id, user_id)
+        ).fetchone()
 
-    for unicode_char, ascii_char in replacements.items():
-        text = text.replace(unicode_char, ascii_char)
+        if not post:
+            raise HTTPException(status_code=404, detail="Post not found")
+        if post["status"] == "WRITING":
+            raise HTTPException(status_code=409, detail="Post is already being written")
 
-    # Ensure compatibility with FPDF (latin-1 only)
-    return text.encode("latin-1", "ignore").decode("latin-1")
+        db.execute("UPDATE blog_posts SET status='WRITING' WHERE id=?", (post_id,))
+        # A new generation starts from scratch; job retries keep finished sections.
+        db.execute("DELETE FROM post_sections WHERE post_id=?", (post_id,))
 
+    publish_change(user_id)
 
-def format_post_content(post, format_type: str):
-    title = post.get('topic', 'Untitled')
-    content = post.get('content') or "No content available."
+def delete_blog_post(post_id: int, user_id: str):
+    with write_db() as db:
+        post = db.execute(
+            "SELECT id FROM blog_posts WHERE id = ? AND user_id = ?",
+            (post_id, user_id)
+        ).fetchone()
 
-    format_type = format_type.lower()
+        if not post:
+            raise HTTPException(status_code=404, detail="Post not found or unauthorized")
 
-    if format_type == "pdf":
-        safe_title = clean_for_pdf(title)
-        safe_content = clean_for_pdf(content)
+        db.execute("DELETE FROM blog_posts WHERE id = ?", (post_id,))
+        sync_search_index(db)
 
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", 'B', 16)
-        pdf.cell(0, 10, safe_title, ln=True, align='C')
-        pdf.ln(10)
+    emit("content_changed", post_id)
+    emit("user_changed", user_id)
 
-        pdf.set_font("Arial", size=12)
-        pdf.multi_cell(0, 10, safe_content)
+def ensure_post_owner(post_id: int, user_id: str):
+    with read_db() as db:
+        post = db.execute(
+            "SELECT id FROM blog_posts WHERE id = ? AND user_id = ?",
+            (post_id, user_id)
+        ).fetchone()
 
-        # ✅ CRITICAL FIX: convert string → bytes
-        pdf_bytes = pdf.output(dest='S').encode('latin-1')
-        buffer = io.BytesIO(pdf_bytes)
-        buffer.seek(0)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
 
-        # ✅ Safe filename (no special characters)
-        safe_filename = re.sub(r'[^a-zA-Z0-9_-]', '_', safe_title)
+def ensure_post_not_writing(post_id: int, user_id: str):
+    with read_db() as db:
+        post = db.execute(
+            "SELECT status FROM blog_posts WHERE id = ? AND user_id = ?",
+            (post_id, user_id)
+        ).fetchone()
 
-        return buffer, "application/pdf", f"{safe_filename}.pdf"
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    if post["status"] == "WRITING":
+        raise HTTPException(status_code=409, detail="Post is being written")
 
-    elif format_type == "txt":
-        text_body = f"TOPIC: {title}\n\n{content}"
-        return text_body, "text/plain", f"{title}.txt"
+def fetch_post_sections(post_id: int, user_id: str):
+    ensure_post_owner(post_id, user_id)
+    return get_post_sections(post_id)
 
-    elif format_type == "markdown":
-        markdown_body = f"# {title}\n\n{content}"
-        return markdown_body, "text/markdown", f"{title}.md"
+def update_scheduled_date(post_id: int, user_id: str, scheduled_at: str):
+    try:
+        due = parse_schedule(scheduled_at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="scheduledAt must be an ISO 8601 date-time")
 
-    else:
-        html_body = f"""
-        <html>
-            <body>
-                <h1>{title}</h1>
-                <p>{content.replace('\n', '<br>')}</p>
-            </body>
-        </html>
-        """
-        return html_body, "text/html", f"{title}.html"
+    with write_db() as db:
+        row = db.execute(
+            """
+            UPDATE blog_posts SET scheduled_at = ?, scheduled_epoch = ?, status = 'Scheduled'
+            WHERE id = ? AND user_id = ?
+            RETURNING id
+            """,
+            (scheduled_at, due, post_id, user_id)
+        ).fetchone()
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    schedule_added(due, post_id)
+    publish_change(user_id)
 # ---------------------------------------------------------
 # 1. STATIC ROUTES 
 # ---------------------------------------------------------
 
 @app.get("/api/blog-posts/search")
 async def search_posts(
+    request: Request,
+    response: Response,
     query: str = "", 
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    status: str = "",
     user_id: str = Depends(get_current_user)
 ):
-    print(f"DEBUG: Search hit. Term: '{query}'")
+    """
+    One page of matches, best first; X-Next-Offset is set when there are
+    more. An empty query pages through the user's posts, newest first.
+    status, a comma-separated list, keeps only posts in those statuses.
+    """
+    statuses = tuple(dict.fromkeys(s.strip() for s in status.split(",") if s.strip()))
+    if len(statuses) > MAX_STATUS_FILTER:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATUS_FILTER} statuses")
+    version = await run_db(get_user_version, user_id)
+    not_modified = revalidate(request, response, version_etag(user_id, str(version)))
+    if not_modified:
+        return not_modified
+    # One extra row tells whether another page exists.
     if not query.strip():
-        return get_user_posts(user_id)
-    return search_posts_in_db(query.strip(), user_id)
+        posts = await run_db(get_user_posts, user_id, limit + 1, offset=offset, statuses=statuses)
+    else:
+        posts = await run_db(search_posts_in_db, query.strip(), user_id, limit + 1, offset, statuses)
+    if len(posts) > limit:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return posts[:limit]
+
+@app.get("/api/analytics")
+async def user_analytics(
+    days: int = Query(30, ge=1, le=MAX_ANALYTICS_DAYS),
+    user_id: str = Depends(get_current_user)
+):
+    """Dashboard counts by status plus daily/weekly rollups, without reading any posts."""
+    return await run_db(get_user_analytics, user_id, days)
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    # Collectors include DB queries, so render off the event loop.
+    body = await run_in_threadpool(render_metrics)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/api/db/stats", dependencies=[Depends(require_metrics_token)])
+async def db_stats():
+    return pool_stats()
+
+@app.get("/api/jobs/stats", dependencies=[Depends(require_metrics_token)])
+async def jobs_stats():
+    return await run_db(job_stats)
+
+@app.get("/api/llm/cache/stats", dependencies=[Depends(require_metrics_token)])
+async def llm_cache_metrics():
+    return llm_cache_snapshot()
+
+@app.get("/api/research/cache/stats", dependencies=[Depends(require_metrics_token)])
+async def research_cache_metrics():
+    return search_stats()
+
+@app.get("/api/llm/throttle/stats", dependencies=[Depends(require_metrics_token)])
+async def llm_throttle_metrics():
+    return throttle_stats()
+
+@app.get("/api/similarity/stats", dependencies=[Depends(require_metrics_token)])
+async def similarity_metrics():
+    return await run_db(similarity_stats)
+
+@app.get("/api/export/cache/stats", dependencies=[Depends(require_metrics_token)])
+async def export_cache_metrics():
+    return export_stats()
+
+@app.get("/api/scheduler/stats", dependencies=[Depends(require_metrics_token)])
+async def scheduler_metrics():
+    return scheduler_stats()
+
+@app.get("/api/auth/stats", dependencies=[Depends(require_metrics_token)])
+async def token_cache_stats():
+    return auth_stats()
+
+@app.post("/api/events/ticket")
+async def create_stream_ticket(user_id: str = Depends(get_current_user)):
+    """A single-use ticket that opens GET /api/events?ticket=... within STREAM_TICKET_SECONDS."""
+    ticket = await run_db(issue_stream_ticket, user_id, STREAM_TICKET_SECONDS)
+    return {"ticket": ticket, "expiresIn": STREAM_TICKET_SECONDS}
+
+@app.get("/api/events")
+async def post_events(
+    request: Request,
+    since: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None),
+    user_id: str = Depends(get_stream_user)
+):
+    """
+    Per-user stream of post status changes as Server-Sent Events.
+    Writes in this process wake the stream immediately; changes made by
+    other workers are picked up from post_events every few seconds.
+    """
+    if last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+    elif since is not None:
+        cursor = since
+    else:
+        cursor = await run_db(get_latest_event_id, user_id)
+
+    async def event_stream():
+        nonlocal cursor
+        sub = hub.subscribe(user_id)
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                # Clear before reading so a publish during the query is not lost.
+                sub.changed.clear()
+                events = await run_db(get_post_events, user_id, cursor)
+                for event in events:
+                    cursor = event["id"]
+                    data = json.dumps({"postId": event["post_id"], "status": event["status"]})
+                    yield f"id: {event['id']}\nevent: status\ndata: {data}\n\n"
+                if events:
+                    continue
+
+                try:
+                    await asyncio.wait_for(sub.changed.wait(), EVENT_FALLBACK_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/blog-posts")
-async def fetch_posts(user_id: str = Depends(get_current_user)):
-    return get_user_posts(user_id)
+async def fetch_posts(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    since: Optional[int] = Query(None, ge=0),
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Newest first, with a weak ETag from the user's change version. With
+    since=<version>, only the ids changed and deleted after it; a 410 means
+    that version is unknown or its tombstones have expired, so reload.
+    """
+    if since is not None:
+        changes = await run_db(get_changes_since, user_id, since)
+        if changes is None:
+            raise HTTPException(status_code=410, detail="Unknown or expired version; reload the list")
+        return changes
+
+    # Validated first, so a bad fields value is a 400 even when the list is unchanged.
+    columns = parse_fields(fields)
+    version = await run_db(get_user_version, user_id)
+    not_modified = revalidate(request, response, version_etag(user_id, str(version)))
+    if not_modified:
+        return not_modified
+    posts = await run_db(get_user_posts, user_id, limit, cursor, columns)
+    if limit and len(posts) == limit:
+        response.headers["X-Next-Cursor"] = str(posts[-1]["id"])
+    return posts
 
 @app.post("/api/blog-posts")
 async def create_post(
     request: BlogPostRequest,
-    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user)
 ):
-    post_id = create_blog_post(request.topic, request.keywords, user_id)
-    background_tasks.add_task(
-        perform_research_and_outline,
-        post_id,
-        request.topic,
-        request.keywords
-    )
+    post_id = await run_db(create_blog_post, request.topic, request.keywords, user_id)
+    await run_db(enqueue_job, "research", post_id)
+    notify_workers()
     return {"postId": post_id, "status": "RESEARCHING"}
 
+@app.post("/api/blog-posts/batch")
+async def create_posts_batch(
+    request: Request,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Creates up to BATCH_MAX_POSTS posts from JSON or CSV and researches them
+    as one batch. Invalid rows are reported per item and skipped.
+    """
+    items = parse_batch_items(await request.body(), request.headers.get("content-type", ""))
+    if not items:
+        raise HTTPException(status_code=400, detail="No posts in batch")
+    if len(items) > BATCH_MAX_POSTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_POSTS} posts per batch")
+
+    batch_id, results = await run_db(create_post_batch, items, user_id)
+    if batch_id is not None:
+        notify_workers()
+    return {"batchId": batch_id, "items": results}
+
+@app.get("/api/blog-posts/batch/{batch_id}")
+async def get_batch_status(
+    batch_id: int,
+    user_id: str = Depends(get_current_user)
+):
+    return await run_db(fetch_batch_status, batch_id, user_id)
+
 # ---------------------------------------------------------
 # 2. DYNAMIC ID ROUTES 
 # ---------------------------------------------------------
 
+@app.post("/api/blog-posts/export")
+async def bulk_export(
+    request: BulkExportRequest,
+    user_id: str = Depends(get_current_user)
+):
+    """Streams the selected posts as a ZIP, one file per post in the requested format."""
+    selectors = (request.post_ids, request.status, request.created_after, request.created_before)
+    if not request.all and not any(selectors):
+        raise HTTPException(status_code=400, detail="Pass post_ids, a status/date filter, or all=true")
+    if request.post_ids and len(request.post_ids) > MAX_BULK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_IDS} post_ids per export")
+    try:
+        created_after, created_before = request.created_range()
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="created_after and created_before must be ISO 8601 dates or date-times"
+        )
+
+    posts = select_posts(
+        user_id,
+        post_ids=request.post_ids,
+        status=request.status,
+        created_after=created_after,
+        created_before=created_before
+    )
+    return StreamingResponse(
+        stream_zip_export(posts, normalize_format(request.format)),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=blog-export.zip"}
+    )
+
 @app.put("/api/blog-posts/{post_id}/schedule")
 async def schedule_blog_post(
     post_id: int, 
     request: ScheduleRequest, 
     user_id: str = Depends(get_current_user)
 ):
-    update_scheduled_date(post_id, user_id, request.scheduledAt)
+    await run_db(update_scheduled_date, post_id, user_id, request.scheduledAt)
     return {"status": "success", "scheduledAt": request.scheduledAt}
 
 @app.get("/api/blog-posts/{post_id}/export")
 async def export_blog_post(
     post_id: int, 
+    request: Request,
     format: str = "markdown", 
     user_id: str = Depends(get_current_user)
 ):
-    db = get_db()
-    try:
-        row = db.execute("SELECT * FROM blog_posts WHERE id = ? AND user_id = ?", (post_id, user_id)).fetchone()
-        if not row: 
-            raise HTTPException(status_code=404, detail="Post not found")
-        
-        formatted_content, media_type, filename = format_post_content(dict(row), format)
-
-        if format.lower() == "pdf":
-            return StreamingResponse(
-                formatted_content,
-                media_type=media_type,
-                headers={"Content-Disposition": f"attachment; filename={filename}"}
-            )
-        else:
-            return Response(
-                content=formatted_content, 
-                media_type=media_type, 
-                headers={"Content-Disposition": f"attachment; filename={filename}"}
-            )
-    finally: 
-        db.close()
+    """Serves cached renders with a strong ETag; If-None-Match gets a 304."""
+    post = await run_db(fetch_post, post_id, user_id)
+    title = post.get('topic', 'Untitled')
+    content = post.get('content') or "No content available."
+    format_type = normalize_format(format)
 
-@app.get("/api/blog-posts/{post_id}")
-async def get_post(post_id: int, user_id: str = Depends(get_current_user)):
-    db = get_db()
-    try:
-        row = db.execute(
-            "SELECT * FROM blog_posts WHERE id = ? AND user_id = ?",
-            (post_id, user_id)
-        ).fetchone()
+    etag = export_etag(title, content, format_type)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename={export_filename(title, format_type)}"
+    }
 
-        if not row:
-            raise HTTPException(status_code=404, detail="Post not found")
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = await get_export(post_id, etag, title, content, format_type)
+    return Response(content=body, media_type=FORMATS[format_type][0], headers=headers)
 
-        return dict(row)
-    finally:
-        db.close()
+@app.get("/api/blog-posts/{post_id}")
+async def get_post(
+    post_id: int,
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user)
+):
+    """Weak ETag from the post's version; a 304 never reads the outline or content."""
+    version = await run_db(get_post_version, post_id, user_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    not_modified = revalidate(request, response, version_etag(user_id, f"p{post_id}-{version}"))
+    if not_modified:
+        return not_modified
+    return await run_db(fetch_post, post_id, user_id)
 
 @app.put("/api/blog-posts/{post_id}")
 async def update_post(
@@ -307,7 +809,8 @@ async def update_post(
     if not request.topic or not request.content:
         raise HTTPException(status_code=400, detail="Invalid data")
 
-    return update_blog_post(
+    return await run_db(
+        update_blog_post,
         post_id,
         user_id,
         request.topic,
@@ -317,73 +820,180 @@ async def update_post(
 @app.post("/api/blog-posts/{post_id}/generate")
 async def generate(
     post_id: int,
-    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user)
 ):
-    db = get_db()
-    try:
-        post = db.execute(
-            "SELECT id FROM blog_posts WHERE id = ? AND user_id = ?",
-            (post_id, user_id)
-        ).fetchone()
+    await run_db(mark_post_writing, post_id, user_id)
+    await run_db(enqueue_job, "write", post_id)
+    notify_workers()
+    return {"status": "WRITING"}
 
-        if not post:
-            raise HTTPException(status_code=404, detail="Post not found")
+@app.post("/api/blog-posts/{post_id}/generate/stream")
+async def generate_stream(
+    post_id: int,
+    user_id: str = Depends(get_current_user)
+):
+    """Generates the post and streams tokens as Server-Sent Events."""
+    await run_db(mark_post_writing, post_id, user_id)
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(kind, data):
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, (kind, data))
+        except RuntimeError:
+            pass  # loop closed during shutdown; the DB checkpoint still has the text
+
+    # Generation runs on the stream executor so it finishes even if the client disconnects.
+    def produce():
+        from services.writer import stream_blog_content
+
+        try:
+            # The lease keeps startup recovery from queuing this post again mid-stream.
+            with job_lease("write", post_id) as heartbeat:
+                for text in stream_blog_content(post_id):
+                    emit("token", text)
+                    heartbeat()
+            emit("done", None)
+        except Exception as e:
+            logger.exception("Generation of post %s failed", post_id)
+            mark_post_error(post_id)
+            emit("error", str(e))
+
+    get_stream_executor().submit(produce)
+
+    async def event_stream():
+        while True:
+            kind, data = await events.get()
+            if kind == "token":
+                yield f"data: {json.dumps({'delta': data})}\n\n"
+            elif kind == "done":
+                yield "event: done\ndata: {}\n\n"
+                return
+            else:
+                yield f"event: error\ndata: {json.dumps({'detail': data})}\n\n"
+                return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        db.execute("UPDATE blog_posts SET status='WRITING' WHERE id=?", (post_id,))
-        db.commit()
+@app.get("/api/blog-posts/{post_id}/sections")
+async def get_sections(
+    post_id: int,
+    user_id: str = Depends(get_current_user)
+):
+    """Per-section drafts and their status from the parallel writer."""
+    return await run_db(fetch_post_sections, post_id, user_id)
 
-        background_tasks.add_task(generate_blog_content, post_id)
-        return {"status": "WRITING"}
-    finally:
-        db.close()
+@app.post("/api/blog-posts/{post_id}/sections/{position}/regenerate")
+async def regenerate_post_section(
+    post_id: int,
+    position: int,
+    user_id: str = Depends(get_current_user)
+):
+    from services.writer import regenerate_section
+
+    await run_db(ensure_post_not_writing, post_id, user_id)
+    try:
+        section = await run_in_threadpool(regenerate_section, post_id, position)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Section not found")
+    except Exception as e:
+        logger.exception("Regenerating section %s of post %s failed", position, post_id)
+        raise HTTPException(status_code=502, detail="Section generation failed")
+    return section
 
 @app.delete("/api/blog-posts/{post_id}")
 async def delete_post(
     post_id: int, 
     user_id: str = Depends(get_current_user)
 ):
-    db = get_db()
-    try:
-        post = db.execute(
-            "SELECT id FROM blog_posts WHERE id = ? AND user_id = ?",
-            (post_id, user_id)
-        ).fetchone()
-
-        if not post:
-            raise HTTPException(status_code=404, detail="Post not found or unauthorized")
-
-        db.execute("DELETE FROM blog_posts WHERE id = ?", (post_id,))
-        db.commit()
-
-        return {"status": "success", "message": "Post permanently removed"}
-    finally:
-        db.close()
+    await run_db(delete_blog_post, post_id, user_id)
+    return {"status": "success", "message": "Post permanently removed"}
+
+def progress_stream(work, first=None):
+    """
+    Runs `work(on_progress)` and streams its chunk progress as SSE, ending
+    with a `done` event that carries the result. Disconnecting cancels it.
+    """
+    events = asyncio.Queue()
+
+    async def on_progress(done, total):
+        await events.put(("progress", {"done": done, "total": total}))
+
+    async def run():
+        try:
+            await events.put(("done", await work(on_progress)))
+        except HTTPException as e:
+            await events.put(("error", e.detail))
+        except Exception as e:
+            await events.put(("error", str(e)))
+
+    task = asyncio.create_task(run())
+
+    async def event_stream():
+        try:
+            if first is not None:
+                yield f"event: {first[0]}\ndata: {json.dumps(first[1])}\n\n"
+            while True:
+                kind, data = await events.get()
+                if kind == "error":
+                    yield f"event: error\ndata: {json.dumps({'detail': data})}\n\n"
+                    return
+                yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+                if kind == "done":
+                    return
+        finally:
+            task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/api/blog-posts/{post_id}/check-plagiarism")
 async def check_plagiarism(
     post_id: int,
+    deep: bool = False,
+    scope: str = Query("own", pattern="^(own|all)$"),
     user_id: str = Depends(get_current_user)
 ):
-    db = get_db()
-    try:
-        row = db.execute(
-            "SELECT content FROM blog_posts WHERE id=? AND user_id=?",
-            (post_id, user_id)
-        ).fetchone()
+    """
+    Local MinHash overlap scan; deep=true adds the Gemini review as a second
+    stage. Compares against the caller's own posts unless scope=all.
+    """
+    from services.plagiarism import analyze_content_patterns
+
+    content = await run_db(fetch_post_content, post_id, user_id)
+    result = await run_db(check_similarity, post_id, user_id, content, scope)
+    if deep:
+        result["ai_analysis"] = await analyze_content_patterns(content)
+    return result
 
-        if not row or not row["content"]:
-            raise HTTPException(status_code=404, detail="Content not found")
 
-        result = await analyze_content_patterns(row["content"])
-        return result
+@app.post("/api/blog-posts/{post_id}/check-plagiarism/stream")
+async def check_plagiarism_stream(
+    post_id: int,
+    scope: str = Query("own", pattern="^(own|all)$"),
+    user_id: str = Depends(get_current_user)
+):
+    """Sends the local scan at once as `local`, then Gemini's per-section progress."""
+    from services.plagiarism import analyze_content_patterns
 
-    finally:
-        db.close()
+    content = await run_db(fetch_post_content, post_id, user_id)
+    local = await run_db(check_similarity, post_id, user_id, content, scope)
 
+    async def work(on_progress):
+        ai = await analyze_content_patterns(content, on_progress=on_progress)
+        return {**local, "ai_analysis": ai}
 
-@app.post("/api/blog-posts/{post_id}/humanize")
-async def humanize_post(post_id: int, request: Request, user_id: str = Depends(get_current_user)):
+    return progress_stream(work, first=("local", local))
+
+async def read_humanize_payload(request: Request):
     try:
         payload = await request.json()
     except:
@@ -391,14 +1001,25 @@ async def humanize_post(post_id: int, request: Request, user_id: str = Depends(g
 
     user_prompt = payload.get("user_prompt", "") 
     tone = payload.get("tone", "balanced")
+    return user_prompt, tone
 
-    db = get_db()
-    try:
-        row = db.execute("SELECT content FROM blog_posts WHERE id=? AND user_id=?", (post_id, user_id)).fetchone()
-        if not row or not row["content"]:
-            raise HTTPException(status_code=404, detail="Content not found")
-            
-        rewritten = await humanize_full_content(row["content"], user_prompt, tone)
-        return rewritten
-    finally:
-        db.close()
+@app.post("/api/blog-posts/{post_id}/humanize")
+async def humanize_post(post_id: int, request: Request, user_id: str = Depends(get_current_user)):
+    from services.humanizer import humanize_full_content
+
+    user_prompt, tone = await read_humanize_payload(request)
+
+    content = await run_db(fetch_post_content, post_id, user_id)
+    rewritten = await humanize_full_content(content, user_prompt, tone)
+    return rewritten
+
+@app.post("/api/blog-posts/{post_id}/humanize/stream")
+async def humanize_post_stream(post_id: int, request: Request, user_id: str = Depends(get_current_user)):
+    from services.humanizer import humanize_full_content
+
+    user_prompt, tone = await read_humanize_payload(request)
+
+    content = await run_db(fetch_post_content, post_id, user_id)
+    return progress_stream(
+        lambda on_progress: humanize_full_content(content, user_prompt, tone, on_progress=on_progress)
+    )
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# "firebase" (default) or "fake" for offline runs, where the token is the uid.
+AUTH_VERIFIER = os.getenv("AUTH_VERIFIER", "firebase")
+# The fake verifier lets any caller pick their uid, so it also needs this flag.
+AUTH_ALLOW_FAKE = os.getenv("AUTH_ALLOW_FAKE", "0") == "1"
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+# Tokens are dropped this many seconds before their real expiry.
+EXPIRY_SKEW_SECONDS = 30
+
+CERT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "serviceAccountKey.json")
+
+
+class InvalidToken(Exception):
+    """The caller's token is malformed, forged or expired: a 401, not a server error."""
+
+    def __init__(self, message: str, expired: bool = False):
+        super().__init__(message)
+        self.expired = expired
+
+
+class TokenCache:
+    """LRU of verified ID tokens, keyed by a hash of the token, valid until `exp`."""
+
+    def __init__(self, max_entries: int = AUTH_CACHE_SIZE, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            uid, expires_at = entry
+            if expires_at - EXPIRY_SKEW_SECONDS <= self.clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return uid
+
+    def put(self, token: str, uid: str, expires_at: float):
+        if expires_at - EXPIRY_SKEW_SECONDS <= self.clock():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (uid, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def init_firebase():
+    """Imports firebase_admin and initializes the default app; returns firebase_admin.auth."""
+    import firebase_admin
+    from firebase_admin import auth as firebase_auth, credentials
+
+    if not firebase_admin._apps:
+        firebase_json = os.environ.get("FIREBASE_CREDENTIALS")
+
+        if firebase_json:
+            # ✅ Production (Render)
+            cred = credentials.Certificate(json.loads(firebase_json))
+        else:
+            # ✅ Local development
+            cred = credentials.Certificate(CERT_PATH)
+
+        firebase_admin.initialize_app(cred)
+    return firebase_auth
+
+
+class FirebaseVerifier:
+    """Loads firebase_admin on first use, so importing the app doesn't pay for it."""
+
+    def __init__(self):
+        self._auth = None
+        self._lock = threading.Lock()
+
+    def auth(self):
+        if self._auth is None:
+            with self._lock:
+                if self._auth is None:
+                    self._auth = init_firebase()
+        return self._auth
+
+    def verify(self, token: str) -> dict:
+        auth = self.auth()
+        try:
+            return auth.verify_id_token(token)
+        except auth.ExpiredIdTokenError as e:
+            raise InvalidToken(str(e), expired=True) from e
+        except (auth.InvalidIdTokenError, ValueError) as e:
+            # ValueError: not a token at all (empty, or not a string).
+            raise InvalidToken(str(e)) from e
+
+    def warm(self):
+        """
+        Loads firebase_admin. The signing certificates are fetched by the
+        first verification and then kept for as long as Google's
+        Cache-Control allows; the SDK has no public way to fetch them early.
+        """
+        self.auth()
+
+
+class FakeVerifier:
+    """Offline stand-in: the token is the uid. Used for local runs and benchmarks."""
+
+    def __init__(self, latency: float = 0.0, ttl: int = 3600, failure_rate: float = 0.0):
+        self.latency = latency
+        self.ttl = ttl
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    def verify(self, token: str) -> dict:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ValueError("Fake token verification failure")
+        return {"uid": token, "exp": time.time() + self.ttl}
+
+    def warm(self):
+        pass
+
+
+def make_verifier():
+    """Picks the verifier for AUTH_VERIFIER; the fake one is refused outside tests and benchmarks."""
+    if AUTH_VERIFIER != "fake":
+        return FirebaseVerifier()
+    if os.environ.get("FIREBASE_CREDENTIALS"):
+        raise RuntimeError("AUTH_VERIFIER=fake is refused while FIREBASE_CREDENTIALS is set")
+    if not AUTH_ALLOW_FAKE:
+        raise RuntimeError("AUTH_VERIFIER=fake also needs AUTH_ALLOW_FAKE=1 (tests and benchmarks only)")
+    logger.warning("AUTH_VERIFIER=fake: tokens are NOT verified, any bearer token is accepted as its uid")
+    return FakeVerifier(
+        latency=float(os.getenv("FAKE_AUTH_LATENCY_MS", "0")) / 1000,
+        failure_rate=float(os.getenv("FAKE_AUTH_FAILURE_RATE", "0"))
+    )
+
+
+verifier = make_verifier()
+
+token_cache = TokenCache()
+
+
+async def verify_token(token: str) -> str:
+    """Returns the uid for an ID token, verifying it off the event loop on a cache miss."""
+    uid = token_cache.get(token)
+    if uid is not None:
+        return uid
+
+    try:
+        decoded = await run_in_threadpool(verifier.verify, token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail="Token expired" if e.expired else "Invalid token")
+    token_cache.put(token, decoded["uid"], decoded.get("exp", 0))
+    return decoded["uid"]
+
+
+def auth_stats() -> dict:
+    return token_cache.stats()
@@ -0,0 +1,146 @@
+"""
+Bulk export: renders many posts and streams them out as one ZIP.
+
+Posts are read in keyset batches and rendered by a bounded pool, and each
+entry is written to the response as soon as it is ready. Memory stays
+flat no matter how many posts are included: at most a window of rendered
+posts plus the ZIP's central directory (a few dozen bytes per entry).
+"""
+import logging
+import os
+import re
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from database.db import read_db
+from services.exporter import FORMATS, export_cache, export_etag, get_process_pool, render_export, PROCESS_FORMATS
+from services.scheduler import parse_schedule
+
+logger = logging.getLogger(__name__)
+
+BULK_EXPORT_WORKERS = int(os.getenv("BULK_EXPORT_WORKERS", "4"))
+BULK_EXPORT_BATCH = 100
+MAX_BULK_IDS = 5000
+
+
+class _ZipSink:
+    """Write-only file object the ZIP writer appends to; drained after each entry."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+# select_posts() fills in the filters; user_id and id come first so idx_blog_posts_user_id serves it.
+SELECT_POSTS_QUERY = """
+    SELECT p.id, p.topic, inflate(b.content) AS content
+    FROM blog_posts p LEFT JOIN post_bodies b ON b.post_id = p.id
+    WHERE {where}
+    ORDER BY id LIMIT {batch}
+"""
+
+def created_at_bound(value: str) -> str:
+    """
+    An ISO 8601 date or date-time as the UTC 'YYYY-MM-DD HH:MM:SS' text
+    created_at holds, so the two compare correctly as strings. Times
+    without an offset are UTC. Raises ValueError on anything else.
+    """
+    return datetime.fromtimestamp(parse_schedule(value), timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def select_posts(user_id: str, post_ids=None, status=None, created_after=None, created_before=None):
+    """
+    Yields the user's matching posts in id order, BULK_EXPORT_BATCH rows
+    per query. created_after/created_before are created_at_bound() values.
+    """
+    where = ["user_id = ?", "id > ?"]
+    params = [user_id]
+    if post_ids:
+        where.append(f"id IN ({', '.join('?' * len(post_ids))})")
+        params.extend(post_ids)
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    if created_after:
+        where.append("created_at >= ?")
+        params.append(created_after)
+    if created_before:
+        where.append("created_at < ?")
+        params.append(created_before)
+
+    query = SELECT_POSTS_QUERY.format(where=" AND ".join(where), batch=BULK_EXPORT_BATCH)
+    last_id = 0
+    while True:
+        with read_db() as db:
+            rows = db.execute(query, [params[0], last_id] + params[1:]).fetchall()
+        for row in rows:
+            yield dict(row)
+        if len(rows) < BULK_EXPORT_BATCH:
+            return
+        last_id = rows[-1]["id"]
+
+def entry_name(post: dict, format_type: str) -> str:
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", post["topic"] or "untitled").strip("-").lower()[:60]
+    return f"{post['id']:06d}-{slug or 'untitled'}.{FORMATS[format_type][1]}"
+
+def render_post(post: dict, format_type: str, process_pool=None) -> bytes:
+    title = post.get("topic") or "Untitled"
+    content = post.get("content") or "No content available."
+    # Reuse single-post renders, but don't let a bulk run flush that cache.
+    body = export_cache.get(post["id"], export_etag(title, content, format_type), format_type)
+    if body is not None:
+        return body
+    if process_pool is not None:
+        return process_pool.submit(render_export, title, content, format_type).result()
+    return render_export(title, content, format_type)
+
+def stream_zip_export(posts, format_type: str, workers: int = BULK_EXPORT_WORKERS):
+    """
+    Yields ZIP bytes for the given posts, entry by entry in completion
+    order. At most 2 * workers posts are loaded or rendered at once.
+    """
+    sink = _ZipSink()
+    process_pool = get_process_pool() if format_type in PROCESS_FORMATS else None
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-export")
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            pending = {}
+            posts = iter(posts)
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < workers * 2:
+                    post = next(posts, None)
+                    if post is None:
+                        exhausted = True
+                        break
+                    future = pool.submit(render_post, post, format_type, process_pool)
+                    pending[future] = entry_name(post, format_type)
+
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        archive.writestr(name, future.result())
+                    except Exception as e:
+                        # One bad post shouldn't truncate the whole archive.
+                        logger.exception("Bulk export failed for %s", name)
+                        archive.writestr(f"{name}.error.txt", f"Export failed: {e}")
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+        yield sink.drain()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
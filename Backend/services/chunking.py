@@ -0,0 +1,100 @@
+"""
+Splits long Markdown posts into chunks of up to CHUNK_CHARS so LLM passes
+can run per chunk, concurrently, with each chunk retried on its own.
+"""
+import asyncio
+import logging
+import os
+import re
+
+from services.ratelimit import is_rate_limit_error, retry_delay
+
+logger = logging.getLogger(__name__)
+
+CHUNK_CHARS = int(os.getenv("CHUNK_CHARS", "3000"))
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))
+# Retries for other errors; the throttle has already retried a 429 LLM_MAX_RETRIES times.
+CHUNK_RETRIES = int(os.getenv("CHUNK_RETRIES", "2"))
+
+HEADING = re.compile(r"^#{1,6}\s", re.MULTILINE)
+
+
+def pack(parts, max_chars: int):
+    """Joins consecutive parts with blank lines into as few chunks of at most max_chars as it can."""
+    chunks = []
+    current = ""
+    for part in parts:
+        if current and len(current) + 2 + len(part) > max_chars:
+            chunks.append(current)
+            current = part
+        else:
+            current = f"{current}\n\n{part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_markdown(content: str, max_chars: int = CHUNK_CHARS):
+    """
+    Packs whole heading sections into chunks of at most max_chars. Only a
+    section longer than that is cut, between paragraphs; a single paragraph
+    longer than max_chars stays whole. "\n\n".join(chunks) restores the
+    post's structure.
+    """
+    content = (content or "").strip()
+    if not content:
+        return []
+
+    starts = [m.start() for m in HEADING.finditer(content)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [content[a:b].strip() for a, b in zip(starts, starts[1:] + [len(content)])]
+
+    pieces = []
+    for section in filter(None, sections):
+        if len(section) <= max_chars:
+            pieces.append(section)
+        else:
+            paragraphs = [p.strip() for p in re.split(r"\n\s*\n", section)]
+            pieces.extend(pack(filter(None, paragraphs), max_chars))
+    return pack(pieces, max_chars)
+
+
+class ChunkFailed(Exception):
+    def __init__(self, index: int, error: Exception):
+        super().__init__(f"chunk {index}: {error}")
+        self.index = index
+        self.error = error
+
+
+async def map_chunks(chunks, fn, concurrency: int = CHUNK_CONCURRENCY, retries: int = CHUNK_RETRIES,
+                     on_progress=None):
+    """
+    Runs `await fn(chunk)` for every chunk, at most `concurrency` at a time.
+    Returns results in chunk order; a chunk that still fails after its
+    retries yields a ChunkFailed in its slot instead of failing the rest.
+    Rate-limit errors are not retried here: fn's throttle already has.
+    on_progress(done, total) is called as chunks finish.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def run(index: int, chunk):
+        nonlocal done
+        for attempt in range(retries + 1):
+            async with semaphore:
+                try:
+                    result = await fn(chunk)
+                    break
+                except Exception as e:
+                    if attempt == retries or is_rate_limit_error(e):
+                        result = ChunkFailed(index, e)
+                        break
+                    logger.warning("Chunk %d failed (attempt %d), retrying: %s", index, attempt + 1, e)
+            await asyncio.sleep(retry_delay(attempt))
+        done += 1
+        if on_progress:
+            await on_progress(done, len(chunks))
+        return result
+
+    return await asyncio.gather(*(run(i, chunk) for i, chunk in enumerate(chunks)))
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    def __init__(self, user_id: str, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.changed = asyncio.Event()
+
+    def wake(self):
+        self.changed.set()
+
+
+class EventHub:
+    """
+    In-process fan-out of "this user's posts changed" signals. The events
+    themselves live in the post_events table; the hub only wakes the
+    subscriber so it reads them immediately instead of at its next poll.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: str) -> Subscription:
+        sub = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[user_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def publish(self, user_id: str):
+        """Safe to call from any thread."""
+        if not user_id:
+            return
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.wake)
+            except RuntimeError:
+                self.unsubscribe(sub)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+hub = EventHub()
+
+def publish_change(user_id: str):
+    hub.publish(user_id)
@@ -0,0 +1,244 @@
+"""
+Post export rendering plus a cache of rendered artifacts.
+
+Artifacts are keyed by a hash of everything that shapes the output
+(title, content, format, renderer version), which doubles as a strong
+ETag. A changed row can never be served stale; invalidate_exports() only
+frees the space held by old versions. On disk each post has its own
+directory, {EXPORT_CACHE_DIR}/{post_id}/{digest}.{format}, so
+invalidating one post never lists the others.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from services.metrics import span
+
+EXPORT_CACHE_BYTES = int(os.getenv("EXPORT_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Directory for a persistent copy of rendered artifacts; empty disables it.
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "")
+EXPORT_PROCESSES = int(os.getenv("EXPORT_PROCESSES", "2"))
+# Bump when the rendered output changes so old ETags stop matching.
+RENDER_VERSION = "1"
+
+FORMATS = {
+    "pdf": ("application/pdf", "pdf"),
+    "txt": ("text/plain", "txt"),
+    "markdown": ("text/markdown", "md"),
+    "html": ("text/html", "html"),
+}
+# Formats worth shipping to another process; the rest are plain string formatting.
+PROCESS_FORMATS = {"pdf"}
+
+
+def normalize_format(format_type: str) -> str:
+    format_type = (format_type or "").lower()
+    return format_type if format_type in FORMATS else "html"
+
+def clean_for_pdf(text: str) -> str:
+    if not text:
+        return ""
+
+    replacements = {
+        "\u2013": "-",   # en dash
+        "\u2014": "-",   # em dash
+        "\u2018": "'",   # left single quote
+        "\u2019": "'",   # right single quote
+        "\u201c": '"',   # left double quote
+        "\u201d": '"',   # right double quote
+        "\u2022": "*",   # bullet
+    }
+
+    for unicode_char, ascii_char in replacements.items():
+        text = text.replace(unicode_char, ascii_char)
+
+    # Ensure compatibility with FPDF (latin-1 only)
+    return text.encode("latin-1", "ignore").decode("latin-1")
+
+def export_filename(title: str, format_type: str) -> str:
+    extension = FORMATS[format_type][1]
+    if format_type == "pdf":
+        # ✅ Safe filename (no special characters)
+        return f"{re.sub(r'[^a-zA-Z0-9_-]', '_', clean_for_pdf(title))}.{extension}"
+    return f"{title}.{extension}"
+
+def render_export(title: str, content: str, format_type: str) -> bytes:
+    """Renders a post; top-level and import-light so it can run in a worker process."""
+    if format_type == "pdf":
+        # fpdf is only needed here, mostly inside the render processes.
+        from fpdf import FPDF
+
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", 'B', 16)
+        pdf.cell(0, 10, clean_for_pdf(title), ln=True, align='C')
+        pdf.ln(10)
+
+        pdf.set_font("Arial", size=12)
+        pdf.multi_cell(0, 10, clean_for_pdf(content))
+
+        # ✅ CRITICAL FIX: convert string → bytes
+        return pdf.output(dest='S').encode('latin-1')
+
+    elif format_type == "txt":
+        return f"TOPIC: {title}\n\n{content}".encode()
+
+    elif format_type == "markdown":
+        return f"# {title}\n\n{content}".encode()
+
+    else:
+        html_body = f"""
+        <html>
+            <body>
+                <h1>{title}</h1>
+                <p>{content.replace('\n', '<br>')}</p>
+            </body>
+        </html>
+        """
+        return html_body.encode()
+
+def export_etag(title: str, content: str, format_type: str) -> str:
+    digest = hashlib.sha256(
+        "\x00".join((RENDER_VERSION, format_type, title, content)).encode()
+    ).hexdigest()
+    return f'"{digest[:40]}"'
+
+
+class ExportCache:
+    """Byte-bounded LRU of rendered artifacts with an optional on-disk copy."""
+
+    def __init__(self, max_bytes: int = EXPORT_CACHE_BYTES, directory: str = EXPORT_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _post_dir(self, post_id: int) -> str:
+        return os.path.join(self.directory, str(post_id))
+
+    def _path(self, post_id: int, etag: str, format_type: str) -> str:
+        digest = etag.strip('"')
+        return os.path.join(self._post_dir(post_id), f"{digest}.{format_type}")
+
+    def get(self, post_id: int, etag: str, format_type: str):
+        key = (post_id, etag, format_type)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+
+        if self.directory:
+            try:
+                with open(self._path(*key), "rb") as f:
+                    body = f.read()
+                self._remember(key, body)
+                with self._lock:
+                    self.disk_hits += 1
+                return body
+            except FileNotFoundError:
+                pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, post_id: int, etag: str, format_type: str, body: bytes):
+        key = (post_id, etag, format_type)
+        self._remember(key, body)
+        if self.directory:
+            path = self._path(*key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp, "wb") as f:
+                    f.write(body)
+                os.replace(tmp, path)
+            except FileNotFoundError:
+                # Invalidated mid-write; the copy in memory is still served.
+                pass
+
+    def _remember(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def invalidate(self, post_id: int):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == post_id]:
+                self._bytes -= len(self._entries.pop(key))
+        if self.directory:
+            shutil.rmtree(self._post_dir(post_id), ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+export_cache = ExportCache()
+_process_pool = None
+_pool_lock = threading.Lock()
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: the parent holds DB connections and worker threads.
+            _process_pool = ProcessPoolExecutor(
+                max_workers=EXPORT_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+def invalidate_exports(post_id: int):
+    export_cache.invalidate(post_id)
+
+async def get_export(post_id: int, etag: str, title: str, content: str, format_type: str) -> bytes:
+    """Returns the artifact for export_etag(title, content, format_type), rendering on a miss."""
+    loop = asyncio.get_running_loop()
+    body = await loop.run_in_executor(None, export_cache.get, post_id, etag, format_type)
+    if body is None:
+        with span(f"export.render.{format_type}"):
+            if format_type in PROCESS_FORMATS:
+                body = await loop.run_in_executor(get_process_pool(), render_export, title, content, format_type)
+            else:
+                body = render_export(title, content, format_type)
+        await loop.run_in_executor(None, export_cache.put, post_id, etag, format_type, body)
+    return body
+
+def export_stats() -> dict:
+    return export_cache.stats()
@@ -0,0 +1,85 @@
+"""
+Query and snippet helpers for full-text search over blog_posts_fts.
+
+to_match_query() turns what the user typed into an FTS5 MATCH scoped to
+their own posts; make_snippet() picks the stretch of a matching post to
+show, with the searched words marked. Both see words as the index's
+tokenizer (unicode61, remove_diacritics 2) does.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from itertools import islice
+
+# Words of context in a search result's snippet.
+SNIPPET_TOKENS = 16
+# A word as the search index's tokenizer sees it: underscores split words.
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def to_match_query(query: str, user_id: str) -> str:
+    """
+    Turns free text into an FTS5 query: every word must match, as a prefix,
+    in the text columns of the user's own posts (owner holds hex(user_id)).
+    """
+    # Underscores split words as the tokenizer does, so each piece must match on its own.
+    terms = TOKEN_PATTERN.findall(query)
+    if not terms:
+        return ""
+    words = " ".join(f'"{term}"*' for term in terms)
+    return f'owner : "{user_id.encode().hex()}" AND {{topic keywords content}} : ({words})'
+
+@lru_cache(maxsize=4096)
+def fold_char(char: str) -> str:
+    base = "".join(c for c in unicodedata.normalize("NFKD", char.lower()) if not unicodedata.combining(c))
+    return base if len(base) == 1 else char
+
+def fold(text: str) -> str:
+    """Lowercase and unaccented like the index's tokenizer, one character for one."""
+    lowered = text.lower()
+    if lowered.isascii() and len(lowered) == len(text):
+        return lowered
+    return "".join(map(fold_char, text))
+
+def make_snippet(texts, terms, size: int = SNIPPET_TOKENS) -> str:
+    """
+    The `size`-word stretch of the first of `texts` with the most words
+    starting with one of `terms`, those words in <mark>, cut ends marked '…'.
+    """
+    # Each term, then a look back over it for a letter before; faster than looking back first.
+    match = re.compile("|".join(f"{term}(?<![^\\W_]{term})" for term in map(re.escape, map(fold, terms))))
+    best = None
+    for text in texts:
+        if not text:
+            continue
+        hits = [m.start() for m in match.finditer(fold(text))]
+        # Roughly which word each hit is; only picking the window relies on it.
+        words = [0]
+        for previous, position in zip(hits, hits[1:]):
+            words.append(words[-1] + text.count(" ", previous, position))
+        last = 0
+        for first in range(len(hits)):
+            while last < len(hits) and words[last] < words[first] + size:
+                last += 1
+            if best is None or last - first > best[0]:
+                best = (last - first, text, hits, hits[first])
+    if best is None:
+        return ""
+
+    _, text, hits, position = best
+    hits = set(hits)
+    tokens = list(islice(TOKEN_PATTERN.finditer(text, position), size + 1))
+    if len(tokens) < size:
+        # Near the end: take the missing words from before the hit instead.
+        lookback = max(0, position - 64 * (size - len(tokens)))
+        before = list(TOKEN_PATTERN.finditer(text, lookback, position))
+        tokens = before[len(tokens) - size:] + tokens
+    window = tokens[:size]
+    pieces = []
+    offset = window[0].start()
+    for token in window:
+        pieces.append(text[offset:token.start()])
+        pieces.append(f"<mark>{token.group()}</mark>" if token.start() in hits else token.group())
+        offset = token.end()
+    cut_start = TOKEN_PATTERN.search(text, 0, window[0].start()) is not None
+    return ("…" if cut_start else "") + "".join(pieces) + ("…" if len(tokens) > size else "")
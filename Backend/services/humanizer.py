@@ -1,29 +1,49 @@
-import os, json, re
-from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
+import json, logging, re
+from functools import lru_cache
+from services.llm import chat_model, ainvoke_throttled
+from services.metrics import span
+from services.ratelimit import get_throttle, INTERACTIVE
+from services.chunking import split_markdown, map_chunks, ChunkFailed
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 
-llm_rewriter = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash-lite",
-    temperature=0.85, 
-    google_api_key=os.getenv("humanizer_key")
-)
+@lru_cache(maxsize=None)
+def get_rewriter():
+    return chat_model(
+        "gemini-2.5-flash-lite",
+        api_key_env="humanizer_key",
+        service="humanizer",
+        temperature=0.85
+    )
 
-async def humanize_full_content(content: str, user_context: str = "", tone: str = "balanced"):
+def parse_rewrite(raw_text: str) -> str:
+    clean_json = re.sub(r'```json|```', '', raw_text).strip()
+    match = re.search(r"\{[\s\S]*\}", clean_json)
+    if not match:
+        raise ValueError("No JSON found in AI response")
+    data = json.loads(match.group(), strict=False)
+    rewritten = (data.get("rewritten_content") or "").strip()
+    if not rewritten:
+        raise ValueError("rewritten_content missing or empty")
+    return rewritten
+
+async def humanize_chunk(content: str, user_context: str = "", tone: str = "balanced") -> str:
     """
-    Stage 2: Full Content Refinement.
-    Targets and removes 'AI-markers' identified in the scan verdict.
+    Rewrites one chunk of a post (from split_markdown) and returns the
+    rewritten chunk's text alone, headings kept, ready to be joined back
+    in order. An empty or unparseable rewrite raises ValueError, so
+    map_chunks retries the chunk rather than stitching in a blank.
     """
     user_prompt = f"""
-    You are an AI Content Humanizer. Your mission is to rewrite the blog post below to achieve a Similarity Index of less than 20%.
+    You are an AI Content Humanizer. Your mission is to rewrite the blog post excerpt below to achieve a Similarity Index of less than 20%.
     
     STRATEGIC REWRITE RULES:
     1. DESTROY AI TRANSITIONS: Do NOT use 'At its core', 'In conclusion', 'Central to', 'The transformative power', or 'As we navigate'. Remove them entirely.
     2. INJECT PERSONALITY: Start sentences with first-person observations (e.g., "I noticed that...", "In my own workflow...", "What surprised me was...").
     3. BREAK LOGICAL SYMMETRY: AI is too balanced. Use short, punchy sentences followed by descriptive ones. Use informal contractions.
     4. USER SPECIFICS: Incorporate this context immediately: {user_context}
+    5. KEEP STRUCTURE: Keep every Markdown heading exactly as written. This is one part of a longer post, so do not add an introduction or conclusion.
 
     TARGET TONE: {tone}
 
@@ -35,11 +55,42 @@ async def humanize_full_content(content: str, user_context: str = "", tone: str
         "rewritten_content": "<human_version_here>"
     }}
     """
-    try:
-        response = await llm_rewriter.ainvoke(user_prompt)
-        raw_text = getattr(response, "content", "")
-        clean_json = re.sub(r'```json|```', '', raw_text).strip()
-        data = json.loads(clean_json)
-        return data
-    except Exception as e:
-        return {"rewritten_content": "", "error": str(e)}
\ No newline at end of file
+    with span("humanize.chunk"):
+        response = await ainvoke_throttled(
+            get_throttle("humanizer_key", "gemini-2.5-flash-lite"), get_rewriter(), user_prompt, INTERACTIVE
+        )
+        return parse_rewrite(getattr(response, "content", ""))
+
+async def humanize_full_content(content: str, user_context: str = "", tone: str = "balanced", on_progress=None):
+    """
+    Rewrites the post chunk by chunk (whole sections, packed up to
+    CHUNK_CHARS) in parallel and reassembles it in order. A chunk that
+    keeps failing is left as it was and reported in failed_chunks.
+    """
+    chunks = split_markdown(content)
+    if not chunks:
+        return {"rewritten_content": "", "error": "Nothing to rewrite"}
+
+    with span("humanize.total"):
+        results = await map_chunks(
+            chunks,
+            lambda chunk: humanize_chunk(chunk, user_context, tone),
+            on_progress=on_progress
+        )
+
+    failed = [r for r in results if isinstance(r, ChunkFailed)]
+    for r in failed:
+        logger.error("Humanize failed: %s", r)
+
+    rewritten = "\n\n".join(
+        chunk if isinstance(r, ChunkFailed) else r
+        for chunk, r in zip(chunks, results)
+    )
+    result = {
+        "rewritten_content": rewritten if len(failed) < len(chunks) else "",
+        "chunks": len(chunks),
+        "failed_chunks": [r.index for r in failed]
+    }
+    if failed:
+        result["error"] = str(failed[0])
+    return result
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult, LLMResult
+from langchain_core.runnables import RunnableSequence
+
+from services.metrics import llm_calls, llm_output_bytes, llm_seconds, llm_tokens
+
+# "gemini" (default) or "stub" for offline runs with canned, streamed output.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+# Responses are cached only for near-deterministic calls unless a service opts in.
+# LLM_CACHE_SERVICES="writer,-plagiarism" forces caching on for the writer and off
+# for plagiarism; LLM_CACHE=off disables it everywhere.
+LLM_CACHE = os.getenv("LLM_CACHE", "on")
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+
+
+def parse_cache_services(value: str) -> set:
+    """LLM_CACHE_SERVICES as a set: service names opt in, "-" + a name opts out."""
+    return {s.strip() for s in value.split(",") if s.strip()}
+
+LLM_CACHE_SERVICES = parse_cache_services(os.getenv("LLM_CACHE_SERVICES", ""))
+
+STUB_RESPONSE = """# A Practical Guide
+
+Every good post starts with a question worth answering. This one is no different.
+
+## Why It Matters
+
+Teams that measure before they optimise ship faster and break less. The numbers tell the story.
+
+## Getting Started
+
+Pick one bottleneck, fix it, and measure again. Repeat until the graph is boring.
+
+## Conclusion
+
+Small, verified improvements compound. Start with the slowest thing you can see.
+"""
+
+# Services that parse JSON out of the model get a reply in their format.
+STUB_RESPONSES = {
+    "researcher": json.dumps({"sections": [
+        {"heading": "Why It Matters", "points": ["The problem", "Who it affects"]},
+        {"heading": "Getting Started", "points": ["First steps", "Common mistakes"]},
+        {"heading": "Measuring Progress", "points": ["What to track"]},
+    ]}),
+    "plagiarism": json.dumps({
+        "overall_similarity_score": 12,
+        "risk_level": "low",
+        "analysis_summary": "Stub scan: no notable AI patterns.",
+    }),
+    "humanizer": json.dumps({"rewritten_content": STUB_RESPONSE}),
+}
+
+
+class StubRateLimitError(Exception):
+    """What an injected stub failure raises; reads as a 429 to the throttle."""
+
+
+class LLMMetrics(BaseCallbackHandler):
+    """Records latency, outcome, tokens and output size of every call a service makes."""
+
+    run_inline = True
+
+    def __init__(self, service: str, model: str):
+        self.service = service or "unknown"
+        self.model = model
+        self._started = {}
+
+    def _start(self, run_id):
+        self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def _finish(self, run_id, outcome: str):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            llm_seconds.observe(time.perf_counter() - started, self.service, self.model)
+        llm_calls.inc(self.service, self.model, outcome)
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        self._finish(run_id, "ok")
+        for generations in response.generations:
+            for generation in generations:
+                llm_output_bytes.inc(self.service, self.model, amount=len(generation.text.encode("utf-8")))
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                for direction in ("input", "output"):
+                    if usage.get(f"{direction}_tokens"):
+                        llm_tokens.inc(self.service, self.model, direction, amount=usage[f"{direction}_tokens"])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+
+class StubChatModel(BaseChatModel):
+    """Offline chat model that streams a canned response word by word."""
+
+    response: str = STUB_RESPONSE
+    first_token_delay: float = 0.0
+    chunk_delay: float = 0.0
+    # Share of calls that fail with a simulated 429 before producing output.
+    failure_rate: float = 0.0
+    model: str = "stub"
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model, "temperature": self.temperature}
+
+    def _chunks(self) -> List[str]:
+        words = self.response.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _maybe_fail(self):
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise StubRateLimitError("429 RESOURCE_EXHAUSTED (stub failure injection)")
+
+    def _usage(self, messages: List[BaseMessage]) -> dict:
+        # Word counts stand in for tokens so the stub feeds llm_tokens_total too.
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = len(self._chunks())
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.first_token_delay)
+        self._maybe_fail()
+        time.sleep(self.chunk_delay * len(self._chunks()))
+        message = AIMessage(content=self.response, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_delay)
+        self._maybe_fail()
+        chunks = self._chunks()
+        for n, text in enumerate(chunks):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            usage = self._usage(messages) if n == len(chunks) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text, usage_metadata=usage))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+def using_stub() -> bool:
+    return LLM_BACKEND == "stub"
+
+def cache_enabled(service: str, temperature) -> bool:
+    if LLM_CACHE == "off" or not service:
+        return False
+    if service in LLM_CACHE_SERVICES:
+        return True
+    if f"-{service}" in LLM_CACHE_SERVICES:
+        return False
+    return temperature is not None and temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+def chat_model(model: str = "gemini-2.5-flash-lite", api_key_env: str = None, service: str = None, **kwargs):
+    """Builds the chat model for a service; every service should get its LLM from here."""
+    if cache_enabled(service, kwargs.get("temperature")):
+        from services.llm_cache import get_llm_cache
+
+        kwargs["cache"] = get_llm_cache(service, model, kwargs.get("temperature"))
+    kwargs["callbacks"] = [*kwargs.get("callbacks", []), LLMMetrics(service, model)]
+
+    if using_stub():
+        return StubChatModel(
+            response=STUB_RESPONSES.get(service, STUB_RESPONSE),
+            failure_rate=float(os.getenv("STUB_LLM_FAILURE_RATE", "0")),
+            model=model,
+            temperature=kwargs.get("temperature", 0.0),
+            first_token_delay=float(os.getenv("STUB_LLM_FIRST_TOKEN_MS", "0")) / 1000,
+            chunk_delay=float(os.getenv("STUB_LLM_CHUNK_MS", "0")) / 1000,
+            cache=kwargs.get("cache"),
+            callbacks=kwargs["callbacks"],
+        )
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    if api_key_env:
+        kwargs["google_api_key"] = os.getenv(api_key_env)
+    return ChatGoogleGenerativeAI(model=model, **kwargs)
+
+
+def response_cache(runnable):
+    """The LLM cache of a model or of a prompt | model chain's model, if it has one."""
+    model = runnable.last if isinstance(runnable, RunnableSequence) else runnable
+    cache = getattr(model, "cache", None)
+    return cache if hasattr(cache, "peek") else None
+
+def cached_reply(runnable, inputs):
+    """
+    The message a prompt | model chain would answer `inputs` with from the
+    LLM cache: the prompt is rendered and serialised as the model's own
+    lookup does. None on a miss, without a cache, or for a bare model.
+    """
+    cache = response_cache(runnable)
+    if cache is None or not isinstance(runnable, RunnableSequence):
+        return None
+    generations = cache.peek(dumps(runnable.first.invoke(inputs).to_messages()))
+    return generations[0].message if generations else None
+
+def invoke_throttled(throttle, runnable, inputs, lane: int):
+    """
+    runnable.invoke(inputs) under the throttle. A cached answer is returned
+    without taking a slot or a token, so cache hits don't use up the quota.
+    """
+    cached = cached_reply(runnable, inputs)
+    if cached is not None:
+        return cached
+    return throttle.call(lambda: runnable.invoke(inputs), lane=lane)
+
+async def ainvoke_throttled(throttle, runnable, inputs, lane: int):
+    """invoke_throttled for async callers; the cache check runs off the event loop."""
+    cached = None
+    if response_cache(runnable) is not None:
+        cached = await asyncio.to_thread(cached_reply, runnable, inputs)
+    if cached is not None:
+        return cached
+    return await throttle.acall(lambda: runnable.ainvoke(inputs), lane=lane)
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import warnings
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, Generation
+
+from database.pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.db")
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# The persistent tier re-checks its total size after this many writes.
+SIZE_CHECK_EVERY = 50
+# Only these classes may be revived from the persistent tier.
+CACHED_TYPES = [Generation, ChatGeneration, ChatGenerationChunk, AIMessage, AIMessageChunk]
+
+LOOKUP_QUERY = "SELECT value, created_at FROM llm_cache WHERE key = ?"
+TOUCH_QUERY = "UPDATE llm_cache SET accessed_at = ? WHERE key = ?"
+EXPIRE_QUERY = "DELETE FROM llm_cache WHERE key = ?"
+# Checked like database.migrations.HOT_QUERIES, against the cache's own database.
+HOT_QUERIES = {
+    "llm cache lookup": (LOOKUP_QUERY, ("k",), "sqlite_autoindex_llm_cache_1"),
+    "llm cache touch": (TOUCH_QUERY, (0, "k"), "sqlite_autoindex_llm_cache_1"),
+    "llm cache expire": (EXPIRE_QUERY, ("k",), "sqlite_autoindex_llm_cache_1"),
+}
+
+
+def model_string(model: str, temperature) -> str:
+    """The llm_string cache keys are built with: the model and its temperature."""
+    return json.dumps([model, temperature])
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """llm_string is a model_string(); prompt is the rendered prompt, as langchain_core.load.dumps() writes it."""
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+
+class MemoryTier:
+    def __init__(self, max_entries: int = LLM_CACHE_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """Persistent tier with TTL expiry and least-recently-used eviction by total size."""
+
+    def __init__(self, path: str = LLM_CACHE_DB, ttl: int = LLM_CACHE_TTL_SECONDS,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.pool = ConnectionPool(path, readers=2)
+        self._writes = 0
+        with self.pool.writer() as db:
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def get(self, key: str):
+        with self.pool.reader() as db:
+            row = db.execute(LOOKUP_QUERY, (key,)).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        with self.pool.writer() as db:
+            if row["created_at"] + self.ttl <= now:
+                db.execute(EXPIRE_QUERY, (key,))
+                return None
+            db.execute(TOUCH_QUERY, (now, key))
+        return row["value"]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self.pool.writer() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now)
+            )
+            self._writes += 1
+            if self._writes % SIZE_CHECK_EVERY == 0:
+                self._evict(db, now)
+
+    def _evict(self, db, now: float):
+        db.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until we are back under 90% of the budget.
+        excess = total - int(self.max_bytes * 0.9)
+        db.execute('''
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, size, SUM(size) OVER (ORDER BY accessed_at, key) AS running
+                    FROM llm_cache
+                ) WHERE running - size < ?
+            )
+        ''', (excess,))
+
+    def clear(self):
+        with self.pool.writer() as db:
+            db.execute("DELETE FROM llm_cache")
+
+
+class TieredLLMCache(BaseCache):
+    """
+    LangChain cache shared by every service that opts in. Each service gets
+    its own instance (for per-service hit rates) over the same tiers.
+    """
+
+    def __init__(self, name: str, memory: MemoryTier, store: SQLiteTier = None):
+        self.name = name
+        self.memory = memory
+        self.store = store
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def peek(self, prompt: str, llm_string: str):
+        """
+        lookup() without counting a miss, for callers that check before
+        taking a throttle slot; the model's own lookup counts it after.
+        """
+        key = cache_key(prompt, llm_string)
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+
+        if self.store is not None:
+            try:
+                raw = self.store.get(key)
+            except Exception as e:
+                logger.exception("LLM cache read failed")
+                raw = None
+            if raw is not None:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    value = [loads(item, allowed_objects=CACHED_TYPES) for item in json.loads(raw)]
+                self.memory.put(key, value)
+                self._count("store_hits")
+                return value
+        return None
+
+    def lookup(self, prompt: str, llm_string: str):
+        value = self.peek(prompt, llm_string)
+        if value is None:
+            self._count("misses")
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        key = cache_key(prompt, llm_string)
+        self.memory.put(key, return_val)
+        if self.store is not None:
+            try:
+                self.store.put(key, json.dumps([dumps(gen) for gen in return_val]))
+            except Exception as e:
+                logger.exception("LLM cache write failed")
+
+    def clear(self, **kwargs):
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.store_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+
+class ModelCache(BaseCache):
+    """
+    A service's cache as one model uses it. Entries are keyed by the
+    model and temperature the service asked chat_model() for, not by the
+    llm_string LangChain passes in, so callers can look a reply up with
+    peek() from the rendered prompt alone.
+    """
+
+    def __init__(self, cache: TieredLLMCache, model: str, temperature=None):
+        self.cache = cache
+        self.llm_string = model_string(model, temperature)
+
+    def peek(self, prompt: str):
+        return self.cache.peek(prompt, self.llm_string)
+
+    def lookup(self, prompt: str, llm_string: str):
+        return self.cache.lookup(prompt, self.llm_string)
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        self.cache.update(prompt, self.llm_string, return_val)
+
+    def clear(self, **kwargs):
+        self.cache.clear(**kwargs)
+
+
+_memory = None
+_store = None
+_caches = {}
+_lock = threading.Lock()
+
+def get_llm_cache(service: str, model: str, temperature=None) -> ModelCache:
+    global _memory, _store
+    with _lock:
+        if service not in _caches:
+            if _memory is None:
+                _memory = MemoryTier()
+            if _store is None and LLM_CACHE_DB:
+                _store = SQLiteTier()
+            _caches[service] = TieredLLMCache(service, _memory, _store)
+        return ModelCache(_caches[service], model, temperature)
+
+def llm_cache_stats() -> dict:
+    with _lock:
+        caches = dict(_caches)
+    return {
+        "memory_entries": len(_memory) if _memory is not None else 0,
+        "services": {name: cache.stats() for name, cache in caches.items()},
+    }
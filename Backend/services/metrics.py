@@ -0,0 +1,211 @@
+"""
+In-process metrics in the Prometheus text format, served on /metrics.
+
+Counters and histograms are plain dicts behind a lock, so recording costs
+a couple of microseconds and can stay on in production. Histograms keep
+cumulative bucket counts only; quantiles are computed by Prometheus.
+Existing *_stats() snapshots (pool, jobs, throttles, caches) are exported
+as gauges at scrape time through register_collector().
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS", "on") != "off"
+
+# Seconds. Covers a cached SQLite read (sub-ms) through a slow Gemini call.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+_collectors = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = sorted((labels, list(series)) for labels, series in self._values.items())
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}"
+
+
+# ---------------- SHARED METRICS ----------------
+http_request_seconds = Histogram(
+    "http_request_seconds", "HTTP requests by route template, until the last body byte is sent.",
+    ("method", "route", "status")
+)
+stage_seconds = Histogram(
+    "stage_seconds", "Pipeline stages: search, outline, section writes, scans, renders.", ("stage",)
+)
+stage_errors = Counter("stage_errors_total", "Pipeline stages that raised.", ("stage",))
+db_call_seconds = Histogram("db_call_seconds", "Database helpers run through run_db.", ("helper",))
+db_wait_seconds = Histogram(
+    "db_wait_seconds", "Time spent waiting for a pooled connection (the SQLite writer lock).",
+    ("database", "kind")
+)
+llm_seconds = Histogram("llm_seconds", "LLM calls, first request to last token.", ("service", "model"))
+llm_calls = Counter("llm_calls_total", "LLM calls by outcome.", ("service", "model", "outcome"))
+llm_tokens = Counter("llm_tokens_total", "LLM tokens reported by the provider.", ("service", "model", "direction"))
+llm_output_bytes = Counter("llm_output_bytes_total", "UTF-8 bytes of LLM output.", ("service", "model"))
+
+
+@contextmanager
+def span(stage: str):
+    """Times a block into stage_seconds and counts it in stage_errors_total if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(stage)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage)
+
+
+def register_collector(prefix: str, stats_fn):
+    """
+    Exports a *_stats() snapshot as gauges at scrape time. Numeric leaves
+    become `<prefix>_<key>`; one level of nesting becomes a `name` label.
+    """
+    _collectors.append((prefix, stats_fn))
+
+def _collect(prefix: str, stats_fn):
+    try:
+        stats = stats_fn()
+    except Exception as e:
+        logger.exception("Metrics collector %s failed", prefix)
+        return
+    gauges = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            for field, inner in value.items():
+                if isinstance(inner, (int, float)) and not isinstance(inner, bool):
+                    gauges.setdefault(f"{prefix}_{field}", []).append((f'{{name="{_escape(key)}"}}', inner))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            gauges.setdefault(f"{prefix}_{key}", []).append(("", value))
+    for name, samples in gauges.items():
+        yield f"# TYPE {name} gauge"
+        for labels, value in samples:
+            yield f"{name}{labels} {_number(value)}"
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for prefix, stats_fn in _collectors:
+        lines.extend(_collect(prefix, stats_fn))
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by its route template
+    (/api/blog-posts/{post_id}, never the raw path). Streaming responses
+    are timed until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status)
+            )
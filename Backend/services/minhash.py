@@ -0,0 +1,126 @@
+"""
+Word-shingle MinHash signatures and an LSH index over them.
+
+Pure computation with no database access, so the write path can sign
+content without importing the similarity service.
+"""
+import os
+import re
+import zlib
+
+import numpy as np
+
+SHINGLE_WORDS = int(os.getenv("SIMILARITY_SHINGLE_WORDS", "5"))
+NUM_PERM = int(os.getenv("SIMILARITY_PERMUTATIONS", "128"))
+# 64 bands of 2 rows: posts sharing roughly 10% of their shingles are
+# usually candidates, and near-copies (50%+) virtually always are.
+LSH_BANDS = int(os.getenv("SIMILARITY_BANDS", "64"))
+
+# Hashes live below a Mersenne prime so (a * x + b) never overflows uint64.
+PRIME = np.uint64((1 << 31) - 1)
+BLOCK = 4096
+
+_rng = np.random.default_rng(1_234_567)
+_A = _rng.integers(1, int(PRIME), size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, int(PRIME), size=NUM_PERM, dtype=np.uint64)
+
+
+def shingle_hashes(text: str, n: int = SHINGLE_WORDS) -> np.ndarray:
+    """Distinct hashes of every run of n consecutive words."""
+    words = re.findall(r"\w+", (text or "").lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+
+    vocab = {}
+    ids = np.fromiter((vocab.setdefault(w, len(vocab)) for w in words), dtype=np.int64, count=len(words))
+    word_hashes = np.fromiter((zlib.crc32(w.encode()) for w in vocab), dtype=np.uint64, count=len(vocab))[ids]
+
+    n = min(n, len(words))
+    count = len(words) - n + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for k in range(n):
+        hashes = (hashes * np.uint64(1_000_003) + word_hashes[k:k + count]) % PRIME
+    return np.unique(hashes)
+
+def minhash_signature(text: str):
+    """Returns (signature, shingle_count); the signature is None for empty text."""
+    shingles = shingle_hashes(text)
+    if shingles.size == 0:
+        return None, 0
+
+    signature = np.full(NUM_PERM, PRIME, dtype=np.uint64)
+    for start in range(0, shingles.size, BLOCK):
+        block = shingles[start:start + BLOCK]
+        permuted = (_A[:, None] * block[None, :] + _B[:, None]) % PRIME
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature.astype(np.uint32), int(shingles.size)
+
+def encode_signature(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+def decode_signature(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u4")
+
+def stored_signature(text: str):
+    """(encoded signature or None, shingle count), as database.db.save_signature stores it."""
+    signature, shingles = minhash_signature(text)
+    return (encode_signature(signature) if signature is not None else None), shingles
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures; query() verifies candidates by signature agreement."""
+
+    def __init__(self, bands: int = LSH_BANDS, num_perm: int = NUM_PERM):
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = [{} for _ in range(bands)]
+        self._entries = {}
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key, signature: np.ndarray, shingles: int, owner=None):
+        self.remove(key)
+        self._entries[key] = (signature, shingles, owner)
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band, band_key in self._band_keys(entry[0]):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def query(self, signature: np.ndarray, shingles: int, exclude=None):
+        """
+        Returns (key, owner, jaccard, containment) for every candidate, most
+        similar first. containment is the estimated share of the query's
+        shingles that also appear in the candidate.
+        """
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        candidates.discard(exclude)
+        if not candidates:
+            return []
+
+        keys = list(candidates)
+        matrix = np.stack([self._entries[k][0] for k in keys])
+        jaccard = (matrix == signature).mean(axis=1)
+        sizes = np.array([self._entries[k][1] for k in keys], dtype=np.float64)
+        containment = np.minimum(1.0, jaccard * (shingles + sizes) / ((1 + jaccard) * shingles))
+
+        order = np.argsort(-containment, kind="stable")
+        return [
+            (keys[i], self._entries[keys[i]][2], float(jaccard[i]), float(containment[i]))
+            for i in order
+        ]
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,20 +1,47 @@
-import os
 import json
+import logging
 import re
-from dotenv import load_dotenv
+from functools import lru_cache
 from fastapi import HTTPException
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
+from services.llm import chat_model, ainvoke_throttled
+from services.metrics import span
+from services.ratelimit import get_throttle, INTERACTIVE
+from services.chunking import split_markdown, map_chunks, ChunkFailed
+from services.similarity import risk_level
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def get_checker():
+    """Built on first use; constructing the Gemini client is most of this module's import cost."""
+    return chat_model(
+        "gemini-2.5-flash-lite",
+        api_key_env="plag_key",
+        service="plagiarism",
+        temperature=0.2
+    )
+
+def parse_scan(raw: str) -> dict:
+    match = re.search(r"\{[\s\S]*\}", raw)
+    if not match:
+        raise ValueError("No JSON found in AI response")
+
+    data = json.loads(match.group())
+
+    if "overall_similarity_score" not in data:
+        raise KeyError("overall_similarity_score missing")
 
-load_dotenv()
+    score = int(data["overall_similarity_score"])
+    score = max(0, min(100, score))
 
-llm_checker = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash-lite",
-    temperature=0.2,  
-    google_api_key=os.getenv("plag_key")
-)
+    return {
+        "overall_similarity_score": score,
+        "risk_level": data.get("risk_level", "low"),
+        "analysis_summary": data.get("analysis_summary", "")
+    }
 
-async def analyze_content_patterns(content: str):
+async def scan_chunk(content: str) -> dict:
     """Plagiarism Scanner – PromptTemplate Safe"""
 
     template = """
@@ -41,40 +68,45 @@ Content:
         input_variables=["content"]
     )
 
-    chain = prompt | llm_checker
-
-    response = await chain.ainvoke({"content": content})
-    raw = getattr(response, "content", "").strip()
-
-    print("\n====== RAW GEMINI OUTPUT ======")
-    print(raw)
-    print("================================\n")
-
-    try:
-        match = re.search(r"\{[\s\S]*\}", raw)
-        if not match:
-            raise ValueError("No JSON found in AI response")
-
-        data = json.loads(match.group())
-
-        if "overall_similarity_score" not in data:
-            raise KeyError("overall_similarity_score missing")
-
-        score = int(data["overall_similarity_score"])
-        score = max(0, min(100, score))
-
-        return {
-            "overall_similarity_score": score,
-            "risk_level": data.get("risk_level", "low"),
-            "analysis_summary": data.get("analysis_summary", "")
-        }
-
-    except Exception as e:
-        print("\n❌ PLAGIARISM SCAN ERROR ❌")
-        print("ERROR:", e)
-        print("RAW OUTPUT:", raw)
+    chain = prompt | get_checker()
 
+    with span("plagiarism.chunk"):
+        response = await ainvoke_throttled(
+            get_throttle("plag_key", "gemini-2.5-flash-lite"), chain, {"content": content}, INTERACTIVE
+        )
+        raw = getattr(response, "content", "").strip()
+
+        try:
+            return parse_scan(raw)
+        except Exception as e:
+            logger.exception("Plagiarism scan returned unusable output")
+            raise
+
+async def analyze_content_patterns(content: str, on_progress=None):
+    """
+    Scans the post chunk by chunk (whole sections, packed up to CHUNK_CHARS)
+    in parallel and merges the chunk scores weighted by chunk length.
+    """
+    chunks = split_markdown(content) or [content]
+    with span("plagiarism.total"):
+        results = await map_chunks(chunks, scan_chunk, on_progress=on_progress)
+
+    scored = [(chunk, r) for chunk, r in zip(chunks, results) if not isinstance(r, ChunkFailed)]
+    failed = [r.index for r in results if isinstance(r, ChunkFailed)]
+    if not scored:
         raise HTTPException(
             status_code=500,
             detail="Plagiarism scan failed – see backend logs"
         )
+
+    total = sum(len(chunk) for chunk, _ in scored)
+    score = round(sum(r["overall_similarity_score"] * len(chunk) for chunk, r in scored) / total)
+    worst = sorted((r for _, r in scored), key=lambda r: -r["overall_similarity_score"])
+
+    return {
+        "overall_similarity_score": score,
+        "risk_level": risk_level(score),
+        "analysis_summary": " ".join(r["analysis_summary"] for r in worst[:3] if r["analysis_summary"]),
+        "chunks": len(chunks),
+        "failed_chunks": failed
+    }
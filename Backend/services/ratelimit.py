@@ -0,0 +1,237 @@
+"""
+Client-side throttling for Gemini calls, one Throttle per (API key, model).
+
+Each throttle combines a token bucket (requests per minute) with an
+AIMD concurrency limit: the limit creeps up while calls succeed quickly
+and halves whenever the provider answers 429. Waiting callers are served
+by lane, so interactive requests overtake queued background work.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "15"))
+LLM_BURST = int(os.getenv("LLM_BURST", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TARGET_LATENCY_SECONDS = float(os.getenv("LLM_TARGET_LATENCY_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 30.0
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    text = f"{type(error).__name__} {error}".lower()
+    return "429" in text or "resource_exhausted" in text or "resourceexhausted" in text or "rate limit" in text
+
+def retry_delay(attempt: int) -> float:
+    """Full jitter: anywhere between 0 and the exponential ceiling."""
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+class _Waiter:
+    __slots__ = ("grant", "cancelled")
+
+    def __init__(self, grant):
+        self.grant = grant
+        self.cancelled = False
+
+
+class Throttle:
+    def __init__(self, name: str, rate_per_minute: float = LLM_RATE_PER_MINUTE, burst: int = LLM_BURST,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, target_latency: float = LLM_TARGET_LATENCY_SECONDS,
+                 clock=time.monotonic):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.clock = clock
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer = None
+        self._lock = threading.Lock()
+
+        self.granted = 0
+        self.throttled = 0
+        self.decreases = 0
+
+    # ---------------- SCHEDULING ----------------
+    def _refill_locked(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _dispatch(self):
+        grants = []
+        with self._lock:
+            while self._waiters and self.in_flight < max(1, int(self.limit)):
+                _, _, waiter = self._waiters[0]
+                if waiter.cancelled:
+                    heapq.heappop(self._waiters)
+                    continue
+                self._refill_locked()
+                if self._tokens < 1:
+                    # At most one timer; only its own callback clears it.
+                    if self._timer is None:
+                        delay = (1 - self._tokens) / self.rate
+                        self._timer = threading.Timer(delay, self._on_timer)
+                        self._timer.daemon = True
+                        self._timer.start()
+                    break
+                heapq.heappop(self._waiters)
+                self._tokens -= 1
+                self.in_flight += 1
+                self.granted += 1
+                grants.append(waiter.grant)
+        for grant in grants:
+            grant()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self._dispatch()
+
+    def _enqueue(self, lane: int, grant) -> _Waiter:
+        waiter = _Waiter(grant)
+        with self._lock:
+            heapq.heappush(self._waiters, (lane, next(self._seq), waiter))
+        self._dispatch()
+        return waiter
+
+    def acquire(self, lane: int = BACKGROUND):
+        granted = threading.Event()
+        self._enqueue(lane, granted.set)
+        granted.wait()
+
+    async def aacquire(self, lane: int = INTERACTIVE):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve():
+            if future.cancelled():
+                # Cancelled after the slot was granted; hand it straight back.
+                self._return_slot()
+            else:
+                future.set_result(None)
+
+        waiter = self._enqueue(lane, lambda: loop.call_soon_threadsafe(resolve))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted and resolved, but cancelled before this task resumed.
+                self._return_slot()
+            else:
+                waiter.cancelled = True
+            raise
+
+    def _return_slot(self):
+        """Gives back a slot and its token unused, without counting it as a call."""
+        with self._lock:
+            self.in_flight -= 1
+            self.granted -= 1
+            self._tokens = min(self.burst, self._tokens + 1)
+        self._dispatch()
+
+    def release(self, latency: float, rate_limited: bool = False):
+        with self._lock:
+            self.in_flight -= 1
+            if rate_limited:
+                self.throttled += 1
+                self.decreases += 1
+                self.limit = max(1.0, self.limit / 2)
+            elif latency > self.target_latency:
+                self.decreases += 1
+                self.limit = max(1.0, self.limit * 0.9)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._dispatch()
+
+    # ---------------- CALL HELPERS ----------------
+    @contextmanager
+    def slot(self, lane: int = BACKGROUND):
+        """Holds one slot for a block, e.g. a whole streamed response."""
+        self.acquire(lane)
+        started = time.monotonic()
+        rate_limited = False
+        try:
+            yield
+        except Exception as e:
+            rate_limited = is_rate_limit_error(e)
+            raise
+        finally:
+            self.release(time.monotonic() - started, rate_limited)
+
+    @asynccontextmanager
+    async def aslot(self, lane: int = INTERACTIVE):
+        await self.aacquire(lane)
+        started = time.monotonic()
+        rate_limited = False
+        try:
+            yield
+        except Exception as e:
+            rate_limited = is_rate_limit_error(e)
+            raise
+        finally:
+            self.release(time.monotonic() - started, rate_limited)
+
+    def call(self, fn, lane: int = BACKGROUND, retries: int = LLM_MAX_RETRIES):
+        for attempt in range(retries + 1):
+            try:
+                with self.slot(lane):
+                    return fn()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == retries:
+                    raise
+            time.sleep(retry_delay(attempt))
+
+    async def acall(self, fn, lane: int = INTERACTIVE, retries: int = LLM_MAX_RETRIES):
+        for attempt in range(retries + 1):
+            try:
+                async with self.aslot(lane):
+                    return await fn()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == retries:
+                    raise
+            await asyncio.sleep(retry_delay(attempt))
+
+    def stats(self) -> dict:
+        with self._lock:
+            queued = sum(1 for _, _, w in self._waiters if not w.cancelled)
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queue_depth": queued,
+                "granted": self.granted,
+                "throttle_events": self.throttled,
+                "limit_decreases": self.decreases,
+            }
+
+
+_throttles = {}
+_lock = threading.Lock()
+
+def get_throttle(key_name: str, model: str) -> Throttle:
+    name = f"{key_name}:{model}"
+    with _lock:
+        if name not in _throttles:
+            _throttles[name] = Throttle(name)
+        return _throttles[name]
+
+def throttle_stats() -> dict:
+    with _lock:
+        throttles = dict(_throttles)
+    return {name: throttle.stats() for name, throttle in throttles.items()}
@@ -1,51 +1,90 @@
 import os
 import json
-from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_tavily import TavilySearch
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.prompts import ChatPromptTemplate
-from database.db import update_db_outline, get_db
-
-load_dotenv()
-
-def perform_research_and_outline(post_id: int, topic: str, keywords: str):
-    print(f"--- 🚀 DEBUG START: Post {post_id} ---")
-    try:
-        
-        if not os.getenv("GOOGLE_KEY") or not os.getenv("TAVILY_API_KEY"):
-            print("❌ ERROR: Missing API Keys in .env")
-            raise ValueError("Missing API Keys")
-
-        print("🔍 Step 1: Searching Tavily (Limited Results)...")
-        search = TavilySearch()
-        results = search.invoke({"query": f"{topic} {keywords}", "max_results": 2})
-        print("✅ Step 1: Search Successful")
-
-        print("🧠 Step 2: Calling Gemini...")
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite")
-        prompt = ChatPromptTemplate.from_template(
-            "Topic: {topic}. Research: {data}. Create a blog outline in JSON format only. "
-            "Structure: {{ \"sections\": [ {{ \"heading\": \"Title\", \"points\": [\"...\"] }} ] }}"
-        )
-        
-        chain = prompt | llm
-        response = chain.invoke({"topic": topic, "data": results})
-        print("✅ Step 2: Gemini Successful")
-
-        raw_content = response.content.strip()
-        if raw_content.startswith("```json"):
-            raw_content = raw_content.replace("```json", "", 1).replace("```", "", 1).strip()
-        elif raw_content.startswith("```"):
-            raw_content = raw_content.replace("```", "", 1).replace("```", "", 1).strip()
-
-        update_db_outline(post_id, raw_content)
-        print(f"🎉 SUCCESS: Post {post_id} is complete!")
-
-    except Exception as e:
-        print(f"❌ CRITICAL ERROR: {str(e)}")
-        db = get_db()
+from langchain_core.runnables import RunnableLambda
+from database.db import update_db_outline
+from services.llm import chat_model, invoke_throttled, using_stub
+from services.metrics import span
+from services.search import search_web, search_configured
+from services.ratelimit import get_throttle, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# In-flight searches and outline calls for a batch of posts. Outline calls are
+# also bounded by the Gemini throttle (LLM_MAX_CONCURRENCY).
+RESEARCH_BATCH_SEARCHES = int(os.getenv("RESEARCH_BATCH_SEARCHES", "8"))
+RESEARCH_BATCH_CONCURRENCY = int(os.getenv("RESEARCH_BATCH_CONCURRENCY", "4"))
+
+def check_research_keys():
+    if (not using_stub() and not os.getenv("GOOGLE_KEY")) or not search_configured():
+        raise ValueError("Missing API Keys")
+
+def build_outline_chain():
+    """Outline chain with every uncached call going through the Gemini throttle on the background lane."""
+    llm = chat_model("gemini-2.5-flash-lite", service="researcher")
+    prompt = ChatPromptTemplate.from_template(
+        "Topic: {topic}. Research: {data}. Create a blog outline in JSON format only. "
+        "Structure: {{ \"sections\": [ {{ \"heading\": \"Title\", \"points\": [\"...\"] }} ] }}"
+    )
+    
+    chain = prompt | llm
+    throttle = get_throttle("GOOGLE_KEY", "gemini-2.5-flash-lite")
+    return RunnableLambda(lambda inputs: invoke_throttled(throttle, chain, inputs, BACKGROUND))
+
+def clean_outline(response) -> str:
+    raw_content = response.content.strip()
+    if raw_content.startswith("```json"):
+        raw_content = raw_content.replace("```json", "", 1).replace("```", "", 1).strip()
+    elif raw_content.startswith("```"):
+        raw_content = raw_content.replace("```", "", 1).replace("```", "", 1).strip()
+    return raw_content
+
+def research_and_outline(post_id: int, topic: str, keywords: str):
+    """Runs search + outline generation for a post. Raises on failure so callers can retry."""
+    check_research_keys()
+
+    with span("research.search"):
+        results = search_web(f"{topic} {keywords}", max_results=2)
+    with span("research.outline"):
+        response = build_outline_chain().invoke({"topic": topic, "data": results})
+    with span("research.save"):
+        update_db_outline(post_id, clean_outline(response))
+
+def research_batch(posts) -> dict:
+    """
+    Researches many posts at once: all searches run concurrently, then the
+    outlines go through the chain's batch interface. Returns {post_id: error}
+    for the posts that failed; the rest have their outlines saved.
+    """
+    check_research_keys()
+    failed = {}
+
+    def search(post):
         try:
-            db.execute("UPDATE blog_posts SET status = 'ERROR' WHERE id = ?", (post_id,))
-            db.commit()
-        finally:
-            db.close()
\ No newline at end of file
+            with span("research.search"):
+                return search_web(f"{post['topic']} {post['keywords']}", max_results=2)
+        except Exception as e:
+            failed[post["id"]] = f"search: {e}"
+            return None
+
+    with ThreadPoolExecutor(max_workers=RESEARCH_BATCH_SEARCHES) as pool:
+        results = list(pool.map(search, posts))
+
+    ready = [(post, data) for post, data in zip(posts, results) if post["id"] not in failed]
+    with span("research.outline_batch"):
+        responses = build_outline_chain().batch(
+            [{"topic": post["topic"], "data": data} for post, data in ready],
+            config={"max_concurrency": RESEARCH_BATCH_CONCURRENCY},
+            return_exceptions=True
+        )
+
+    for (post, _), response in zip(ready, responses):
+        if isinstance(response, Exception):
+            failed[post["id"]] = f"outline: {response}"
+            continue
+        update_db_outline(post["id"], clean_outline(response))
+
+    logger.info("Batch: %d of %d outlines ready", len(posts) - len(failed), len(posts))
+    return failed
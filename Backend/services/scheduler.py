@@ -0,0 +1,178 @@
+"""
+Scheduled publishing.
+
+The database is the source of truth: every scheduled post carries a UTC
+epoch in scheduled_epoch, indexed for status = 'Scheduled'. A min-heap
+of upcoming due times decides when the scheduler thread wakes, so it
+sleeps until exactly the next publication instead of polling. Publishing
+itself is a conditional, batched UPDATE, so restarts and several workers
+running the scheduler at once never double-publish or miss a post.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from database.db import (
+    get_upcoming_schedule,
+    publish_due_posts,
+    get_unnormalized_schedules,
+    set_schedule_epochs
+)
+
+logger = logging.getLogger(__name__)
+
+# How many upcoming due times are kept in memory at once.
+SCHEDULER_HEAP_SIZE = int(os.getenv("SCHEDULER_HEAP_SIZE", "10000"))
+# Re-read the index this often to pick up posts scheduled by other processes.
+SCHEDULER_RESYNC_SECONDS = float(os.getenv("SCHEDULER_RESYNC_SECONDS", "60"))
+SCHEDULER_BATCH = int(os.getenv("SCHEDULER_BATCH", "500"))
+
+
+def parse_schedule(value: str) -> float:
+    """ISO 8601 to a UTC epoch; times without an offset are taken as UTC."""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class Scheduler:
+    def __init__(self, clock=time.time, heap_size: int = SCHEDULER_HEAP_SIZE,
+                 resync_seconds: float = SCHEDULER_RESYNC_SECONDS, batch: int = SCHEDULER_BATCH):
+        self.clock = clock
+        self.heap_size = heap_size
+        self.resync_seconds = resync_seconds
+        self.batch = batch
+        self._heap = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+        self._synced_at = 0.0
+        self.published = 0
+        self.wakeups = 0
+
+    def normalize_existing(self) -> int:
+        """Fills scheduled_epoch for posts scheduled before the column existed."""
+        epochs = []
+        for row in get_unnormalized_schedules():
+            try:
+                epochs.append((parse_schedule(row["scheduled_at"]), row["id"]))
+            except ValueError:
+                logger.warning("Post %s has an unreadable scheduled_at: %r", row["id"], row["scheduled_at"])
+        if epochs:
+            set_schedule_epochs(epochs)
+        return len(epochs)
+
+    def resync(self):
+        """Rebuilds the heap from the index. Stale entries are harmless: publishing re-checks the row."""
+        upcoming = get_upcoming_schedule(self.heap_size)
+        with self._lock:
+            self._heap = upcoming
+            heapq.heapify(self._heap)
+            self._synced_at = self.clock()
+            self._wake.notify()
+
+    def add(self, due: float, post_id: int):
+        """Called when this process schedules a post; wakes the thread if it is now the earliest."""
+        with self._lock:
+            heapq.heappush(self._heap, (due, post_id))
+            if self._heap[0] == (due, post_id):
+                self._wake.notify()
+
+    def next_due(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def run_pending(self) -> int:
+        """Publishes everything due now. Returns how many posts changed status."""
+        now = self.clock()
+        with self._lock:
+            due = False
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+                due = True
+            drained = not self._heap
+        if not due:
+            return 0
+
+        self.wakeups += 1
+        published = len(publish_due_posts(now, self.batch))
+        self.published += published
+        if published:
+            logger.info("Published %d scheduled posts", published)
+        if drained:
+            # Everything we held is done; load the next window from the index.
+            self.resync()
+        return published
+
+    def _timeout(self) -> float:
+        now = self.clock()
+        timeout = self._synced_at + self.resync_seconds - now
+        if self._heap:
+            timeout = min(timeout, self._heap[0][0] - now)
+        return max(0.0, timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.clock() - self._synced_at >= self.resync_seconds:
+                    self.resync()
+                self.run_pending()
+            except Exception as e:
+                logger.exception("Scheduler error")
+                self._stop.wait(1)
+                continue
+            with self._wake:
+                if not self._stop.is_set():
+                    self._wake.wait(self._timeout())
+
+    def start(self):
+        normalized = self.normalize_existing()
+        if normalized:
+            logger.info("Normalized %d scheduled posts to UTC epochs", normalized)
+        self.resync()
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "heap_size": len(self._heap),
+                "next_due": self._heap[0][0] if self._heap else None,
+                "published": self.published,
+                "wakeups": self.wakeups,
+            }
+
+
+_scheduler = None
+
+def start_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler()
+        _scheduler.start()
+
+def stop_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop(timeout=5)
+        _scheduler = None
+
+def schedule_added(due: float, post_id: int):
+    if _scheduler is not None:
+        _scheduler.add(due, post_id)
+
+def scheduler_stats() -> dict:
+    return _scheduler.stats() if _scheduler is not None else {"running": False}
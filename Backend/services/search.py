@@ -0,0 +1,157 @@
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# "tavily" (default) or "fake" for offline runs.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "tavily")
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+SEARCH_CACHE_ENTRIES = int(os.getenv("SEARCH_CACHE_ENTRIES", "1024"))
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class FakeSearch:
+    """Offline stand-in for TavilySearch that counts calls and can inject latency and failures."""
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, params: dict) -> dict:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("Fake search failure")
+        query = params["query"]
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"{query} result {n}",
+                    "url": f"https://example.com/{n}",
+                    "content": f"Background notes on {query}.",
+                }
+                for n in range(1, params.get("max_results", 2) + 1)
+            ],
+        }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SearchCache:
+    """
+    TTL + LRU cache of search results. Concurrent misses for the same query
+    share one outbound call: the first caller fetches, the rest wait for it.
+    """
+
+    def __init__(self, ttl: int = SEARCH_CACHE_TTL_SECONDS, max_entries: int = SEARCH_CACHE_ENTRIES,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_fetch(self, key, fetch):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+            with self._lock:
+                self._entries[key] = (flight.result, self.clock() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+search_cache = SearchCache()
+
+def get_search_client():
+    """One search client per process instead of one per post."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if SEARCH_BACKEND == "fake":
+                _client = FakeSearch(
+                    latency=float(os.getenv("FAKE_SEARCH_LATENCY_MS", "0")) / 1000,
+                    failure_rate=float(os.getenv("FAKE_SEARCH_FAILURE_RATE", "0"))
+                )
+            else:
+                from langchain_tavily import TavilySearch
+
+                _client = TavilySearch()
+        return _client
+
+def search_configured() -> bool:
+    return SEARCH_BACKEND == "fake" or bool(os.getenv("TAVILY_API_KEY"))
+
+def search_web(query: str, max_results: int = 2):
+    key = (normalize_query(query), max_results)
+    return search_cache.get_or_fetch(
+        key,
+        lambda: get_search_client().invoke({"query": key[0], "max_results": max_results})
+    )
+
+def search_stats() -> dict:
+    return search_cache.stats()
@@ -0,0 +1,126 @@
+"""
+Local, deterministic plagiarism pre-scan: which stored posts share word
+sequences with this one, and how much. Runs in milliseconds, so the
+LLM review is only an optional second stage.
+"""
+import os
+import threading
+
+from database.db import get_signatures_since, get_unsigned_posts, save_signatures
+from services.minhash import LSHIndex, decode_signature, minhash_signature, stored_signature
+
+SIMILARITY_MIN_SCORE = float(os.getenv("SIMILARITY_MIN_SCORE", "0.05"))
+SIMILARITY_MAX_MATCHES = int(os.getenv("SIMILARITY_MAX_MATCHES", "5"))
+
+
+def risk_level(score: int) -> str:
+    # Same bands as the verdicts in PlagiarismChecker.jsx.
+    if score <= 20:
+        return "low"
+    if score <= 50:
+        return "medium"
+    return "high"
+
+
+def sign_unsigned_posts(batch: int = 200) -> int:
+    """
+    Backfills signatures for posts written before the similarity index
+    existed. Run by the job workers; requests only read signatures.
+    """
+    signed = 0
+    while True:
+        rows = get_unsigned_posts(batch)
+        if not rows:
+            return signed
+        save_signatures([(row["id"], row["user_id"], stored_signature(row["content"])) for row in rows])
+        signed += len(rows)
+
+
+class SimilarityIndex:
+    """
+    In-memory LSH index mirrored from post_signatures. refresh() applies
+    rows newer than the last seq it saw, so writes from any process
+    (API or worker) show up on the next check, including signatures the
+    workers' backfill adds.
+    """
+
+    def __init__(self):
+        self.index = LSHIndex()
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            while True:
+                rows = get_signatures_since(self.seq)
+                for row in rows:
+                    if row["signature"] is None:
+                        self.index.remove(row["post_id"])
+                    else:
+                        self.index.add(
+                            row["post_id"],
+                            decode_signature(row["signature"]),
+                            row["shingles"],
+                            owner=row["user_id"]
+                        )
+                    self.seq = row["seq"]
+                if not rows:
+                    return
+
+    def check(self, post_id: int, user_id: str, content: str, scope: str = "own") -> dict:
+        self.refresh()
+        signature, shingles = minhash_signature(content)
+        if signature is None:
+            return self._result([], scope)
+
+        with self._lock:
+            candidates = self.index.query(signature, shingles, exclude=post_id)
+
+        matches = []
+        for other_id, owner, jaccard, containment in candidates:
+            if containment < SIMILARITY_MIN_SCORE:
+                break
+            own = owner == user_id
+            if scope == "own" and not own:
+                continue
+            matches.append({
+                # Other users' post ids are not disclosed.
+                "post_id": other_id if own else None,
+                "own_post": own,
+                "overlap": round(containment * 100),
+                "jaccard": round(jaccard, 3),
+            })
+            if len(matches) >= SIMILARITY_MAX_MATCHES:
+                break
+        return self._result(matches, scope)
+
+    def _result(self, matches, scope: str) -> dict:
+        score = max((m["overlap"] for m in matches), default=0)
+        if matches:
+            summary = (
+                f"Up to {score}% of this post's word sequences also appear in "
+                f"{len(matches)} stored post{'s' if len(matches) != 1 else ''}."
+            )
+        else:
+            summary = "No stored post shares a significant run of text with this one."
+        return {
+            "overall_similarity_score": score,
+            "risk_level": risk_level(score),
+            "analysis_summary": summary,
+            "matches": matches,
+            "scope": scope,
+            "method": "minhash",
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"indexed_posts": len(self.index), "seq": self.seq}
+
+
+similarity_index = SimilarityIndex()
+
+def check_similarity(post_id: int, user_id: str, content: str, scope: str = "own") -> dict:
+    return similarity_index.check(post_id, user_id, content, scope)
+
+def similarity_stats() -> dict:
+    return similarity_index.stats()
@@ -0,0 +1,332 @@
+"""
+Background job workers for research and writing.
+
+Runs inside the web process by default (JOB_WORKERS=inprocess). Set
+JOB_WORKERS=external on the web service and start workers separately with:
+
+    python -m services.worker
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+if __name__ == "__main__":
+    # Standalone workers don't start through main.py, which loads .env for the API.
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(levelname)s %(name)s: %(message)s")
+
+from database.db import init_db, get_post_for_research, get_posts_for_research, mark_post_error, reindex_stale_posts
+from database.hooks import register_hook
+from database.analytics import reconcile_post_stats
+from database.jobs import (
+    enqueue_job,
+    claim_job,
+    lease_job,
+    complete_job,
+    fail_job,
+    extend_leases,
+    prune_finished_jobs,
+    release_dead_workers,
+    enqueue_orphaned_posts
+)
+from services.scheduler import start_scheduler, stop_scheduler
+from services.similarity import sign_unsigned_posts
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = os.getenv("JOB_WORKERS", "inprocess")
+STAGE_CONCURRENCY = {
+    "research": int(os.getenv("RESEARCH_CONCURRENCY", "2")),
+    "write": int(os.getenv("WRITE_CONCURRENCY", "2")),
+}
+POLL_INTERVAL = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# Running jobs have their lease renewed this often, well inside VISIBILITY_TIMEOUT.
+HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))
+PRUNE_INTERVAL = 3600
+
+HOSTNAME = socket.gethostname()
+# A process reusing an earlier one's pid (pid 1 in every container start) still gets its own id.
+BOOT_ID = uuid.uuid4().hex
+WORKER_ID = f"{HOSTNAME}:{os.getpid()}:{BOOT_ID}"
+
+
+def job_post_ids(job: dict):
+    if job["post_id"]:
+        return [job["post_id"]]
+    return job["payload"].get("post_ids", [])
+
+def run_research(job: dict):
+    if job["post_id"] is None and "post_ids" in job["payload"]:
+        run_research_batch(job)
+        return
+
+    from services.researcher import research_and_outline
+
+    post = get_post_for_research(job["post_id"])
+    if not post:
+        return
+    research_and_outline(job["post_id"], post["topic"], post["keywords"])
+
+def run_research_batch(job: dict):
+    """Posts that fail inside the batch get their own single-post job and retries."""
+    from services.researcher import research_batch
+
+    posts = get_posts_for_research(job["payload"]["post_ids"])
+    if not posts:
+        return
+    failed = research_batch(posts)
+    for post_id, error in failed.items():
+        logger.warning("Post %s failed in batch (%s); retrying on its own", post_id, error)
+        enqueue_job("research", post_id)
+
+def run_write(job: dict):
+    from services.writer import write_blog_content
+
+    write_blog_content(job["post_id"])
+
+HANDLERS = {
+    "research": run_research,
+    "write": run_write,
+}
+
+
+def is_worker_alive(worker_id: str) -> bool:
+    """
+    worker_id is host:pid:boot id. Only workers on this host can be
+    checked; others are left to their lease expiry. A pid is alive while
+    it runs, unless it is this process's own pid under another boot id.
+    """
+    host, _, process = (worker_id or "").partition(":")
+    pid, _, boot_id = process.partition(":")
+    if host != HOSTNAME or not pid.isdigit():
+        return True
+    if int(pid) == os.getpid():
+        return boot_id == BOOT_ID
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        stage_limits: dict = None,
+        poll_interval: float = POLL_INTERVAL,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL
+    ):
+        self.stage_limits = stage_limits or STAGE_CONCURRENCY
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = WORKER_ID
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Condition()
+        self._running = {}
+        self._running_lock = threading.Lock()
+
+    def recover(self):
+        released = release_dead_workers(is_worker_alive)
+        orphaned = enqueue_orphaned_posts()
+        if released or orphaned:
+            logger.info("Recovered %d interrupted jobs and %d stuck posts", released, orphaned)
+        self._prune()
+
+    def start(self):
+        self.recover()
+        for kind, limit in self.stage_limits.items():
+            for n in range(limit):
+                thread = threading.Thread(
+                    target=self._loop, args=(kind,), name=f"{kind}-worker-{n}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        thread = threading.Thread(target=self._housekeeping, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def notify(self):
+        with self._wake:
+            self._wake.notify_all()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        self.notify()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self, kind: str):
+        while not self._stop.is_set():
+            try:
+                job = claim_job(kind, self.worker_id)
+            except Exception as e:
+                logger.exception("Job claim failed")
+                job = None
+
+            if job is None:
+                with self._wake:
+                    self._wake.wait(self.poll_interval)
+                continue
+
+            self._run(job)
+
+    def _run(self, job: dict):
+        with self._running_lock:
+            self._running[job["id"]] = job["kind"]
+        try:
+            HANDLERS[job["kind"]](job)
+            complete_job(job["id"])
+        except Exception as e:
+            logger.exception("Job %s (%s) failed on attempt %s", job["id"], job["kind"], job["attempts"])
+            if not fail_job(job, str(e)):
+                for post_id in job_post_ids(job):
+                    mark_post_error(post_id)
+        finally:
+            with self._running_lock:
+                self._running.pop(job["id"], None)
+
+    def _housekeeping(self):
+        """
+        Reconciles the analytics counters and backfills similarity
+        signatures once, then renews the leases of running jobs, re-indexes
+        posts changed outside the app for search and prunes old done jobs.
+        """
+        self.reconcile_stats()
+        self.sign_posts()
+        last_pruned = time.monotonic()
+        while not self._stop.wait(self.heartbeat_interval):
+            self.heartbeat()
+            self.reindex_search()
+            if time.monotonic() - last_pruned >= PRUNE_INTERVAL:
+                self._prune()
+                last_pruned = time.monotonic()
+
+    def heartbeat(self) -> int:
+        with self._running_lock:
+            running = dict(self._running)
+        if not running:
+            return 0
+        try:
+            return extend_leases(running, self.worker_id)
+        except Exception as e:
+            logger.exception("Job heartbeat failed")
+            return 0
+
+    def reconcile_stats(self) -> int:
+        """A full scan of blog_posts, so it runs here rather than before the API takes traffic."""
+        try:
+            drifted = reconcile_post_stats()
+        except Exception as e:
+            logger.exception("Analytics reconciliation failed")
+            return 0
+        if drifted:
+            logger.info("Rebuilt analytics counters; %d had drifted", drifted)
+        return drifted
+
+    def sign_posts(self) -> int:
+        """The similarity index's backfill, here so no plagiarism check has to wait for it."""
+        try:
+            signed = sign_unsigned_posts()
+        except Exception as e:
+            logger.exception("Similarity backfill failed")
+            return 0
+        if signed:
+            logger.info("Signed %d existing posts for the similarity index", signed)
+        return signed
+
+    def reindex_search(self) -> int:
+        try:
+            return reindex_stale_posts()
+        except Exception as e:
+            logger.exception("Search re-index failed")
+            return 0
+
+    def _prune(self):
+        try:
+            pruned = prune_finished_jobs()
+        except Exception as e:
+            logger.exception("Job pruning failed")
+            return
+        if pruned:
+            logger.info("Pruned %d finished jobs", pruned)
+
+
+@contextmanager
+def job_lease(kind: str, post_id: int):
+    """
+    Runs work done outside the pool, like /generate/stream, under a running
+    job of its own so recovery doesn't queue the post again. Call the
+    yielded heartbeat as the work progresses; if this process dies, the
+    lease lapses and a worker takes the job over.
+    """
+    worker_id = WORKER_ID
+    job = lease_job(kind, post_id, worker_id)
+    renewed = time.monotonic()
+
+    def heartbeat():
+        nonlocal renewed
+        if time.monotonic() - renewed >= HEARTBEAT_INTERVAL:
+            extend_leases({job["id"]: kind}, worker_id)
+            renewed = time.monotonic()
+
+    try:
+        yield heartbeat
+    except Exception as e:
+        fail_job(job, str(e))
+        raise
+    complete_job(job["id"])
+
+
+_pool = None
+
+def start_workers():
+    global _pool
+    if JOB_WORKERS == "inprocess" and _pool is None:
+        _pool = WorkerPool()
+        _pool.start()
+        start_scheduler()
+
+def notify_workers():
+    if _pool is not None:
+        _pool.notify()
+
+def stop_workers():
+    global _pool
+    if _pool is not None:
+        stop_scheduler()
+        _pool.stop(timeout=5)
+        _pool = None
+
+
+def main():
+    from services.exporter import invalidate_exports
+
+    # main.py registers these for the API process and in-process workers.
+    register_hook("content_changed", invalidate_exports)
+    init_db()
+    pool = WorkerPool()
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+
+    pool.start()
+    start_scheduler()
+    logger.info("Worker %s running: %s", pool.worker_id, pool.stage_limits)
+    stopped.wait()
+    logger.info("Stopping workers")
+    stop_scheduler()
+    pool.stop()
+
+if __name__ == "__main__":
+    main()
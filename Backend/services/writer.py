@@ -1,42 +1,230 @@
 import os
-from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
+import re
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain_core.prompts import ChatPromptTemplate
-from database.db import update_db_content, get_post_for_generation
+from database.db import (
+    update_db_content,
+    get_post_for_generation,
+    save_partial_content,
+    get_post_sections,
+    reset_post_sections,
+    save_post_section
+)
+from services.llm import chat_model, invoke_throttled, using_stub
+from services.metrics import span
+from services.minhash import stored_signature
+from services.ratelimit import get_throttle, BACKGROUND, INTERACTIVE
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-def generate_blog_content(post_id: int):
+# Partial content is written back at most this often while streaming.
+CHECKPOINT_SECONDS = float(os.getenv("STREAM_CHECKPOINT_SECONDS", "2"))
+
+# "single" (default) asks for the whole post in one call; "parallel" writes intro,
+# sections and conclusion concurrently from the outline. Parallel makes one call
+# per section plus two, on the background lane, so it suits paid-tier quotas.
+WRITER_MODE = os.getenv("WRITER_MODE", "single")
+# Sections written at once; 0 means all of them, as far as the Gemini throttle allows.
+SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", "0"))
+
+def save_article(post_id: int, text: str, if_idle: bool = False):
+    """Publishes the finished article with its similarity signature, computed before the write lock."""
+    update_db_content(post_id, text, stored_signature(text), if_idle)
+
+def writer_throttle():
+    return get_throttle("GOOGLE_KEY", "gemini-2.5-flash-lite")
+
+def writer_llm():
+    if not using_stub() and not os.getenv("GOOGLE_KEY"):
+        raise ValueError("Missing Google Gemini API Key")
+
+    return chat_model("gemini-2.5-flash-lite", api_key_env="GOOGLE_KEY", service="writer")
+
+def build_writer_chain():
+    llm = writer_llm()
+
+    prompt = ChatPromptTemplate.from_template(
+        "You are a professional blog writer. Topic: {topic}. "
+        "Outline: {outline}. "
+        "Task: Write a full, engaging blog post following this outline exactly. "
+        "Use clear Markdown headings, write at least 2-3 paragraphs per section, "
+        "and include an introduction and a compelling conclusion."
+    )
+
+    return prompt | llm
+
+def build_section_chain():
+    prompt = ChatPromptTemplate.from_template(
+        "You are a professional blog writer working on one part of a post. Topic: {topic}. "
+        "Full outline, for context only: {outline}. "
+        "Task: Write only the {part}. {focus} "
+        "Write 2-3 engaging Markdown paragraphs. Do not include a heading and do not "
+        "repeat material that belongs to other sections of the outline."
+    )
+    return prompt | writer_llm()
+
+def parse_outline(outline: str):
+    """Returns [(heading, points)] from the stored outline JSON, or [] if it cannot be read."""
+    text = re.sub(r"```(?:json)?", "", outline or "").strip()
     try:
-        if not os.getenv("GOOGLE_KEY"):
-            print("❌ ERROR: Missing GOOGLE_KEY in .env")
-            raise ValueError("Missing Google Gemini API Key")
-
-        post = get_post_for_generation(post_id)
-        if not post or not post['outline']:
-            raise ValueError("Outline data missing")
-
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash-lite",
-            api_key=os.getenv("GOOGLE_KEY")
-        )
-        
-        prompt = ChatPromptTemplate.from_template(
-            "You are a professional blog writer. Topic: {topic}. "
-            "Outline: {outline}. "
-            "Task: Write a full, engaging blog post following this outline exactly. "
-            "Use clear Markdown headings, write at least 2-3 paragraphs per section, "
-            "and include an introduction and a compelling conclusion."
-        )
-
-        chain = prompt | llm
-        response = chain.invoke({
-            "topic": post['topic'],
-            "outline": post['outline']
-        })
-
-        update_db_content(post_id, response.content)
-        print(f"✅ Success: Content generated for Post {post_id}")
+        data = json.loads(text)
+    except ValueError:
+        return []
+    sections = data.get("sections") if isinstance(data, dict) else None
+    if not isinstance(sections, list):
+        return []
+    return [
+        (str(section["heading"]), [str(point) for point in section.get("points") or []])
+        for section in sections
+        if isinstance(section, dict) and section.get("heading")
+    ]
+
+def plan_sections(outline: str):
+    """Outline sections plus an introduction and conclusion, unless the outline has its own."""
+    sections = parse_outline(outline)
+    if not sections:
+        return []
+    plan = [("section", heading, points) for heading, points in sections]
+    if re.match(r"(?i)intro", plan[0][1]):
+        plan[0] = ("intro",) + plan[0][1:]
+    else:
+        plan.insert(0, ("intro", "Introduction", []))
+    if len(plan) > 1 and re.match(r"(?i)(conclusion|final thoughts|wrapping up)", plan[-1][1]):
+        plan[-1] = ("conclusion",) + plan[-1][1:]
+    else:
+        plan.append(("conclusion", "Conclusion", []))
+    return plan
+
+def write_section(chain, topic: str, outline: str, section: dict, lane: int) -> str:
+    points = json.loads(section["points"])
+    if section["kind"] == "intro":
+        part, focus = "introduction", "Hook the reader and preview what the post covers."
+    elif section["kind"] == "conclusion":
+        part, focus = "conclusion", "Tie the sections together and end with a compelling takeaway."
+    else:
+        part, focus = f'section "{section["heading"]}"', ""
+    if points:
+        focus += f" Cover these points: {'; '.join(points)}."
+
+    inputs = {"topic": topic, "outline": outline, "part": part, "focus": focus.strip()}
+    with span("write.section"):
+        response = invoke_throttled(writer_throttle(), chain, inputs, lane)
+    text = response.content.strip()
+    # Drop a heading the model added anyway; stitch_sections adds its own.
+    return re.sub(r"\A#{1,6}[^\n]*\n+", "", text).strip()
+
+def stitch_sections(topic: str, sections) -> str:
+    parts = []
+    for section in sections:
+        heading = f"# {topic}" if section["kind"] == "intro" else f"## {section['heading']}"
+        parts.append(f"{heading}\n\n{section['content']}")
+    return "\n\n".join(parts)
+
+def write_sections(post_id: int, topic: str, outline: str, lane: int = BACKGROUND) -> bool:
+    """
+    Writes every unfinished section concurrently and saves each as it lands.
+    Sections already done (from an earlier, partly failed attempt) are kept,
+    so a retry only regenerates what failed. Returns False if the outline
+    has no usable sections.
+    """
+    plan = [(kind, heading, json.dumps(points)) for kind, heading, points in plan_sections(outline)]
+    if not plan:
+        return False
 
+    sections = get_post_sections(post_id)
+    if [(s["kind"], s["heading"], s["points"]) for s in sections] != plan:
+        reset_post_sections(post_id, plan)
+        sections = get_post_sections(post_id)
+
+    chain = build_section_chain()
+    pending = [s for s in sections if s["status"] != "done"]
+    failures = []
+    # More threads than the throttle lets through would only wait on it.
+    workers = min(len(pending), SECTION_CONCURRENCY or len(pending), writer_throttle().max_concurrency)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"sections-{post_id}") as pool:
+        futures = {pool.submit(write_section, chain, topic, outline, s, lane): s for s in pending}
+        for future in as_completed(futures):
+            section = futures[future]
+            try:
+                section["content"] = future.result()
+                section["status"] = "done"
+                save_post_section(post_id, section["position"], content=section["content"])
+            except Exception as e:
+                logger.exception("Section %s of post %s failed", section["position"], post_id)
+                save_post_section(post_id, section["position"], error=str(e))
+                failures.append(section["position"])
+
+    if failures:
+        raise RuntimeError(f"{len(failures)} of {len(sections)} sections failed: {failures}")
+
+    with span("write.save"):
+        save_article(post_id, stitch_sections(topic, sections))
+    return True
+
+def regenerate_section(post_id: int, position: int, lane: int = INTERACTIVE) -> dict:
+    """Rewrites one stored section and, once every section is done, re-stitches the post."""
+    post = get_post_for_generation(post_id)
+    sections = get_post_sections(post_id)
+    section = next((s for s in sections if s["position"] == position), None)
+    if not post or section is None:
+        raise LookupError("Section not found")
+
+    try:
+        section["content"] = write_section(build_section_chain(), post["topic"], post["outline"], section, lane)
+        section["status"], section["error"] = "done", None
+        save_post_section(post_id, position, content=section["content"])
     except Exception as e:
-        print(f"❌ Generation Error: {str(e)}")
+        save_post_section(post_id, position, error=str(e))
+        raise
+
+    # The route refuses posts being written; a generation started since then wins.
+    if all(s["status"] == "done" for s in sections):
+        save_article(post_id, stitch_sections(post["topic"], sections), if_idle=True)
+    return section
+
+def load_generation_input(post_id: int) -> dict:
+    post = get_post_for_generation(post_id)
+    if not post or not post['outline']:
+        raise ValueError("Outline data missing")
+    return {"topic": post['topic'], "outline": post['outline']}
+
+def write_blog_content(post_id: int):
+    """Expands a post's outline into the full article. Raises on failure so callers can retry."""
+    inputs = load_generation_input(post_id)
+    if WRITER_MODE == "parallel" and write_sections(post_id, inputs["topic"], inputs["outline"]):
+        return
+
+    chain = build_writer_chain()
+    with span("write.single"):
+        response = invoke_throttled(writer_throttle(), chain, inputs, BACKGROUND)
+    with span("write.save"):
+        save_article(post_id, response.content)
+
+def stream_blog_content(post_id: int, lane: int = INTERACTIVE):
+    """
+    Same as write_blog_content, but yields text as the model produces it and
+    checkpoints the partial article as the post's draft, so a crash keeps
+    what was written so far.
+    """
+    inputs = load_generation_input(post_id)
+    chain = build_writer_chain()
+
+    parts = []
+    last_checkpoint = time.monotonic()
+    with span("write.stream"), writer_throttle().slot(lane):
+        for chunk in chain.stream(inputs):
+            text = getattr(chunk, "content", "")
+            if not text:
+                continue
+            parts.append(text)
+            yield text
+
+            if time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+                save_partial_content(post_id, "".join(parts))
+                last_checkpoint = time.monotonic()
+
+    with span("write.save"):
+        save_article(post_id, "".join(parts))
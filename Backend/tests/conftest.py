@@ -0,0 +1,53 @@
+"""
+Shared fixtures. Each test gets a fresh blog_posts.db in its own temporary
+directory and the offline backends the benchmarks use, so nothing here
+calls Gemini, Tavily or Firebase.
+"""
+import os
+
+os.environ.pop("FIREBASE_CREDENTIALS", None)
+
+# Read once at import by the modules under test, so set before any of them load.
+os.environ.update({
+    "AUTH_VERIFIER": "fake",
+    "AUTH_ALLOW_FAKE": "1",
+    "LLM_BACKEND": "stub",
+    "SEARCH_BACKEND": "fake",
+    "LLM_CACHE": "off",
+    "JOB_WORKERS": "external",
+    "STARTUP_MODE": "lazy",
+    # The stub LLM answers at once; don't pace it like Gemini's free tier.
+    "LLM_RATE_PER_MINUTE": "6000",
+    "LLM_BURST": "100",
+})
+
+import pytest
+
+from database import db as database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A migrated, empty database in tmp_path; the pool is rebuilt around it."""
+    monkeypatch.chdir(tmp_path)
+    database._pool = None
+    database.init_db()
+    yield database
+    database.get_pool().close()
+    database._pool = None
+
+
+@pytest.fixture
+def client(db):
+    """The API with its lifespan run; workers stay off unless a test starts them."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def auth(user_id: str) -> dict:
+    # The fake verifier accepts the uid itself as the token.
+    return {"Authorization": f"Bearer {user_id}"}
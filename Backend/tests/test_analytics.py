@@ -0,0 +1,47 @@
+from database.analytics import get_user_analytics
+from database.db import create_blog_post, write_db
+
+
+def set_status(post_id: int, status: str):
+    with write_db() as db:
+        db.execute("UPDATE blog_posts SET status = ? WHERE id = ?", (status, post_id))
+
+
+def test_republishing_counts_one_publication(db):
+    post_id = create_blog_post("Topic", "kw", "alice")
+    set_status(post_id, "WRITING")
+    set_status(post_id, "Published")
+    # Regenerated, then published again.
+    set_status(post_id, "WRITING")
+    set_status(post_id, "Published")
+
+    stats = get_user_analytics("alice")
+    assert [day["published"] for day in stats["daily"]] == [1]
+    assert stats["published"] == 1
+    assert stats["avg_generation_seconds"] is not None
+
+
+def test_posts_created_published_count_once(db):
+    with write_db() as conn:
+        conn.execute(
+            "INSERT INTO blog_posts (topic, keywords, user_id, status) VALUES ('T', 'kw', 'bob', 'Published')"
+        )
+        post_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    set_status(post_id, "WRITING")
+    set_status(post_id, "Published")
+
+    assert [day["published"] for day in get_user_analytics("bob")["daily"]] == [1]
+
+
+def test_drifted_counters_are_rebuilt_by_the_workers_not_on_startup(db):
+    from services import worker
+
+    create_blog_post("Topic", "kw", "carol")
+    with write_db() as conn:
+        conn.execute("UPDATE user_post_counts SET count = 5 WHERE user_id = 'carol'")
+
+    pool = worker.WorkerPool()
+    pool.recover()
+    assert get_user_analytics("carol")["total"] == 5
+    assert pool.reconcile_stats() == 1
+    assert get_user_analytics("carol")["total"] == 1
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import pytest
+
+from services import auth as auth_service
+
+
+def test_tokens_are_verified_once_then_served_from_the_cache(monkeypatch):
+    verifier = auth_service.FakeVerifier()
+    monkeypatch.setattr(auth_service, "verifier", verifier)
+    monkeypatch.setattr(auth_service, "token_cache", auth_service.TokenCache())
+
+    async def verify_many():
+        return [await auth_service.verify_token("alice") for _ in range(50)]
+
+    assert asyncio.run(verify_many()) == ["alice"] * 50
+    assert verifier.calls == 1
+    assert auth_service.token_cache.stats()["hits"] == 49
+
+
+def test_expired_tokens_are_verified_again():
+    now = [1000.0]
+    cache = auth_service.TokenCache(clock=lambda: now[0])
+    cache.put("tok", "alice", expires_at=1000.0 + 3600)
+    assert cache.get("tok") == "alice"
+    now[0] += 3600 - auth_service.EXPIRY_SKEW_SECONDS
+    assert cache.get("tok") is None
+
+
+def test_fake_verifier_needs_the_test_flag(monkeypatch):
+    monkeypatch.setattr(auth_service, "AUTH_VERIFIER", "fake")
+    monkeypatch.setattr(auth_service, "AUTH_ALLOW_FAKE", False)
+    with pytest.raises(RuntimeError, match="AUTH_ALLOW_FAKE"):
+        auth_service.make_verifier()
+
+    monkeypatch.setattr(auth_service, "AUTH_ALLOW_FAKE", True)
+    assert isinstance(auth_service.make_verifier(), auth_service.FakeVerifier)
+
+
+def test_fake_verifier_is_refused_with_firebase_credentials(monkeypatch):
+    monkeypatch.setattr(auth_service, "AUTH_VERIFIER", "fake")
+    monkeypatch.setattr(auth_service, "AUTH_ALLOW_FAKE", True)
+    monkeypatch.setenv("FIREBASE_CREDENTIALS", "{}")
+    with pytest.raises(RuntimeError, match="FIREBASE_CREDENTIALS"):
+        auth_service.make_verifier()
+
+
+
+def test_bad_firebase_tokens_are_401s(client, monkeypatch):
+    from firebase_admin import auth as firebase_auth
+
+    class StubFirebaseAuth:
+        ExpiredIdTokenError = firebase_auth.ExpiredIdTokenError
+        InvalidIdTokenError = firebase_auth.InvalidIdTokenError
+
+        @staticmethod
+        def verify_id_token(token):
+            if token == "expired":
+                raise firebase_auth.ExpiredIdTokenError("Token expired, 1700000000 < 1800000000", None)
+            if token == "forged":
+                raise firebase_auth.InvalidIdTokenError("Could not verify token signature.")
+            return {"uid": "alice", "exp": time.time() + 3600}
+
+    verifier = auth_service.FirebaseVerifier()
+    verifier._auth = StubFirebaseAuth
+    monkeypatch.setattr(auth_service, "verifier", verifier)
+    monkeypatch.setattr(auth_service, "token_cache", auth_service.TokenCache())
+
+    def get(token):
+        return client.get("/api/blog-posts", headers={"Authorization": f"Bearer {token}"})
+
+    assert get("expired").status_code == 401
+    assert get("expired").json()["detail"] == "Token expired"
+    assert get("forged").status_code == 401
+    assert get("forged").json()["detail"] == "Invalid token"
+    assert get("good").status_code == 200
@@ -0,0 +1,95 @@
+import pytest
+
+from conftest import auth
+from database.db import create_blog_posts, get_posts_status, read_db, write_db
+from database.jobs import get_job
+from services import researcher, worker
+
+
+def create_batch(client, body, content_type: str = "application/json"):
+    response = client.post("/api/blog-posts/batch", content=body,
+                           headers={**auth("alice"), "Content-Type": content_type})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_json_and_csv_bodies_give_the_same_items(client):
+    bodies = (
+        ('[{"topic": "Tea", "keywords": "green"}, {"topic": "Coffee"}]', "application/json"),
+        ('{"posts": [{"topic": "Tea", "keywords": "green"}, {"topic": "Coffee"}]}', "application/json"),
+        # Excel writes a BOM; header case and stray spaces don't matter.
+        ("\ufeffTopic, Keywords\nTea , green\nCoffee,\n", "text/csv; charset=utf-8"),
+    )
+    for body, content_type in bodies:
+        items = create_batch(client, body.encode(), content_type)["items"]
+        assert [(item["topic"], item["status"]) for item in items] == [("Tea", "RESEARCHING"), ("Coffee", "RESEARCHING")]
+
+    with read_db() as db:
+        rows = db.execute("SELECT topic, keywords FROM blog_posts ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [("Tea", "green"), ("Coffee", "")] * 3
+
+
+def test_unreadable_bodies_are_rejected(client):
+    for body in (b"not json", b'{"posts": "Tea"}', b"[]"):
+        response = client.post("/api/blog-posts/batch", content=body,
+                               headers={**auth("alice"), "Content-Type": "application/json"})
+        assert response.status_code == 400
+
+
+def test_batch_rows_go_in_one_transaction(db):
+    with write_db() as conn:
+        conn.execute(
+            "CREATE TEMP TRIGGER reject_boom BEFORE INSERT ON blog_posts WHEN new.topic = 'boom' "
+            "BEGIN SELECT RAISE(ABORT, 'boom'); END"
+        )
+    try:
+        with pytest.raises(Exception, match="boom"):
+            create_blog_posts([("First", ""), ("Second", ""), ("boom", "")], "alice")
+    finally:
+        with write_db() as conn:
+            conn.execute("DROP TRIGGER temp.reject_boom")
+
+    with read_db() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM blog_posts").fetchone()[0] == 0
+
+
+def test_invalid_rows_are_reported_and_the_rest_share_one_job(client):
+    result = create_batch(client, b'[{"topic": "Tea"}, {"keywords": "no topic"}, "junk", {"topic": "  "}, {"topic": "Coffee"}]')
+    items = result["items"]
+    assert [item["status"] for item in items] == ["RESEARCHING", "INVALID", "INVALID", "INVALID", "RESEARCHING"]
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4]
+    assert all(item["error"] == "topic is required" for item in items if item["status"] == "INVALID")
+
+    post_ids = [item["postId"] for item in items if "postId" in item]
+    job = get_job(result["batchId"])
+    assert job["post_id"] is None and job["payload"]["post_ids"] == post_ids
+
+    status = client.get(f"/api/blog-posts/batch/{result['batchId']}", headers=auth("alice")).json()
+    assert status["counts"] == {"RESEARCHING": 2}
+    assert client.get(f"/api/blog-posts/batch/{result['batchId']}", headers=auth("bob")).status_code == 404
+
+    # Nothing valid: no posts and no job.
+    assert create_batch(client, b'[{"topic": ""}]') == {
+        "batchId": None, "items": [{"index": 0, "status": "INVALID", "error": "topic is required"}]
+    }
+
+
+def test_a_post_failing_in_the_batch_is_retried_on_its_own(client, monkeypatch):
+    search_web = researcher.search_web
+
+    def flaky_search(query, **kwargs):
+        if query.startswith("Broken"):
+            raise RuntimeError("search is down")
+        return search_web(query, **kwargs)
+
+    monkeypatch.setattr(researcher, "search_web", flaky_search)
+    result = create_batch(client, b'[{"topic": "Tea"}, {"topic": "Broken"}, {"topic": "Coffee"}]')
+    tea, broken, coffee = (item["postId"] for item in result["items"])
+
+    worker.run_research(get_job(result["batchId"]))
+
+    statuses = {post_id: row["status"] for post_id, row in get_posts_status([tea, broken, coffee], "alice").items()}
+    assert statuses == {tea: "OUTLINE_READY", broken: "RESEARCHING", coffee: "OUTLINE_READY"}
+    with read_db() as db:
+        retries = db.execute("SELECT post_id FROM jobs WHERE kind = 'research' AND post_id IS NOT NULL").fetchall()
+    assert [row["post_id"] for row in retries] == [broken]
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+from services import chunking, humanizer
+from services.chunking import ChunkFailed, map_chunks, split_markdown
+
+POST = "\n\n".join([
+    "Intro paragraph.",
+    "## Short section\n\nFits in one chunk.",
+    "## Long section\n\n" + "\n\n".join(f"Paragraph {n}" + " word" * 12 for n in range(6)),
+    "## Huge paragraph\n\n" + "x" * 250,
+])
+
+
+def test_small_sections_share_a_chunk_and_only_long_ones_are_cut():
+    chunks = split_markdown(POST, max_chars=200)
+
+    assert chunks[0] == "Intro paragraph.\n\n## Short section\n\nFits in one chunk."
+    assert chunks[1].startswith("## Long section\n\nParagraph 0")
+    assert all(len(chunk) <= 200 for chunk in chunks[:-1])
+    # A paragraph longer than max_chars is never cut.
+    assert chunks[-1] == "x" * 250
+
+    # Every paragraph lands in exactly one chunk, in order.
+    assert "\n\n".join(chunks) == POST
+    paragraphs = [p for chunk in chunks for p in chunk.split("\n\n")]
+    assert paragraphs == POST.split("\n\n")
+
+    # With room to spare, the whole post is one chunk.
+    assert split_markdown(POST, max_chars=10_000) == [POST]
+    assert split_markdown("  \n ") == []
+
+
+def test_a_post_with_many_headings_makes_few_chunks():
+    body = " ".join(["A sentence of body text."] * 8)
+    post = "\n\n".join(f"## Heading {n}\n\n{body}" for n in range(12))
+    chunks = split_markdown(post, max_chars=1000)
+
+    assert len(chunks) == 3
+    # Sections that fit are never cut.
+    assert all(chunk.startswith("## Heading") for chunk in chunks)
+    assert "\n\n".join(chunks) == post
+
+
+def test_map_chunks_bounds_concurrency_and_keeps_order():
+    active = peak = 0
+
+    async def work(chunk):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        # Later chunks finish first.
+        await asyncio.sleep(0.001 * (10 - chunk))
+        active -= 1
+        return chunk * 10
+
+    progress = []
+
+    async def on_progress(done, total):
+        progress.append((done, total))
+
+    results = asyncio.run(map_chunks(list(range(10)), work, concurrency=3, on_progress=on_progress))
+    assert results == [n * 10 for n in range(10)]
+    assert peak == 3
+    assert progress == [(n, 10) for n in range(1, 11)]
+
+
+def test_each_chunk_is_retried_on_its_own(monkeypatch):
+    monkeypatch.setattr(chunking, "retry_delay", lambda attempt: 0)
+    calls = {}
+
+    async def work(chunk):
+        calls[chunk] = calls.get(chunk, 0) + 1
+        if chunk == "flaky" and calls[chunk] < 3:
+            raise RuntimeError("try again")
+        if chunk == "broken":
+            raise RuntimeError("always")
+        return chunk.upper()
+
+    results = asyncio.run(map_chunks(["fine", "flaky", "broken"], work, retries=2))
+    assert results[:2] == ["FINE", "FLAKY"]
+    assert isinstance(results[2], ChunkFailed) and results[2].index == 2
+    assert calls == {"fine": 1, "flaky": 3, "broken": 3}
+
+
+def test_rate_limited_chunks_are_left_to_the_throttles_retries(monkeypatch):
+    monkeypatch.setattr(chunking, "retry_delay", lambda attempt: 0)
+    calls = 0
+
+    async def work(chunk):
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+    [result] = asyncio.run(map_chunks(["busy"], work, retries=2))
+    assert isinstance(result, ChunkFailed)
+    assert calls == 1
+
+
+class StubRewriter:
+    """Upper-cases the section it is given, slower for earlier sections; fails on 'Broken'."""
+
+    def __init__(self, sections):
+        self.sections = sections
+
+    async def ainvoke(self, prompt: str):
+        section = re.search(r"ORIGINAL CONTENT:\n\s*(.*?)\n\s*OUTPUT JSON ONLY", prompt, re.S).group(1)
+        if "Broken" in section:
+            raise RuntimeError("model error")
+        await asyncio.sleep(0.002 * (len(self.sections) - self.sections.index(section)))
+        return SimpleNamespace(content=json.dumps({"rewritten_content": section.upper()}))
+
+
+def test_humanize_merges_rewritten_sections_in_order(monkeypatch):
+    monkeypatch.setattr(chunking, "retry_delay", lambda attempt: 0)
+    content = "\n\n".join(f"## Part {n}\n\nBody {n}." for n in range(5)) + "\n\n## Broken\n\nLeft as is."
+    # Small enough that every section is a chunk of its own.
+    monkeypatch.setattr(humanizer, "split_markdown", lambda text: split_markdown(text, max_chars=25))
+    sections = humanizer.split_markdown(content)
+    monkeypatch.setattr(humanizer, "get_rewriter", lambda: StubRewriter(sections))
+
+    result = asyncio.run(humanizer.humanize_full_content(content))
+
+    assert result["chunks"] == 6
+    assert result["failed_chunks"] == [5]
+    assert result["rewritten_content"] == "\n\n".join(
+        [f"## PART {n}\n\nBODY {n}." for n in range(5)] + ["## Broken\n\nLeft as is."]
+    )
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+
+import main
+from conftest import auth
+from database.db import create_blog_post, update_db_outline, write_db
+from services.events import hub
+
+
+class EventStream:
+    """
+    Runs GET /api/events on the ASGI app directly: TestClient only returns
+    once a response has ended, and an event stream doesn't.
+    """
+
+    def __init__(self, query: str):
+        self.scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/events", "raw_path": b"/api/events", "root_path": "",
+            "query_string": query.encode(), "headers": [(b"host", b"testserver")],
+            "client": ("testclient", 50000), "server": ("testserver", 80),
+        }
+        self.messages = asyncio.Queue()
+        self.disconnected = asyncio.Event()
+        self.requested = False
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        await self.messages.put(message)
+
+    async def next_message(self) -> dict:
+        return await asyncio.wait_for(self.messages.get(), 5)
+
+    async def next_chunk(self) -> str:
+        message = await self.next_message()
+        assert message["type"] == "http.response.body"
+        return message["body"].decode()
+
+
+def get_ticket(client, user_id: str) -> str:
+    response = client.post("/api/events/ticket", headers=auth(user_id))
+    assert response.status_code == 200
+    assert response.json()["expiresIn"] == main.STREAM_TICKET_SECONDS
+    return response.json()["ticket"]
+
+
+def test_streams_open_with_a_ticket_not_a_token(client):
+    assert client.post("/api/events/ticket").status_code == 401
+    # The ID token is not accepted in the URL any more.
+    assert client.get("/api/events", params={"token": "alice"}).status_code == 401
+    assert client.get("/api/events", params={"ticket": "made-up"}).status_code == 401
+
+    expired = get_ticket(client, "alice")
+    with write_db() as db:
+        db.execute("UPDATE stream_tickets SET expires_at = ?", (time.time() - 1,))
+    assert client.get("/api/events", params={"ticket": expired}).status_code == 401
+
+    ticket = get_ticket(client, "alice")
+
+    async def open_and_close():
+        stream = EventStream(f"ticket={ticket}")
+        app = asyncio.create_task(main.app(stream.scope, stream.receive, stream.send))
+        start = await stream.next_message()
+        stream.disconnected.set()
+        await asyncio.wait_for(app, 5)
+        return start
+
+    assert asyncio.run(open_and_close())["status"] == 200
+    # Single use: the same ticket can't open a second stream.
+    assert client.get("/api/events", params={"ticket": ticket}).status_code == 401
+
+
+def test_status_changes_are_delivered_and_disconnects_close_the_stream(client):
+    post_id = create_blog_post("Topic", "kw", "alice")
+    create_blog_post("Bob's topic", "kw", "bob")
+    ticket = get_ticket(client, "alice")
+
+    async def scenario():
+        stream = EventStream(f"ticket={ticket}")
+        app = asyncio.create_task(main.app(stream.scope, stream.receive, stream.send))
+        start = await stream.next_message()
+        assert start["status"] == 200
+        assert (b"content-type", b"text/event-stream; charset=utf-8") in start["headers"]
+        assert await stream.next_chunk() == "retry: 3000\n\n"
+        assert hub.subscriber_count() == 1
+
+        # A worker thread finishing research wakes the stream right away.
+        await asyncio.to_thread(update_db_outline, post_id, '{"sections": []}')
+        chunk = await stream.next_chunk()
+        event_id, event, data = chunk.strip().split("\n")
+        assert event_id.startswith("id: ") and event == "event: status"
+        assert json.loads(data.removeprefix("data: ")) == {"postId": post_id, "status": "OUTLINE_READY"}
+
+        stream.disconnected.set()
+        await asyncio.wait_for(app, 5)
+        return hub.subscriber_count()
+
+    assert asyncio.run(scenario()) == 0
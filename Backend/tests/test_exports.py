@@ -0,0 +1,120 @@
+import io
+import os
+import zipfile
+
+import main  # registers the database hooks
+from conftest import auth
+from database.db import create_blog_post, set_post_body, update_db_content, write_db
+from services import exporter
+from services.exporter import ExportCache, export_etag, render_export
+from services.minhash import stored_signature
+
+
+def test_invalidating_a_post_removes_only_its_directory(tmp_path):
+    cache = ExportCache(directory=str(tmp_path))
+    for post_id in (1, 2):
+        cache.put(post_id, export_etag("T", f"body {post_id}", "txt"), "txt", b"x")
+    assert sorted(os.listdir(tmp_path)) == ["1", "2"]
+
+    cache.invalidate(1)
+    assert os.listdir(tmp_path) == ["2"]
+    assert cache.get(1, export_etag("T", "body 1", "txt"), "txt") is None
+    # A fresh cache still finds post 2 on disk.
+    fresh = ExportCache(directory=str(tmp_path))
+    assert fresh.get(2, export_etag("T", "body 2", "txt"), "txt") == b"x"
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_published_content_drops_cached_exports_through_the_hook(db, tmp_path, monkeypatch):
+    cache = ExportCache(directory=str(tmp_path / "exports"))
+    monkeypatch.setattr(exporter, "export_cache", cache)
+    post_id = create_blog_post("Topic", "kw", "alice")
+    etag = export_etag("Topic", "old", "markdown")
+    cache.put(post_id, etag, "markdown", b"old")
+
+    update_db_content(post_id, "new", stored_signature("new"))
+    assert cache.get(post_id, etag, "markdown") is None
+    assert not os.path.exists(tmp_path / "exports" / str(post_id))
+
+
+def test_api_edits_and_deletes_drop_cached_exports_through_the_hook(client, monkeypatch):
+    dropped = []
+    monkeypatch.setattr(exporter.ExportCache, "invalidate", lambda self, post_id: dropped.append(post_id))
+    post_id = create_blog_post("Topic", "kw", "alice")
+
+    client.put(f"/api/blog-posts/{post_id}", json={"topic": "Edited", "content": "new"}, headers=auth("alice"))
+    client.delete(f"/api/blog-posts/{post_id}", headers=auth("alice"))
+    assert dropped == [post_id, post_id]
+
+
+def add_post(user_id: str, topic: str, content: str, status: str, created_at: str) -> int:
+    post_id = create_blog_post(topic, "kw", user_id)
+    with write_db() as db:
+        set_post_body(db, post_id, "content", content)
+        db.execute("UPDATE blog_posts SET status = ?, created_at = ? WHERE id = ?", (status, created_at, post_id))
+    return post_id
+
+
+def export_zip(client, user_id: str, **body) -> dict:
+    response = client.post("/api/blog-posts/export", json=body, headers=auth(user_id))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def test_bulk_export_streams_a_zip_of_the_selected_posts(client):
+    posts = {
+        add_post("alice", "Spring garden", "Sow peas early.", "Published", "2026-03-02 09:00:00"): ("Spring garden", "Sow peas early."),
+        add_post("alice", "Summer garden", "Water at dawn.", "Published", "2026-06-10 09:00:00"): ("Summer garden", "Water at dawn."),
+        add_post("alice", "Autumn garden", "Plant garlic.", "Scheduled", "2026-09-20 09:00:00"): ("Autumn garden", "Plant garlic."),
+    }
+    add_post("bob", "Bob's garden", "Not alice's.", "Published", "2026-06-10 09:00:00")
+    spring, summer, autumn = posts
+
+    everything = export_zip(client, "alice", all=True, format="markdown")
+    assert len(everything) == 3
+    for post_id, (title, content) in posts.items():
+        name = next(name for name in everything if name.startswith(f"{post_id:06d}-"))
+        assert name.endswith(".md")
+        assert everything[name] == render_export(title, content, "markdown")
+
+    def exported_ids(**body):
+        return sorted(int(name.split("-")[0]) for name in export_zip(client, "alice", **body))
+
+    assert exported_ids(post_ids=[summer, autumn]) == [summer, autumn]
+    assert exported_ids(status="Published") == [spring, summer]
+    assert exported_ids(created_after="2026-06-01", created_before="2026-09-01") == [summer]
+    assert exported_ids(status="Published", created_after="2026-06-01") == [summer]
+    # Another user's ids are never exported, even when asked for by id.
+    bob_post = max(posts) + 1
+    assert exported_ids(post_ids=[bob_post]) == []
+
+    txt = export_zip(client, "alice", post_ids=[spring], format="txt")
+    assert list(txt.values()) == [render_export("Spring garden", "Sow peas early.", "txt")]
+
+
+def test_bulk_export_needs_a_selection(client):
+    response = client.post("/api/blog-posts/export", json={"format": "markdown"}, headers=auth("alice"))
+    assert response.status_code == 400
+
+
+def test_bulk_export_date_bounds_are_compared_in_utc(client):
+    early = add_post("alice", "Early", "Before nine.", "Published", "2026-06-10 08:59:59")
+    nine = add_post("alice", "Nine", "At nine.", "Published", "2026-06-10 09:00:00")
+    late = add_post("alice", "Late", "After nine.", "Published", "2026-06-10 09:30:00")
+
+    def exported_ids(**body):
+        return sorted(int(name.split("-")[0]) for name in export_zip(client, "alice", **body))
+
+    # A 'T' or an offset used to compare as text against "YYYY-MM-DD HH:MM:SS".
+    assert exported_ids(created_after="2026-06-10T09:00:00") == [nine, late]
+    assert exported_ids(created_after="2026-06-10T09:00:00Z") == [nine, late]
+    assert exported_ids(created_after="2026-06-10T11:00:00+02:00") == [nine, late]
+    assert exported_ids(created_before="2026-06-10T09:00:00Z") == [early]
+    assert exported_ids(created_after="2026-06-10", created_before="2026-06-10T09:15") == [early, nine]
+
+    for bad in ({"created_after": "last week"}, {"created_before": "2026-13-01"}):
+        response = client.post("/api/blog-posts/export", json=bad, headers=auth("alice"))
+        assert response.status_code == 400
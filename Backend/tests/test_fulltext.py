@@ -0,0 +1,44 @@
+from services.fulltext import fold, make_snippet, to_match_query
+
+OWNER = "alice".encode().hex()
+
+
+def test_every_word_must_match_as_a_prefix_in_the_owners_text():
+    assert to_match_query("Sourdough starter", "alice") == (
+        f'owner : "{OWNER}" AND {{topic keywords content}} : ("Sourdough"* "starter"*)'
+    )
+
+
+def test_punctuation_and_underscores_split_words_and_never_reach_fts5():
+    assert to_match_query('snake_case "OR" -x*', "alice").endswith(': ("snake"* "case"* "OR"* "x"*)')
+    assert to_match_query(" !? _ ", "alice") == ""
+    assert to_match_query("", "alice") == ""
+
+
+def test_fold_keeps_one_character_for_each_character():
+    assert fold("Crème BRÛLÉE") == "creme brulee"
+    assert fold("plain ascii") == "plain ascii"
+    # A ligature folds to two letters, so it stays as it is and offsets still line up.
+    assert len(fold("ﬁne café")) == len("ﬁne café")
+
+
+def test_snippets_mark_words_starting_with_a_term():
+    snippet = make_snippet(["Bread and breadcrumbs, not gingerbread."], ["bread"])
+    assert snippet == "<mark>Bread</mark> and <mark>breadcrumbs</mark>, not gingerbread"
+
+
+def test_snippets_show_the_stretch_with_the_most_hits():
+    text = "rye " + "filler " * 30 + "spelt and rye and spelt " + "filler " * 30
+    snippet = make_snippet([text], ["spelt", "rye"], size=6)
+    assert snippet == "…<mark>spelt</mark> and <mark>rye</mark> and <mark>spelt</mark> filler…"
+
+
+def test_snippets_near_the_end_take_words_from_before_the_hit():
+    snippet = make_snippet(["one two three four five six seven"], ["seven"], size=4)
+    assert snippet == "…four five six <mark>seven</mark>"
+
+
+def test_snippets_come_from_the_best_text_and_match_without_accents():
+    snippet = make_snippet(["A topic", None, "Crème brûlée, crème fraîche"], ["creme"])
+    assert snippet == "<mark>Crème</mark> brûlée, <mark>crème</mark> fraîche"
+    assert make_snippet(["nothing here"], ["absent"]) == ""
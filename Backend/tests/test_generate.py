@@ -0,0 +1,78 @@
+import threading
+
+import main
+from conftest import auth
+from database import jobs
+from database.db import create_blog_post, write_db
+from services import worker, writer
+
+
+def set_status(post_id: int, status: str):
+    with write_db() as db:
+        db.execute("UPDATE blog_posts SET status = ? WHERE id = ?", (status, post_id))
+
+
+def test_stream_runs_on_the_bounded_executor(client, monkeypatch):
+    threads = []
+
+    def fake_stream(post_id):
+        threads.append(threading.current_thread().name)
+        yield "Hello "
+        yield "world"
+
+    monkeypatch.setattr(writer, "stream_blog_content", fake_stream)
+    post_id = create_blog_post("Topic", "kw", "alice")
+    set_status(post_id, "OUTLINE_READY")
+
+    response = client.post(f"/api/blog-posts/{post_id}/generate/stream", headers=auth("alice"))
+    assert response.status_code == 200
+    assert '{"delta": "Hello "}' in response.text
+    assert "event: done" in response.text
+    assert threads[0].startswith("stream")
+    assert main.get_stream_executor()._max_workers == main.STREAM_WORKERS
+
+
+def test_generating_a_post_that_is_already_writing_is_a_409(client, monkeypatch):
+    monkeypatch.setattr(writer, "stream_blog_content", lambda post_id: iter(()))
+    post_id = create_blog_post("Topic", "kw", "alice")
+    set_status(post_id, "WRITING")
+
+    assert client.post(f"/api/blog-posts/{post_id}/generate/stream", headers=auth("alice")).status_code == 409
+    assert client.post(f"/api/blog-posts/{post_id}/generate", headers=auth("alice")).status_code == 409
+    assert client.post(f"/api/blog-posts/{post_id}/generate", headers=auth("bob")).status_code == 404
+    regenerate = f"/api/blog-posts/{post_id}/sections/0/regenerate"
+    assert client.post(regenerate, headers=auth("alice")).status_code == 409
+    assert client.post(regenerate, headers=auth("bob")).status_code == 404
+
+
+def test_recovery_leaves_a_streaming_post_alone(client, monkeypatch):
+    streaming, finish = threading.Event(), threading.Event()
+
+    def slow_stream(post_id):
+        yield "Hello "
+        streaming.set()
+        finish.wait(5)
+        yield "world"
+
+    monkeypatch.setattr(writer, "stream_blog_content", slow_stream)
+    post_id = create_blog_post("Topic", "kw", "alice")
+    set_status(post_id, "OUTLINE_READY")
+
+    thread = threading.Thread(
+        target=client.post, args=(f"/api/blog-posts/{post_id}/generate/stream",), kwargs={"headers": auth("alice")}
+    )
+    thread.start()
+    try:
+        assert streaming.wait(5)
+        assert jobs.enqueue_orphaned_posts() == 0
+        assert jobs.job_stats()["write"] == {"running": 1}
+    finally:
+        finish.set()
+        thread.join(5)
+    assert jobs.job_stats()["write"] == {"done": 1}
+
+    # Had the process died mid-stream, its lease is handed to a worker instead.
+    with write_db() as db:
+        db.execute("UPDATE jobs SET status = 'running', worker_id = ?", (f"{worker.HOSTNAME}:999999",))
+    assert jobs.release_dead_workers(worker.is_worker_alive) == 1
+    assert jobs.claim_job("write", "w:1")["post_id"] == post_id
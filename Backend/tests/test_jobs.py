@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+from database import jobs
+from database.db import read_db, write_db
+from database.migrations import query_plan
+from services import worker
+
+
+def set_job(job_id: int, **columns):
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    with write_db() as db:
+        db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+
+
+def test_claim_takes_due_jobs_and_expired_leases_in_order(db):
+    now = time.time()
+    later = jobs.enqueue_job("write", 1)
+    stalled = jobs.enqueue_job("write", 2)
+    not_due = jobs.enqueue_job("write", 3)
+    jobs.enqueue_job("research", 4)
+    set_job(later, run_after=now - 10)
+    set_job(stalled, status="running", run_after=now - 20, locked_until=now - 1, worker_id="gone:1")
+    set_job(not_due, run_after=now + 60)
+
+    assert jobs.claim_job("write", "w:1")["id"] == stalled
+    assert jobs.claim_job("write", "w:1")["id"] == later
+    assert jobs.claim_job("write", "w:1") is None
+
+
+def test_claim_queries_use_their_partial_indexes(db):
+    with write_db() as conn:
+        conn.executemany(
+            "INSERT INTO jobs (kind, status, run_after, finished_at) VALUES (?, 'done', 0, 0)",
+            [("write",)] * 500
+        )
+        conn.execute("ANALYZE")
+    with read_db() as conn:
+        queued = query_plan(conn, jobs.CLAIM_QUEUED_QUERY, ("write", 0))
+        leased = query_plan(conn, jobs.CLAIM_LEASED_QUERY, ("write", 0))
+    assert "idx_jobs_queued" in " ".join(queued) and not any("TEMP B-TREE" in step for step in queued)
+    assert "idx_jobs_leased" in " ".join(leased) and not any("TEMP B-TREE" in step for step in leased)
+
+
+def test_heartbeat_keeps_a_long_job_from_being_reclaimed(db, monkeypatch):
+    monkeypatch.setitem(jobs.VISIBILITY_TIMEOUT, "write", 0.3)
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_write(job):
+        started.set()
+        finish.wait(5)
+
+    monkeypatch.setitem(worker.HANDLERS, "write", slow_write)
+    job_id = jobs.enqueue_job("write", 1)
+    pool = worker.WorkerPool(stage_limits={"write": 1}, poll_interval=0.05, heartbeat_interval=0.05)
+    pool.start()
+    try:
+        assert started.wait(5)
+        time.sleep(0.6)
+        assert jobs.claim_job("write", "other:1") is None
+        finish.set()
+    finally:
+        pool.stop(timeout=5)
+    assert jobs.get_job(job_id)["status"] == "done"
+
+
+def test_leases_are_only_extended_for_their_own_worker(db):
+    job_id = jobs.enqueue_job("write", 1)
+    jobs.claim_job("write", "w:1")
+    set_job(job_id, locked_until=0)
+    assert jobs.extend_leases({job_id: "write"}, "w:2") == 0
+    assert jobs.extend_leases({job_id: "write"}, "w:1") == 1
+    assert jobs.claim_job("write", "w:2") is None
+
+
+def test_old_done_jobs_are_pruned_and_failed_ones_kept(db):
+    done = jobs.enqueue_job("write", 1)
+    failed = jobs.enqueue_job("write", 2, max_attempts=1)
+    jobs.complete_job(jobs.claim_job("write", "w:1")["id"])
+    jobs.fail_job(jobs.claim_job("write", "w:1"), "boom")
+
+    assert jobs.prune_finished_jobs(retention=3600) == 0
+    assert jobs.prune_finished_jobs(retention=-1) == 1
+    assert jobs.get_job(done) is None
+    assert jobs.get_job(failed)["status"] == "failed"
+
+
+def test_only_this_process_under_its_own_boot_id_counts_as_this_process(db):
+    pid = os.getpid()
+    assert worker.is_worker_alive(worker.WORKER_ID)
+    # This pid under an earlier boot id: a previous run of the same container.
+    assert not worker.is_worker_alive(f"{worker.HOSTNAME}:{pid}:0123abcd")
+    assert not worker.is_worker_alive(f"{worker.HOSTNAME}:{pid}")
+    assert worker.is_worker_alive(f"{worker.HOSTNAME}:{os.getppid()}:0123abcd")
+    assert not worker.is_worker_alive(f"{worker.HOSTNAME}:999999:0123abcd")
+    # Other hosts are left to their lease expiry.
+    assert worker.is_worker_alive(f"elsewhere:{pid}:0123abcd")
+
+    job_id = jobs.enqueue_job("write", 1)
+    set_job(job_id, status="running", worker_id=worker.WORKER_ID)
+    assert jobs.release_dead_workers(worker.is_worker_alive) == 0
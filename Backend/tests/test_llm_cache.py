@@ -0,0 +1,123 @@
+import pytest
+
+from services import llm, llm_cache
+from services.llm_cache import MemoryTier, ModelCache, SQLiteTier, TieredLLMCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+
+def test_the_memory_tier_drops_the_least_recently_used_entry():
+    tier = MemoryTier(max_entries=2)
+    tier.put("a", 1)
+    tier.put("b", 2)
+    assert tier.get("a") == 1
+    tier.put("c", 3)
+
+    assert tier.get("b") is None
+    assert (tier.get("a"), tier.get("c"), len(tier)) == (1, 3, 2)
+
+
+def test_stored_entries_expire_after_the_ttl(tmp_path, clock):
+    tier = SQLiteTier(str(tmp_path / "llm_cache.db"), ttl=60)
+    tier.put("k", "reply")
+
+    clock.now += 59
+    assert tier.get("k") == "reply"
+    clock.now += 1
+    assert tier.get("k") is None
+    with tier.pool.reader() as db:
+        assert db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] == 0
+
+
+def test_the_store_evicts_least_recently_read_entries_over_its_byte_budget(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(llm_cache, "SIZE_CHECK_EVERY", 1)
+    tier = SQLiteTier(str(tmp_path / "llm_cache.db"), max_bytes=100)
+    for key in "abc":
+        clock.now += 1
+        tier.put(key, "x" * 30)
+    clock.now += 1
+    assert tier.get("a") is not None
+
+    clock.now += 1
+    tier.put("d", "x" * 30)
+
+    with tier.pool.reader() as db:
+        rows = db.execute("SELECT key, size FROM llm_cache ORDER BY key").fetchall()
+    # 120 bytes is over 100; b, read least recently, goes to get back to 90% of it.
+    # a is older but was read since.
+    assert [row["key"] for row in rows] == ["a", "c", "d"]
+    assert sum(row["size"] for row in rows) <= 90
+
+
+def test_only_near_deterministic_calls_are_cached_by_default(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_CACHE", "on")
+    monkeypatch.setattr(llm, "LLM_CACHE_SERVICES", set())
+
+    assert llm.LLM_CACHE_MAX_TEMPERATURE == 0.3
+    assert llm.cache_enabled("writer", 0.0)
+    assert llm.cache_enabled("writer", 0.3)
+    assert not llm.cache_enabled("writer", 0.7)
+    assert not llm.cache_enabled("writer", None)
+    assert not llm.cache_enabled(None, 0.0)
+
+    monkeypatch.setattr(llm, "LLM_CACHE", "off")
+    assert not llm.cache_enabled("writer", 0.0)
+
+
+def test_services_opt_in_and_out_of_caching(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_CACHE", "on")
+    services = llm.parse_cache_services(" writer, -plagiarism,,")
+    assert services == {"writer", "-plagiarism"}
+    monkeypatch.setattr(llm, "LLM_CACHE_SERVICES", services)
+
+    assert llm.cache_enabled("writer", 0.9)
+    assert llm.cache_enabled("writer", None)
+    assert not llm.cache_enabled("plagiarism", 0.0)
+    assert llm.cache_enabled("researcher", 0.0)
+    assert not llm.cache_enabled("researcher", 0.9)
+
+
+def test_replies_are_kept_apart_by_model_and_temperature():
+    cache = TieredLLMCache("writer", MemoryTier())
+    flash = ModelCache(cache, "gemini-2.5-flash", 0.0)
+    flash.update("prompt", "ignored", ["flash reply"])
+
+    assert ModelCache(cache, "gemini-2.5-flash", 0.0).peek("prompt") == ["flash reply"]
+    assert ModelCache(cache, "gemini-2.5-pro", 0.0).peek("prompt") is None
+    assert ModelCache(cache, "gemini-2.5-flash", 0.2).peek("prompt") is None
+    assert flash.peek("another prompt") is None
+    # LangChain's own llm_string plays no part in the key.
+    assert flash.lookup("prompt", "anything else") == ["flash reply"]
+
+
+def test_hits_and_misses_are_counted_per_service(tmp_path):
+    memory, store = MemoryTier(), SQLiteTier(str(tmp_path / "llm_cache.db"))
+    writer = ModelCache(TieredLLMCache("writer", memory, store), "m", 0.0)
+    researcher = ModelCache(TieredLLMCache("researcher", memory, store), "m", 0.0)
+
+    assert writer.lookup("p", "") is None
+    writer.update("p", "", ["reply"])
+    assert writer.lookup("p", "") == ["reply"]
+    assert researcher.peek("p") == ["reply"]
+    assert researcher.lookup("q", "") is None
+
+    # A new process: the memory tier is empty, the store is not.
+    fresh = ModelCache(TieredLLMCache("writer", MemoryTier(), store), "m", 0.0)
+    assert fresh.lookup("p", "") is not None
+
+    assert writer.cache.stats() == {"memory_hits": 1, "store_hits": 0, "misses": 1, "hit_rate": 0.5}
+    assert researcher.cache.stats() == {"memory_hits": 1, "store_hits": 0, "misses": 1, "hit_rate": 0.5}
+    assert fresh.cache.stats() == {"memory_hits": 0, "store_hits": 1, "misses": 0, "hit_rate": 1.0}
@@ -0,0 +1,44 @@
+import pytest
+
+from conftest import auth
+
+STATS_ROUTES = [
+    "/metrics",
+    "/api/db/stats",
+    "/api/jobs/stats",
+    "/api/llm/cache/stats",
+    "/api/research/cache/stats",
+    "/api/llm/throttle/stats",
+    "/api/similarity/stats",
+    "/api/export/cache/stats",
+    "/api/scheduler/stats",
+    "/api/auth/stats",
+]
+
+
+@pytest.mark.parametrize("route", STATS_ROUTES)
+def test_stats_are_hidden_without_a_metrics_token(client, route):
+    assert client.get(route).status_code == 404
+    # A signed-in user is not enough either.
+    assert client.get(route, headers=auth("alice")).status_code == 404
+
+
+@pytest.mark.parametrize("route", STATS_ROUTES)
+def test_stats_need_the_metrics_token(client, route, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "METRICS_TOKEN", "s3cret")
+    assert client.get(route).status_code == 401
+    assert client.get(route, headers=auth("alice")).status_code == 401
+    assert client.get(route, headers=auth("s3cret")).status_code == 200
+
+
+def test_database_timings_reach_the_metrics(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "METRICS_TOKEN", "s3cret")
+    assert client.get("/api/blog-posts", headers=auth("alice")).status_code == 200
+
+    body = client.get("/metrics", headers=auth("s3cret")).text
+    assert 'db_call_seconds_count{helper="get_user_posts"}' in body
+    assert 'db_wait_seconds_count{database="blog_posts.db",kind="reader"}' in body
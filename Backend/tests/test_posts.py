@@ -0,0 +1,94 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from conftest import auth
+from database.db import SUMMARY_FIELDS, create_blog_post, set_post_body, write_db
+
+
+def list_posts(client, user_id: str, **params):
+    return client.get("/api/blog-posts", params=params, headers=auth(user_id))
+
+
+def add_posts(user_id: str, count: int) -> list:
+    ids = []
+    for n in range(count):
+        post_id = create_blog_post(f"Post {n}", "kw", user_id)
+        with write_db() as db:
+            set_post_body(db, post_id, "outline", '{"sections": []}')
+            set_post_body(db, post_id, "content", f"Body of post {n}")
+        ids.append(post_id)
+    return ids
+
+
+def test_cursor_pages_walk_the_whole_list_once(client):
+    ids = add_posts("alice", 7)
+    add_posts("bob", 3)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = list_posts(client, "alice", **params)
+        assert response.status_code == 200
+        page = response.json()
+        seen += [post["id"] for post in page]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        # A full page points at its own last post.
+        assert len(page) == 3 and cursor == str(page[-1]["id"])
+
+    assert pages == 3
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_a_short_page_has_no_next_cursor(client):
+    add_posts("alice", 2)
+    response = list_posts(client, "alice", limit=5)
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" not in response.headers
+    assert "X-Next-Cursor" not in list_posts(client, "alice").headers
+
+
+def test_the_list_never_returns_bodies(client):
+    add_posts("alice", 1)
+    [post] = list_posts(client, "alice").json()
+    assert set(post) == set(SUMMARY_FIELDS)
+
+    [post] = list_posts(client, "alice", fields="topic,status").json()
+    assert set(post) == {"id", "topic", "status"}
+
+
+@pytest.mark.parametrize("fields", ["content", "outline", "topic,outline", "id,*"])
+def test_unknown_fields_are_a_400(client, fields):
+    add_posts("alice", 1)
+    assert list_posts(client, "alice", fields=fields).status_code == 400
+
+    # Even when the client already has the current list.
+    etag = list_posts(client, "alice").headers["ETag"]
+    response = client.get(
+        "/api/blog-posts", params={"fields": fields}, headers={**auth("alice"), "If-None-Match": etag}
+    )
+    assert response.status_code == 400
+
+
+def test_a_failed_list_query_is_an_error_not_an_empty_page(db, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    add_posts("alice", 3)
+
+    @contextmanager
+    def broken_reader():
+        raise sqlite3.OperationalError("disk I/O error")
+        yield
+
+    monkeypatch.setattr("database.db.read_db", broken_reader)
+    monkeypatch.setattr(main, "get_user_version", lambda user_id: 1)
+    with TestClient(main.app, raise_server_exceptions=False) as client:
+        response = list_posts(client, "alice", limit=2)
+    assert response.status_code == 500
+    assert "X-Next-Cursor" not in response.headers
@@ -0,0 +1,37 @@
+from database.db import read_db, write_db
+from database.migrations import check_query_plans, hot_queries, plan_problems, query_plan
+from services import llm_cache
+
+
+def problems_for(query: str, params, index: str) -> list:
+    with read_db() as db:
+        return plan_problems(db, query, query_plan(db, query, params), index)
+
+
+def test_every_hot_query_uses_its_index(db):
+    assert "search" in hot_queries() and "bulk export page" in hot_queries()
+    with read_db() as conn:
+        assert check_query_plans(conn) == []
+
+
+def test_llm_cache_queries_use_the_primary_key(tmp_path):
+    tier = llm_cache.SQLiteTier(str(tmp_path / "llm_cache.db"))
+    with tier.pool.reader() as conn:
+        assert check_query_plans(conn, llm_cache.HOT_QUERIES) == []
+
+
+def test_sorts_scans_and_partly_used_indexes_are_reported(db):
+    with write_db() as conn:
+        conn.execute("CREATE TABLE t (a, b, c)")
+        conn.execute("CREATE INDEX idx_t_ab ON t (a, b)")
+
+    assert problems_for("SELECT c FROM t WHERE a = ? AND b = ?", (1, 2), "idx_t_ab") == []
+    assert problems_for("SELECT c FROM t WHERE a = ? AND b + 0 = ?", (1, 2), "idx_t_ab") == [
+        "SEARCH t USING INDEX idx_t_ab (a=?) stops before b"
+    ]
+    assert problems_for("SELECT c FROM t WHERE a = ? ORDER BY c", (1,), "idx_t_ab") == [
+        "USE TEMP B-TREE FOR ORDER BY"
+    ]
+    assert problems_for("SELECT a FROM t WHERE c = ?", (1,), "idx_t_ab") == [
+        "doesn't search idx_t_ab", "SCAN t"
+    ]
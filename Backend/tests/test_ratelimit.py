@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from services import ratelimit
+from services.llm import StubChatModel, ainvoke_throttled, invoke_throttled
+from services.llm_cache import MemoryTier, ModelCache, TieredLLMCache
+from services.ratelimit import BACKGROUND, INTERACTIVE, Throttle
+
+
+def test_a_starved_bucket_keeps_a_single_timer(monkeypatch):
+    started = []
+
+    class CountingTimer(threading.Timer):
+        def start(self):
+            started.append(self)
+            super().start()
+
+    monkeypatch.setattr(ratelimit.threading, "Timer", CountingTimer)
+    throttle = Throttle("test", rate_per_minute=600, burst=1, max_concurrency=8)
+    throttle.acquire(BACKGROUND)
+
+    granted = []
+    threads = [threading.Thread(target=lambda: granted.append(throttle.acquire(BACKGROUND))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for _ in range(20):
+        throttle._dispatch()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(granted) == 3
+    # One timer per token the waiters had to wait for, never one per dispatch.
+    assert len(started) == 3
+
+
+def test_cancelling_after_the_grant_returns_the_slot_without_growing_the_limit():
+    throttle = Throttle("test", max_concurrency=4)
+    throttle.limit = 2.0
+
+    async def scenario():
+        task = asyncio.create_task(throttle.aacquire())
+        await asyncio.sleep(0)  # granted; resolve() is queued on the loop
+        assert throttle.in_flight == 1
+        task.cancel()
+        await asyncio.sleep(0.01)
+        return task.cancelled()
+
+    assert asyncio.run(scenario())
+    assert throttle.in_flight == 0
+    assert throttle.limit == 2.0
+    assert throttle.stats()["granted"] == 0
+
+
+def test_cancelling_after_the_grant_resolved_returns_the_slot():
+    throttle = Throttle("test", max_concurrency=4)
+
+    async def scenario():
+        task = asyncio.create_task(throttle.aacquire())
+        await asyncio.sleep(0)  # granted; resolve() is queued on the loop
+        await asyncio.sleep(0)  # resolved; the task has yet to resume
+        assert throttle.in_flight == 1
+        task.cancel()
+        await asyncio.sleep(0.01)
+        return task.cancelled()
+
+    assert asyncio.run(scenario())
+    assert throttle.in_flight == 0
+    assert throttle.stats()["granted"] == 0
+
+
+def test_cache_hits_take_no_slot_or_token():
+    service_cache = TieredLLMCache("test", MemoryTier())
+    cache = ModelCache(service_cache, "stub", 0.0)
+    chain = ChatPromptTemplate.from_template("Write about {topic}") | StubChatModel(cache=cache)
+    throttle = Throttle("test")
+
+    first = invoke_throttled(throttle, chain, {"topic": "bread"}, BACKGROUND)
+    again = invoke_throttled(throttle, chain, {"topic": "bread"}, BACKGROUND)
+    later = asyncio.run(ainvoke_throttled(throttle, chain, {"topic": "bread"}, INTERACTIVE))
+    other = invoke_throttled(throttle, chain, {"topic": "cheese"}, BACKGROUND)
+
+    assert first.content == again.content == later.content == other.content
+    assert throttle.stats()["granted"] == 2
+    assert service_cache.stats() == {"memory_hits": 2, "store_hits": 0, "misses": 2, "hit_rate": 0.5}
@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import auth
+from database.db import get_posts_status
+from services import search, worker
+
+CREATES = 8
+
+
+def test_concurrent_creates_for_one_topic_make_one_search_call(client, monkeypatch):
+    fake = search.FakeSearch(latency=0.3)
+    monkeypatch.setattr(search, "_client", fake)
+    monkeypatch.setattr(search, "search_cache", search.SearchCache())
+
+    pool = worker.WorkerPool(stage_limits={"research": CREATES}, poll_interval=0.05)
+    pool.start()
+    try:
+        def create(_):
+            response = client.post(
+                "/api/blog-posts", json={"topic": "Home Espresso", "keywords": "grind"}, headers=auth("alice")
+            )
+            assert response.status_code == 200
+            return response.json()["postId"]
+
+        with ThreadPoolExecutor(max_workers=CREATES) as creators:
+            post_ids = list(creators.map(create, range(CREATES)))
+
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            statuses = {row["status"] for row in get_posts_status(post_ids, "alice").values()}
+            if statuses == {"OUTLINE_READY"}:
+                break
+            time.sleep(0.05)
+    finally:
+        pool.stop(timeout=5)
+
+    assert statuses == {"OUTLINE_READY"}
+    assert fake.calls == 1
+    assert search.search_stats()["coalesced"] + search.search_stats()["hits"] == CREATES - 1
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from conftest import auth
+from database.db import create_blog_post, write_db
+
+HOLD_SECONDS = 1.0
+
+
+def hold_writer(acquired: threading.Event, release: threading.Event):
+    with write_db():
+        acquired.set()
+        release.wait(HOLD_SECONDS * 5)
+
+
+def test_reads_stay_fast_while_the_write_lock_is_held(db):
+    import main
+
+    for n in range(50):
+        create_blog_post(f"Post {n}", "kw", "alice")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            acquired, release = threading.Event(), threading.Event()
+            holder = threading.Thread(target=hold_writer, args=(acquired, release))
+            holder.start()
+            assert acquired.wait(5)
+
+            # This create queues behind the held writer...
+            write = asyncio.create_task(
+                client.post("/api/blog-posts", json={"topic": "New", "keywords": "kw"}, headers=auth("alice"))
+            )
+            # ...while reads keep being served from the reader connections.
+            latencies = []
+            for _ in range(20):
+                started = time.perf_counter()
+                response = await client.get("/api/blog-posts", params={"limit": 20}, headers=auth("alice"))
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+                assert len(response.json()) == 20
+
+            assert not write.done()
+            release.set()
+            holder.join()
+            created = await write
+            return latencies, created
+
+    latencies, created = asyncio.run(scenario())
+    assert created.status_code == 200
+    assert sum(latencies) < HOLD_SECONDS / 2
+    assert max(latencies) < HOLD_SECONDS / 4
@@ -0,0 +1,76 @@
+import time
+
+from database.db import read_db, write_db
+from services.scheduler import Scheduler
+
+POSTS = 100_000
+DUE_TIMES = 1_000
+START = 1_700_000_000.0
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def schedule_posts(count: int, due_times: int):
+    """count posts, spread evenly over due_times distinct minutes after START."""
+    with write_db() as db:
+        db.executemany(
+            """
+            INSERT INTO blog_posts (topic, keywords, status, user_id, scheduled_at, scheduled_epoch)
+            VALUES ('Topic', 'kw', 'Scheduled', ?, 'set', ?)
+            """,
+            [(f"u{n % 100}", START + 60 * (1 + n % due_times)) for n in range(count)]
+        )
+
+
+def published_count() -> int:
+    with read_db() as db:
+        return db.execute("SELECT COUNT(*) FROM blog_posts WHERE status = 'Published'").fetchone()[0]
+
+
+def test_scheduler_publishes_100k_posts_on_time_with_one_wakeup_per_due_time(db):
+    schedule_posts(POSTS, DUE_TIMES)
+    clock = FakeClock(START)
+    scheduler = Scheduler(clock=clock, heap_size=10_000, resync_seconds=3600)
+    scheduler.resync()
+    assert scheduler.run_pending() == 0
+
+    started = time.perf_counter()
+    largest_heap = 0
+    while scheduler.next_due() is not None:
+        largest_heap = max(largest_heap, scheduler.stats()["heap_size"])
+        clock.now = scheduler.next_due() - 0.001
+        assert scheduler.run_pending() == 0  # never early
+        clock.now += 0.001
+        assert scheduler.run_pending() == POSTS // DUE_TIMES
+
+    assert published_count() == POSTS
+    assert scheduler.published == POSTS
+    assert scheduler.wakeups == DUE_TIMES
+    assert largest_heap <= 10_000
+    assert time.perf_counter() - started < 60
+
+
+def test_a_post_scheduled_ahead_of_the_heap_wakes_the_scheduler(db):
+    schedule_posts(10, 10)
+    clock = FakeClock(START)
+    scheduler = Scheduler(clock=clock, heap_size=5)
+    scheduler.resync()
+
+    with write_db() as conn:
+        post_id = conn.execute(
+            "INSERT INTO blog_posts (topic, keywords, status, user_id, scheduled_epoch) "
+            "VALUES ('Soon', 'kw', 'Scheduled', 'u0', ?) RETURNING id",
+            (START + 1,)
+        ).fetchone()[0]
+    scheduler.add(START + 1, post_id)
+    assert scheduler.next_due() == START + 1
+
+    clock.now = START + 1
+    assert scheduler.run_pending() == 1
+    assert scheduler.next_due() == START + 60
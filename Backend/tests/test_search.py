@@ -0,0 +1,203 @@
+import sqlite3
+import threading
+import time
+
+from conftest import auth
+from database.db import create_blog_post, reindex_stale_posts, set_post_body, write_db
+
+
+def add_post(user_id: str, topic: str, content: str = None) -> int:
+    post_id = create_blog_post(topic, "kw", user_id)
+    if content is not None:
+        with write_db() as db:
+            set_post_body(db, post_id, "content", content)
+    return post_id
+
+
+def search(client, user_id: str, **params):
+    response = client.get("/api/blog-posts/search", params=params, headers=auth(user_id))
+    assert response.status_code == 200
+    return response
+
+
+def test_search_only_matches_the_callers_posts(client):
+    mine = add_post("alice", "Sourdough basics", "Feed the starter twice a day.")
+    add_post("bob", "Sourdough for bob", "Starter starter starter.")
+
+    results = search(client, "alice", query="sourd").json()
+    assert [r["id"] for r in results] == [mine]
+    assert "<mark>Sourdough</mark>" in results[0]["snippet"]
+
+    assert [r["id"] for r in search(client, "alice", query="starter").json()] == [mine]
+    assert search(client, "carol", query="sourdough").json() == []
+
+
+def test_search_words_never_match_the_owner_column(client):
+    # Every word must be in the text; the owner token is hex and starts with digits.
+    add_post("alice", "Plain topic")
+    owner_prefix = "alice".encode().hex()[:3]
+    assert search(client, "alice", query=owner_prefix).json() == []
+
+
+def test_search_pages_with_next_offset(client):
+    ids = [add_post("alice", f"Garden note {n}", "tomatoes and basil") for n in range(5)]
+
+    first = search(client, "alice", query="garden", limit=2)
+    assert first.headers["X-Next-Offset"] == "2"
+    second = search(client, "alice", query="garden", limit=2, offset=2)
+    last = search(client, "alice", query="garden", limit=2, offset=4)
+    assert "X-Next-Offset" not in last.headers
+
+    found = [r["id"] for page in (first, second, last) for r in page.json()]
+    assert sorted(found) == sorted(ids)
+
+
+def test_empty_query_pages_through_every_post(client):
+    ids = [add_post("alice", f"Post {n}") for n in range(3)]
+
+    first = search(client, "alice", query="", limit=2)
+    assert [r["id"] for r in first.json()] == ids[::-1][:2]
+    assert first.headers["X-Next-Offset"] == "2"
+    rest = search(client, "alice", query="", limit=2, offset=2)
+    assert [r["id"] for r in rest.json()] == [ids[0]]
+    assert "X-Next-Offset" not in rest.headers
+
+
+def test_renamed_and_deleted_posts_leave_the_index(client):
+    post_id = add_post("alice", "Old title", "body text")
+    with write_db() as db:
+        db.execute("UPDATE blog_posts SET topic = 'Fresh title' WHERE id = ?", (post_id,))
+    assert reindex_stale_posts() == 1
+    assert search(client, "alice", query="old").json() == []
+    assert [r["id"] for r in search(client, "alice", query="fresh").json()] == [post_id]
+
+    client.delete(f"/api/blog-posts/{post_id}", headers=auth("alice"))
+    assert search(client, "alice", query="fresh").json() == []
+
+
+def test_the_index_needs_no_app_functions(client, tmp_path):
+    keep = add_post("alice", "Keep me", "long body " * 200)
+    drop = add_post("alice", "Drop me", "long body " * 200)
+
+    # A plain connection, as in the sqlite3 shell: no inflate() registered.
+    conn = sqlite3.connect(tmp_path / "blog_posts.db")
+    conn.execute("DELETE FROM blog_posts WHERE id = ?", (drop,))
+    conn.execute("UPDATE blog_posts SET topic = 'Kept title' WHERE id = ?", (keep,))
+    conn.execute("INSERT INTO blog_posts_fts (blog_posts_fts) VALUES ('integrity-check')")
+    conn.commit()
+    conn.close()
+
+    # The workers' heartbeat does this; searching only reads.
+    assert reindex_stale_posts() == 2
+    assert [r["id"] for r in search(client, "alice", query="long body").json()] == [keep]
+    assert [r["id"] for r in search(client, "alice", query="kept").json()] == [keep]
+
+
+def test_search_never_waits_for_the_writer(client):
+    post_id = add_post("alice", "Old title", "body text")
+    with write_db() as db:
+        db.execute("UPDATE blog_posts SET topic = 'Fresh title' WHERE id = ?", (post_id,))
+
+    acquired, release = threading.Event(), threading.Event()
+
+    def hold_writer():
+        with write_db():
+            acquired.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_writer)
+    holder.start()
+    assert acquired.wait(5)
+    try:
+        started = time.perf_counter()
+        # Still indexed under its old title until a worker re-indexes it.
+        assert [r["id"] for r in search(client, "alice", query="old").json()] == [post_id]
+        assert time.perf_counter() - started < 1
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_underscored_words_search_as_separate_terms(client):
+    post_id = add_post("alice", "snake_case names")
+    assert [r["id"] for r in search(client, "alice", query="snake_case").json()] == [post_id]
+
+
+def test_the_index_keeps_no_copy_of_the_text(client, tmp_path):
+    add_post("alice", "Sourdough basics", "Feed the starter twice a day.")
+
+    conn = sqlite3.connect(tmp_path / "blog_posts.db")
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    stored = conn.execute("SELECT topic, content FROM blog_posts_fts").fetchall()
+    conn.close()
+    assert "blog_posts_fts_content" not in tables
+    assert stored == [(None, None)]
+
+
+def test_edited_posts_are_found_by_their_new_text_only(client):
+    post_id = add_post("alice", "Bread", "rye flour and water")
+    response = client.put(
+        f"/api/blog-posts/{post_id}", json={"topic": "Flatbread", "content": "spelt flour and water"},
+        headers=auth("alice")
+    )
+    assert response.status_code == 200
+
+    assert search(client, "alice", query="rye").json() == []
+    assert search(client, "alice", query="bread").json() == []
+    assert [r["id"] for r in search(client, "alice", query="spelt flat").json()] == [post_id]
+
+
+def test_snippets_mark_words_without_regard_to_case_or_accents(client):
+    add_post("alice", "Desserts", "Start with eggs. " + "filler " * 40 + "Then a Crème brûlée, and more filler.")
+
+    [result] = search(client, "alice", query="creme BRU").json()
+    assert "<mark>Crème</mark> <mark>brûlée</mark>" in result["snippet"]
+    assert result["snippet"].startswith("…")
+
+
+def test_words_in_many_posts_are_still_ranked(client):
+    ids = [add_post("alice", f"Garden note {n}", "garden " * n + "and other words " * 20) for n in range(1, 6)]
+    # bm25 only weighs a word that most posts lack.
+    for n in range(10):
+        add_post("alice", f"Orchard {n}", "apples")
+
+    first = search(client, "alice", query="garden", limit=2)
+    rest = search(client, "alice", query="garden", limit=3, offset=2)
+    results = first.json() + rest.json()
+    # The post saying it most often ranks first, whatever its age.
+    assert [r["id"] for r in results] == ids[::-1]
+    assert all(r["rank"] is not None for r in results)
+    assert [r["rank"] for r in results] == sorted(r["rank"] for r in results)
+    assert first.headers["X-Next-Offset"] == "2"
+
+
+def test_search_filters_by_status_before_paging(client):
+    def set_status(post_id, status):
+        with write_db() as db:
+            db.execute("UPDATE blog_posts SET status = ? WHERE id = ?", (status, post_id))
+
+    published = [add_post("alice", f"Garden note {n}", "garden " * (n + 1)) for n in range(3)]
+    drafts = [add_post("alice", f"Garden draft {n}", "garden") for n in range(4)]
+    for post_id in published:
+        set_status(post_id, "Published")
+    set_status(drafts[0], "WRITING")
+    set_status(drafts[1], "OUTLINE_READY")
+
+    first = search(client, "alice", query="garden", status="Published", limit=2)
+    rest = search(client, "alice", query="garden", status="Published", limit=2, offset=2)
+    assert first.headers["X-Next-Offset"] == "2" and "X-Next-Offset" not in rest.headers
+    found = [r["id"] for r in first.json() + rest.json()]
+    assert sorted(found) == published
+
+    drafting = search(client, "alice", query="garden", status="WRITING, OUTLINE_READY").json()
+    assert sorted(r["id"] for r in drafting) == drafts[:2]
+
+    listed = search(client, "alice", query="", status="Published,WRITING", limit=10).json()
+    assert [r["id"] for r in listed] == [drafts[0], *published[::-1]]
+    assert search(client, "alice", query="garden", status="Scheduled").json() == []
+
+
+def test_too_many_statuses_are_a_400(client):
+    status = ",".join(f"S{n}" for n in range(11))
+    response = client.get("/api/blog-posts/search", params={"query": "x", "status": status}, headers=auth("alice"))
+    assert response.status_code == 400
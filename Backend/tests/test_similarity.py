@@ -0,0 +1,44 @@
+from conftest import auth
+from database.db import create_blog_post, set_post_body, write_db
+from services import similarity, worker, writer
+
+ARTICLE = " ".join(f"word{n}" for n in range(200))
+
+
+def test_existing_posts_are_backfilled_then_published_posts_are_indexed(db):
+    old = create_blog_post("Old", "kw", "alice")
+    with write_db() as conn:
+        set_post_body(conn, old, "content", ARTICLE)
+    index = similarity.SimilarityIndex()
+
+    # A check only reads signatures; the backfill is the workers' job.
+    assert index.check(None, "alice", ARTICLE)["matches"] == []
+    assert worker.WorkerPool().sign_posts() == 1
+
+    result = index.check(None, "alice", ARTICLE)
+    assert [m["post_id"] for m in result["matches"]] == [old]
+    assert result["matches"][0]["overlap"] == 100
+
+    new = create_blog_post("New", "kw", "bob")
+    writer.save_article(new, ARTICLE)
+    # Other users' posts only count when asked for.
+    assert [m["post_id"] for m in index.check(None, "alice", ARTICLE)["matches"]] == [old]
+    result = index.check(None, "alice", ARTICLE, scope="all")
+    assert sorted((m["own_post"], m["post_id"] or 0) for m in result["matches"]) == [(False, 0), (True, old)]
+    assert similarity.sign_unsigned_posts() == 0
+
+
+def test_the_api_checks_against_the_callers_own_posts_by_default(client, monkeypatch):
+    index = similarity.SimilarityIndex()
+    monkeypatch.setattr(similarity, "similarity_index", index)
+    theirs = create_blog_post("Theirs", "kw", "bob")
+    writer.save_article(theirs, ARTICLE)
+    mine = create_blog_post("Mine", "kw", "alice")
+    writer.save_article(mine, ARTICLE)
+
+    url = f"/api/blog-posts/{mine}/check-plagiarism"
+    result = client.post(url, headers=auth("alice")).json()
+    assert (result["scope"], result["matches"]) == ("own", [])
+
+    result = client.post(url, params={"scope": "all"}, headers=auth("alice")).json()
+    assert [(m["own_post"], m["post_id"]) for m in result["matches"]] == [(False, None)]
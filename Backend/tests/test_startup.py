@@ -0,0 +1,55 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ("firebase_admin", "fpdf", "langchain_core", "langchain_google_genai", "google.genai")
+
+# Runs in a fresh interpreter: this test process has long since imported everything.
+SNIPPET = """
+import json, sys
+import main
+from fastapi.testclient import TestClient
+with TestClient(main.app):
+    pass
+deferred = {deferred!r}
+print(json.dumps(sorted(d for d in deferred if any(m == d or m.startswith(d + ".") for m in sys.modules))))
+"""
+
+
+def test_lazy_startup_leaves_heavy_imports_for_first_use(tmp_path):
+    env = {**os.environ, "STARTUP_MODE": "lazy", "PYTHONPATH": BACKEND_DIR}
+    # The real backends, so a module-level Gemini client or Firebase import shows up.
+    for name in ("LLM_BACKEND", "SEARCH_BACKEND", "AUTH_VERIFIER", "AUTH_ALLOW_FAKE"):
+        env.pop(name, None)
+
+    result = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(deferred=DEFERRED)],
+        cwd=tmp_path, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    assert loaded == [], f"imported at startup: {loaded}"
+
+
+def test_workers_start_and_stop_off_the_event_loop(db, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    on_loop = []
+
+    def record():
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+
+    monkeypatch.setattr(main, "start_workers", record)
+    monkeypatch.setattr(main, "stop_workers", record)
+    with TestClient(main.app):
+        pass
+    assert on_loop == [False, False]
@@ -0,0 +1,82 @@
+import time
+
+from conftest import auth
+from database.db import TOMBSTONE_RETENTION_SECONDS, create_blog_post, init_db, write_db
+from database.versions import get_user_version
+
+
+def list_posts(client, user_id: str, **kwargs):
+    return client.get("/api/blog-posts", headers={**auth(user_id), **kwargs.pop("headers", {})}, **kwargs)
+
+
+def test_if_none_match_gets_an_empty_304(client):
+    post_id = create_blog_post("Topic", "kw", "alice")
+
+    for path, params in (("/api/blog-posts", {}), ("/api/blog-posts/search", {"query": "topic"}),
+                         (f"/api/blog-posts/{post_id}", {})):
+        first = client.get(path, params=params, headers=auth("alice"))
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        again = client.get(path, params=params, headers={**auth("alice"), "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["ETag"] == etag
+
+
+def test_writes_bump_the_etag(client):
+    post_id = create_blog_post("Topic", "kw", "alice")
+    etag = list_posts(client, "alice").headers["ETag"]
+    post_etag = client.get(f"/api/blog-posts/{post_id}", headers=auth("alice")).headers["ETag"]
+
+    response = client.put(f"/api/blog-posts/{post_id}", json={"topic": "New topic", "content": "Body"},
+                          headers=auth("alice"))
+    assert response.status_code == 200
+
+    changed = list_posts(client, "alice", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert [post["topic"] for post in changed.json()] == ["New topic"]
+    post = client.get(f"/api/blog-posts/{post_id}", headers={**auth("alice"), "If-None-Match": post_etag})
+    assert post.status_code == 200
+
+    # Another user's writes leave alice's list as it was.
+    etag = changed.headers["ETag"]
+    create_blog_post("Bob's topic", "kw", "bob")
+    assert list_posts(client, "alice", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_since_returns_exactly_the_changed_and_deleted_ids(client):
+    kept, edited, deleted = (create_blog_post(f"Topic {n}", "kw", "alice") for n in range(3))
+    create_blog_post("Bob's topic", "kw", "bob")
+    version = get_user_version("alice")
+
+    client.put(f"/api/blog-posts/{edited}", json={"topic": "Edited", "content": "Body"}, headers=auth("alice"))
+    client.delete(f"/api/blog-posts/{deleted}", headers=auth("alice"))
+    added = create_blog_post("Added", "kw", "alice")
+
+    changes = list_posts(client, "alice", params={"since": version}).json()
+    assert changes["changed"] == [edited, added]
+    assert changes["deleted"] == [deleted]
+    assert kept not in changes["changed"]
+
+    caught_up = list_posts(client, "alice", params={"since": changes["version"]}).json()
+    assert caught_up == {"version": changes["version"], "changed": [], "deleted": []}
+
+
+def test_since_is_gone_once_the_version_is_too_old_or_unknown(client):
+    post_id = create_blog_post("Topic", "kw", "alice")
+    version = get_user_version("alice")
+    client.delete(f"/api/blog-posts/{post_id}", headers=auth("alice"))
+    assert list_posts(client, "alice", params={"since": version}).status_code == 200
+
+    # Age the tombstone past retention; startup prunes it.
+    with write_db() as db:
+        db.execute("UPDATE post_tombstones SET deleted_at = ?", (time.time() - TOMBSTONE_RETENTION_SECONDS - 1,))
+    init_db()
+
+    assert list_posts(client, "alice", params={"since": version}).status_code == 410
+    latest = get_user_version("alice")
+    assert list_posts(client, "alice", params={"since": latest}).status_code == 200
+    assert list_posts(client, "alice", params={"since": latest + 1}).status_code == 410
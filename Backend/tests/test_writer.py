@@ -0,0 +1,112 @@
+import json
+import time
+
+from database.db import create_blog_post, get_post_sections, update_db_outline, write_db
+from database.versions import get_user_version
+from services import writer
+from services.ratelimit import BACKGROUND
+
+OUTLINE = json.dumps({"sections": [{"heading": f"Part {n}", "points": ["a", "b"]} for n in range(3)]})
+
+
+def record_calls(monkeypatch):
+    lanes = []
+    throttle = writer.writer_throttle()
+    call = throttle.call
+
+    def recording_call(fn, lane=BACKGROUND, **kwargs):
+        lanes.append(lane)
+        return call(fn, lane=lane, **kwargs)
+
+    monkeypatch.setattr(throttle, "call", recording_call)
+    return lanes
+
+
+def outlined_post() -> int:
+    post_id = create_blog_post("Topic", "kw", "alice")
+    update_db_outline(post_id, OUTLINE)
+    return post_id
+
+
+def test_posts_are_written_in_one_call_by_default(db, monkeypatch):
+    lanes = record_calls(monkeypatch)
+    post_id = outlined_post()
+
+    writer.write_blog_content(post_id)
+    assert lanes == [BACKGROUND]
+    assert get_post_sections(post_id) == []
+
+
+def test_parallel_sections_stay_on_the_background_lane(db, monkeypatch):
+    monkeypatch.setattr(writer, "WRITER_MODE", "parallel")
+    lanes = record_calls(monkeypatch)
+    post_id = outlined_post()
+
+    writer.write_blog_content(post_id)
+    # Intro, three sections and the conclusion.
+    assert lanes == [BACKGROUND] * 5
+    assert {s["status"] for s in get_post_sections(post_id)} == {"done"}
+
+
+def test_parallel_sections_run_at_once_up_to_the_throttle(db, monkeypatch):
+    monkeypatch.setattr(writer, "WRITER_MODE", "parallel")
+    monkeypatch.setenv("STUB_LLM_FIRST_TOKEN_MS", "300")
+    throttle = writer.writer_throttle()
+
+    def timed_write(max_concurrency: int) -> float:
+        monkeypatch.setattr(throttle, "max_concurrency", max_concurrency)
+        monkeypatch.setattr(throttle, "limit", float(max_concurrency))
+        post_id = outlined_post()
+        started = time.monotonic()
+        writer.write_blog_content(post_id)
+        return time.monotonic() - started
+
+    # Five calls of 0.3s each: one round when the throttle admits them all...
+    assert timed_write(8) < 0.6
+    # ...and three when it admits two at a time.
+    assert timed_write(2) >= 0.9
+
+
+def test_a_late_section_rewrite_leaves_a_new_generation_alone(db, monkeypatch):
+    monkeypatch.setattr(writer, "WRITER_MODE", "parallel")
+    post_id = outlined_post()
+    writer.write_blog_content(post_id)
+    # A full rewrite started while the section was being regenerated.
+    with write_db() as conn:
+        conn.execute("UPDATE blog_posts SET status = 'WRITING' WHERE id = ?", (post_id,))
+        before = conn.execute("SELECT content FROM post_bodies WHERE post_id = ?", (post_id,)).fetchone()[0]
+
+    writer.regenerate_section(post_id, 1)
+    with write_db() as conn:
+        status = conn.execute("SELECT status FROM blog_posts WHERE id = ?", (post_id,)).fetchone()[0]
+        after = conn.execute("SELECT content FROM post_bodies WHERE post_id = ?", (post_id,)).fetchone()[0]
+    assert status == "WRITING"
+    assert after == before
+
+
+def test_stream_checkpoints_touch_neither_the_index_nor_the_version(db, monkeypatch):
+    monkeypatch.setattr(writer, "CHECKPOINT_SECONDS", 0)
+    post_id = outlined_post()
+    version = get_user_version("alice")
+
+    stream = writer.stream_blog_content(post_id)
+    next(stream)
+    next(stream)  # the first chunk's checkpoint is written before this one is yielded
+    with write_db() as conn:
+        draft, content = conn.execute(
+            "SELECT draft, content FROM post_bodies WHERE post_id = ?", (post_id,)
+        ).fetchone()
+        stale = conn.execute("SELECT COUNT(*) FROM search_stale").fetchone()[0]
+    assert draft is not None and content is None
+    assert stale == 0
+    assert get_user_version("alice") == version
+
+    word = "".join(stream).split()[-1].strip(".,!?")
+    with write_db() as conn:
+        draft = conn.execute("SELECT draft FROM post_bodies WHERE post_id = ?", (post_id,)).fetchone()[0]
+        indexed = conn.execute(
+            "SELECT rowid FROM blog_posts_fts WHERE content MATCH ?", (f'"{word}"',)
+        ).fetchall()
+    assert draft is None
+    assert get_user_version("alice") > version
+    assert [row[0] for row in indexed] == [post_id]
@@ -1,10 +1,46 @@
-export default function AnalyticsCard({ posts = [] }) {
-  const total = posts.length;
-  const drafting = posts.filter(p => ["RESEARCHING", "WRITING", "OUTLINE_READY", "Drafting", "Draft"].includes(p.status)).length;
-  const published = posts.filter(p => p.status === "Published").length;
-  const scheduled = posts.filter(p => p.status === "Scheduled").length;
+import { useState, useEffect } from "react";
+import { STATUS_POLLING, subscribeToPostEvents } from "../utils/postEvents";
 
-  const completionRate = total > 0 ? Math.round((published / total) * 100) : 0;
+export default function AnalyticsCard({ user }) {
+  // Counted by the server, so the dashboard never needs every post to show these.
+  const [analytics, setAnalytics] = useState(null);
+
+  useEffect(() => {
+    if (!user) return;
+
+    let cancelled = false;
+    const fetchAnalytics = async () => {
+      try {
+        const token = await user.getIdToken();
+        const response = await fetch("https://blog-post-backend-aqmp.onrender.com/api/analytics", {
+          headers: { "Authorization": `Bearer ${token}` }
+        });
+        if (!response.ok) throw new Error("Failed to fetch analytics");
+        const data = await response.json();
+        if (!cancelled) setAnalytics(data);
+      } catch (err) {
+        console.error("Analytics error:", err.message);
+      }
+    };
+
+    fetchAnalytics();
+    if (STATUS_POLLING) {
+      return () => { cancelled = true; };
+    }
+    // Any status change moves a counter; refetching is one cheap request.
+    const unsubscribe = subscribeToPostEvents(user, fetchAnalytics);
+    return () => {
+      cancelled = true;
+      unsubscribe();
+    };
+  }, [user]);
+
+  const total = analytics?.total ?? 0;
+  const drafting = analytics?.drafting ?? 0;
+  const published = analytics?.published ?? 0;
+  const scheduled = analytics?.scheduled ?? 0;
+
+  const completionRate = analytics?.completion_rate ?? 0;
 
   const stats = [
     { label: "Total Posts", value: total, color: "text-slate-800" },
@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom"; 
 import { getAuth } from "firebase/auth";
+import { STATUS_POLLING, subscribeToPostEvents } from "../utils/postEvents";
 
 const getRelativeTime = (timestamp) => {
   if (!timestamp) return "Just now";
@@ -34,33 +35,43 @@ export default function BlogPostCard({ post: initialPost }) {
     const auth = getAuth();
     const user = auth.currentUser;
 
-    if (isWriting && user) {
-      interval = setInterval(async () => {
-        try {
-          const token = await user.getIdToken();
-
-          const response = await fetch(`https://blog-post-backend-aqmp.onrender.com/api/blog-posts/${post.id}`, {
-            method: "GET",
-            headers: {
-              "Authorization": `Bearer ${token}`,
-              "Content-Type": "application/json"
-            }
-          });
-
-          if (response.ok) {
-            const updatedPost = await response.json();
-            setPost(updatedPost);
-
-            if (updatedPost.status !== 'WRITING' && updatedPost.status !== 'RESEARCHING') {
-              clearInterval(interval);
-            }
+    if (!isWriting || !user) return;
+
+    const refreshPost = async () => {
+      try {
+        const token = await user.getIdToken();
+
+        const response = await fetch(`https://blog-post-backend-aqmp.onrender.com/api/blog-posts/${post.id}`, {
+          method: "GET",
+          headers: {
+            "Authorization": `Bearer ${token}`,
+            "Content-Type": "application/json"
+          }
+        });
+
+        if (response.ok) {
+          const updatedPost = await response.json();
+          setPost(updatedPost);
+
+          if (updatedPost.status !== 'WRITING' && updatedPost.status !== 'RESEARCHING') {
+            clearInterval(interval);
           }
-        } catch (error) {
-          console.error("Polling error:", error);
         }
-      }, 3000); 
+      } catch (error) {
+        console.error("Polling error:", error);
+      }
+    };
+
+    if (!STATUS_POLLING) {
+      const unsubscribe = subscribeToPostEvents(user, (event) => {
+        if (event.postId === post.id) refreshPost();
+      });
+      // Catch a transition that happened before the stream connected.
+      refreshPost();
+      return unsubscribe;
     }
 
+    interval = setInterval(refreshPost, 3000);
     return () => clearInterval(interval);
   }, [isWriting, post.id]);
 
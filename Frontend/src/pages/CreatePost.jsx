@@ -3,6 +3,7 @@ import { useNavigate } from "react-router-dom";
 import { getAuth } from "firebase/auth"; 
 import { Sparkles, ArrowLeft, Hash, Layout, FileText } from "lucide-react"; 
 import OutlineView from "../components/OutlineView";
+import { STATUS_POLLING, subscribeToPostEvents } from "../utils/postEvents";
 
 export default function CreatePost() {
   const [topic, setTopic] = useState("");
@@ -20,55 +21,66 @@ export default function CreatePost() {
 
   useEffect(() => {
     let interval;
-    if (status === "researching" && postId && user) {
-      interval = setInterval(async () => {
-        try {
-          const token = await user.getIdToken();
-          
-          const response = await fetch(`https://blog-post-backend-aqmp.onrender.com/api/blog-posts/${postId}`, {
-            method: "GET",
-            headers: {
-              "Authorization": `Bearer ${token}` 
-            }
-          });
-          
-          if (response.status === 404) return; 
-          if (!response.ok) throw new Error("Server communication error");
-          
-          const data = await response.json();
-          
-          if (data.status === "OUTLINE_READY") {
-            try {
-              let rawOutline = data.outline;
-              if (typeof rawOutline === "string") {
-                rawOutline = rawOutline.replace(/```json|```/g, "").trim();
-              }
-
-              const parsedOutline = typeof rawOutline === "string" 
-                ? JSON.parse(rawOutline) 
-                : rawOutline;
-                
-              setOutline(parsedOutline);
-              setStatus("ready");
-              setLoading(false);
-              clearInterval(interval);
-            } catch (parseErr) {
-              console.error("JSON Parse Error:", parseErr);
-              setError("The AI generated an invalid format. Trying again...");
-            }
+    if (status !== "researching" || !postId || !user) return;
+
+    const checkStatus = async () => {
+      try {
+        const token = await user.getIdToken();
+        
+        const response = await fetch(`https://blog-post-backend-aqmp.onrender.com/api/blog-posts/${postId}`, {
+          method: "GET",
+          headers: {
+            "Authorization": `Bearer ${token}` 
           }
+        });
+        
+        if (response.status === 404) return; 
+        if (!response.ok) throw new Error("Server communication error");
+        
+        const data = await response.json();
+        
+        if (data.status === "OUTLINE_READY") {
+          try {
+            let rawOutline = data.outline;
+            if (typeof rawOutline === "string") {
+              rawOutline = rawOutline.replace(/```json|```/g, "").trim();
+            }
 
-          if (data.status === "ERROR") {
-            setError("AI Research failed (Quota or Connection issue).");
+            const parsedOutline = typeof rawOutline === "string" 
+              ? JSON.parse(rawOutline) 
+              : rawOutline;
+              
+            setOutline(parsedOutline);
+            setStatus("ready");
             setLoading(false);
-            setStatus("idle");
             clearInterval(interval);
+          } catch (parseErr) {
+            console.error("JSON Parse Error:", parseErr);
+            setError("The AI generated an invalid format. Trying again...");
           }
-        } catch (err) {
-          console.error("Polling error:", err);
         }
-      }, 3000); 
+
+        if (data.status === "ERROR") {
+          setError("AI Research failed (Quota or Connection issue).");
+          setLoading(false);
+          setStatus("idle");
+          clearInterval(interval);
+        }
+      } catch (err) {
+        console.error("Polling error:", err);
+      }
+    };
+
+    if (!STATUS_POLLING) {
+      const unsubscribe = subscribeToPostEvents(user, (event) => {
+        if (event.postId === postId) checkStatus();
+      });
+      // Research may have finished before the stream connected.
+      checkStatus();
+      return unsubscribe;
     }
+
+    interval = setInterval(checkStatus, 3000); 
     return () => clearInterval(interval);
   }, [status, postId, user]);
 
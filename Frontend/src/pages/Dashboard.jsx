@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { getAuth } from "firebase/auth"; 
 import Sidebar from "../components/Sidebar"; 
 import BlogPostList from "../components/BlogPostList";
@@ -9,6 +9,41 @@ import Footer from "../components/Footer";
 import SchedulingTimeline from "../components/SchedulingTimeline"; 
 import { Menu, Sparkles, FileText } from "lucide-react"; 
 
+const SEARCH_PAGE_SIZE = 10;
+// Statuses behind each filter; "All" sends none. The server filters search results.
+const STATUS_FILTERS = {
+  All: [],
+  Draft: ["Drafting", "WRITING", "OUTLINE_READY", "RESEARCHING", "Draft"],
+  Published: ["Published"],
+  Scheduled: ["Scheduled"],
+};
+
+// One page of search results for a filter, and the offset of the next page (null at the end).
+async function fetchSearchPage(user, query, filter, offset) {
+  const token = await user.getIdToken();
+  const params = new URLSearchParams({ query, limit: SEARCH_PAGE_SIZE, offset });
+  const statuses = STATUS_FILTERS[filter];
+  if (statuses.length) params.set("status", statuses.join(","));
+  const response = await fetch(
+    `https://blog-post-backend-aqmp.onrender.com/api/blog-posts/search?${params}`,
+    {
+      method: "GET",
+      headers: {
+        "Authorization": `Bearer ${token}`,
+        "Content-Type": "application/json"
+      }
+    }
+  );
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    throw new Error(errorData.detail?.[0]?.msg || errorData.detail || "Search failed");
+  }
+
+  const next = response.headers.get("X-Next-Offset");
+  return { results: await response.json(), next: next === null ? null : Number(next) };
+}
+
 export default function Dashboard() {
   const [isSidebarOpen, setIsSidebarOpen] = useState(false); 
   const [activeFilter, setActiveFilter] = useState("All");
@@ -19,6 +54,10 @@ export default function Dashboard() {
   const [searchQuery, setSearchQuery] = useState("");
   const [searchResults, setSearchResults] = useState([]);
   const [isSearching, setIsSearching] = useState(false);
+  const [nextOffset, setNextOffset] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  // The search the shown results belong to, so a late "load more" can't mix in another one's.
+  const searchKey = useRef("");
 
   const [sidePanel, setSidePanel] = useState("analytics"); 
 
@@ -66,43 +105,52 @@ export default function Dashboard() {
 
     if (!searchQuery.trim()) {
       setSearchResults([]); 
+      setNextOffset(null);
       setIsSearching(false);
       return;
     }
 
+    let cancelled = false;
     const performSearch = async () => {
       setIsSearching(true);
+      searchKey.current = `${activeFilter}:${searchQuery.trim()}`;
       try {
-        const token = await user.getIdToken(); 
-        const response = await fetch(
-          `https://blog-post-backend-aqmp.onrender.com/api/blog-posts/search?query=${encodeURIComponent(searchQuery.trim())}`, 
-          {
-            method: "GET",
-            headers: {
-              "Authorization": `Bearer ${token}`,
-              "Content-Type": "application/json"
-            }
-          }
-        );
-        
-        if (!response.ok) {
-          const errorData = await response.json();
-          throw new Error(errorData.detail?.[0]?.msg || errorData.detail || "Search failed");
-        }
-        
-        const data = await response.json();
-        setSearchResults(data);
+        // One page now; the rest only if the user asks for more.
+        const { results, next } = await fetchSearchPage(user, searchQuery.trim(), activeFilter, 0);
+        if (cancelled) return;
+        setSearchResults(results);
+        setNextOffset(next);
       } catch (err) {
         console.error("Search error:", err.message);
+        if (cancelled) return;
         setSearchResults([]);
+        setNextOffset(null);
       } finally {
-        setIsSearching(false);
+        if (!cancelled) setIsSearching(false);
       }
     };
 
     const timeoutId = setTimeout(performSearch, 300);
-    return () => clearTimeout(timeoutId);
-  }, [searchQuery, user]);
+    return () => {
+      cancelled = true;
+      clearTimeout(timeoutId);
+    };
+  }, [searchQuery, activeFilter, user]);
+
+  const loadMoreResults = async () => {
+    const key = searchKey.current;
+    setIsLoadingMore(true);
+    try {
+      const { results, next } = await fetchSearchPage(user, searchQuery.trim(), activeFilter, nextOffset);
+      if (key !== searchKey.current) return;
+      setSearchResults(previous => [...previous, ...results]);
+      setNextOffset(next);
+    } catch (err) {
+      console.error("Search error:", err.message);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
 
   const scheduledTimelineData = posts
     .filter(post => post.status === "Scheduled")
@@ -116,16 +164,12 @@ export default function Dashboard() {
       };
     });
 
-  const displayPosts = searchQuery.trim() ? searchResults : posts;
-
-  const filteredPosts = displayPosts.filter(post => {
-    if (activeFilter === "All") return true;
-    if (activeFilter === "Draft") {
-      return ["Drafting", "WRITING", "OUTLINE_READY", "RESEARCHING", "Draft"].includes(post.status);
-    }
-    return post.status === (activeFilter === "Published" ? "Published" : activeFilter);
+  const filteredPosts = posts.filter(post => {
+    const statuses = STATUS_FILTERS[activeFilter];
+    return statuses.length === 0 || statuses.includes(post.status);
   });
-  const filteredRecentPosts = filteredPosts.slice(0, 4);
+  // Search results arrive filtered, a page at a time.
+  const filteredRecentPosts = searchQuery.trim() ? searchResults : filteredPosts.slice(0, 4);
 
 
   const getGreeting = () => {
@@ -215,14 +259,23 @@ export default function Dashboard() {
                     {searchQuery && <button onClick={() => setSearchQuery("")} className="text-emerald-600 text-[10px] font-black uppercase tracking-widest hover:text-emerald-500 transition-colors">Clear Search</button>}
                 </div>
               ) : (
-                <BlogPostList posts={filteredRecentPosts} />
+                <>
+                  <BlogPostList posts={filteredRecentPosts} />
+                  {searchQuery.trim() && nextOffset !== null && (
+                    <div className="mt-8 text-center">
+                      <button onClick={loadMoreResults} disabled={isLoadingMore} className="text-emerald-600 text-[10px] font-black uppercase tracking-widest hover:text-emerald-500 transition-colors disabled:opacity-50">
+                        {isLoadingMore ? "Loading..." : "Load more results"}
+                      </button>
+                    </div>
+                  )}
+                </>
               )}
           </div>
 
           
           <aside className="xl:col-span-4 space-y-8 sticky top-8 h-[calc(100vh-120px)]">
             {sidePanel === "analytics" ? (
-                <AnalyticsCard posts={posts} />
+                <AnalyticsCard user={user} />
             ) : (
                 <SchedulingTimeline 
                     data={scheduledTimelineData} 
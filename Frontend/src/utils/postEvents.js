@@ -0,0 +1,68 @@
+const API_BASE = "https://blog-post-backend-aqmp.onrender.com";
+
+// Set VITE_STATUS_POLLING=true to go back to polling each post every few seconds.
+export const STATUS_POLLING = import.meta.env.VITE_STATUS_POLLING === "true";
+
+const listeners = new Set();
+let source = null;
+let connecting = null;
+// Where to resume after reconnecting with a new ticket, so no change is missed.
+let lastEventId = null;
+
+// The ID token never goes in the URL: it is traded for a single-use stream ticket.
+async function fetchTicket(user) {
+  const token = await user.getIdToken();
+  const response = await fetch(`${API_BASE}/api/events/ticket`, {
+    method: "POST",
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  if (!response.ok) throw new Error(`Stream ticket request failed: ${response.status}`);
+  return (await response.json()).ticket;
+}
+
+function reconnectLater(user) {
+  setTimeout(() => listeners.size && connect(user), 3000);
+}
+
+// One EventSource per tab, shared by every card/page that is waiting on a post.
+async function connect(user) {
+  if (source || connecting) return;
+
+  connecting = fetchTicket(user)
+    .then((ticket) => {
+      connecting = null;
+      if (listeners.size === 0) return;
+
+      const since = lastEventId ? `&since=${encodeURIComponent(lastEventId)}` : "";
+      source = new EventSource(`${API_BASE}/api/events?ticket=${encodeURIComponent(ticket)}${since}`);
+      source.addEventListener("status", (e) => {
+        lastEventId = e.lastEventId;
+        const event = JSON.parse(e.data);
+        listeners.forEach((listener) => listener(event));
+      });
+      source.onerror = () => {
+        // A ticket works once, so the browser's own retry is refused; reconnect with a new one.
+        if (source && source.readyState === EventSource.CLOSED) {
+          source = null;
+          reconnectLater(user);
+        }
+      };
+    })
+    .catch(() => {
+      connecting = null;
+      reconnectLater(user);
+    });
+}
+
+export function subscribeToPostEvents(user, listener) {
+  listeners.add(listener);
+  connect(user);
+
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0 && source) {
+      source.close();
+      source = null;
+    }
+  };
+}